@@ -0,0 +1,105 @@
+import io
+import base64
+import hashlib
+import threading
+import collections
+from PIL import Image
+from reportlab.lib.utils import ImageReader
+from timings import span
+
+# Decoded letterheads and background images kept per process; a court unit's UDFs all carry the same one
+DEFAULT_MAX_BYTES = 128 * 1024 * 1024
+
+def payload_key(data):
+    """Cache key of a base64 image payload"""
+    return hashlib.sha256(data.encode('ascii') if isinstance(data, str) else data).hexdigest()
+
+class Asset:
+    """A decoded image payload: its bytes, pixel size and, once asked for, a reportlab ImageReader
+
+    The reader keeps the decoded pixels reportlab embeds, so every document drawing the asset
+    after the first skips both the base64 and the image decoding.
+    """
+    def __init__(self, data):
+        self.data = data
+        self.width = self.height = None
+        try:
+            with Image.open(io.BytesIO(data)) as img:
+                self.width, self.height = img.size
+        except Exception:
+            pass  # not an image Pillow understands; reader() reports it
+        self._reader = None
+        self._lock = threading.Lock()
+
+    @property
+    def size(self):
+        """Bytes held once the reader has decoded the pixels: Pillow's copy (4 per pixel) and reportlab's RGB data"""
+        return len(self.data) + 8 * (self.width or 0) * (self.height or 0)
+
+    def reader(self):
+        with self._lock:
+            if self._reader is None:
+                reader = ImageReader(io.BytesIO(self.data))
+                reader.getRGBData()
+                self._reader = reader
+            return self._reader
+
+class AssetCache:
+    """LRU of decoded image payloads keyed by their hash, bounded by the memory they hold"""
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.entries = collections.OrderedDict()
+        self.bytes = 0
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, data):
+        """The Asset for a base64 payload, decoded on first use"""
+        key = payload_key(data)
+        with self.lock:
+            asset = self.entries.get(key)
+            if asset is not None:
+                self.entries.move_to_end(key)
+                self.hits += 1
+            else:
+                self.misses += 1
+        if asset is None:
+            with span('decode_images'):
+                image_bytes = base64.b64decode(data)
+            asset = Asset(image_bytes)
+            self.put(key, asset)
+        return asset
+
+    def put(self, key, asset):
+        if asset.size > self.max_bytes:
+            return  # would evict everything else and still not fit
+        with self.lock:
+            if key in self.entries:
+                return
+            self.entries[key] = asset
+            self.bytes += asset.size
+            self._evict()
+
+    def _evict(self):
+        while self.bytes > self.max_bytes:
+            _, asset = self.entries.popitem(last=False)
+            self.bytes -= asset.size
+
+    def resize(self, max_bytes):
+        with self.lock:
+            self.max_bytes = max_bytes
+            self._evict()
+
+    def stats(self):
+        with self.lock:
+            return {'entries': len(self.entries), 'bytes': self.bytes, 'hits': self.hits, 'misses': self.misses}
+
+_shared = AssetCache()
+
+def shared_cache():
+    return _shared
+
+def configure(max_bytes):
+    """Set the process-wide cache budget in bytes; 0 turns caching off (usable as a pool initializer)"""
+    _shared.resize(max_bytes)
@@ -0,0 +1,338 @@
+import os
+import sys
+import json
+import time
+import argparse
+import importlib
+import zipfile
+import contextlib
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from concurrent.futures.process import BrokenProcessPool
+from cache import OutputCache, file_sha256
+from guards import guarded, add_guard_args, limits_from_args
+import paragraph_cache
+import asset_cache
+
+# (input extension, target format) -> (module, path-based converter)
+CONVERTERS = {
+    ('.udf', 'pdf'): ('udf_to_pdf', 'udf_to_pdf'),
+    ('.udf', 'docx'): ('udf_to_docx', 'udf_to_docx'),
+    ('.udf', 'md'): ('udf_to_md', 'udf_to_md_file'),
+    ('.docx', 'udf'): ('main', 'main'),
+    ('.pdf', 'udf'): ('scanned_pdf_to_udf', 'pdf_to_udf'),
+}
+
+# Store this many new cache entries between LRU eviction passes
+EVICT_EVERY = 100
+
+# A job in flight when a worker process dies is retried this many times in a fresh pool
+MAX_ATTEMPTS = 2
+
+# Job orders: longest-first (LPT) keeps all workers busy until the end, shortest-first gets
+# small documents out quickly, input keeps the order files were given in
+ORDERS = ('longest', 'shortest', 'input')
+
+def find_inputs(paths, target):
+    """Expand files and directories (recursively) into the inputs convertible to `target`"""
+    extensions = {ext for ext, to in CONVERTERS if to == target}
+    inputs = []
+    for path in paths:
+        if os.path.isdir(path):
+            for dirpath, dirnames, filenames in os.walk(path):
+                dirnames.sort()
+                for name in sorted(filenames):
+                    if os.path.splitext(name)[1].lower() in extensions:
+                        inputs.append(os.path.join(dirpath, name))
+        elif os.path.splitext(path)[1].lower() in extensions:
+            inputs.append(path)
+        else:
+            print(f"Skipping {path}: not a {'/'.join(sorted(extensions))} file")
+    return [os.path.abspath(path) for path in inputs]
+
+def output_path(input_file, target, output_dir=None):
+    filename = os.path.splitext(os.path.basename(input_file))[0] + '.' + target
+    return os.path.join(output_dir or os.path.dirname(input_file), filename)
+
+def estimate_cost(input_file):
+    """Rough conversion cost in bytes: the uncompressed size of a zip's members, else the file size
+
+    UDF and DOCX are zip containers whose central directory lists uncompressed sizes without
+    decompressing anything; base64 images in content.xml make it track conversion work well.
+    """
+    try:
+        with zipfile.ZipFile(input_file) as z:
+            return sum(info.file_size for info in z.infolist())
+    except (zipfile.BadZipFile, OSError):
+        return os.path.getsize(input_file)
+
+def order_jobs(jobs, order='longest'):
+    """Sort (cost, input, output) jobs for the requested scheduling order"""
+    if order == 'longest':
+        return sorted(jobs, key=lambda job: -job[0])
+    if order == 'shortest':
+        return sorted(jobs, key=lambda job: job[0])
+    return list(jobs)
+
+def load_journal(journal_file):
+    """Return the last journal record per input; a torn final line from a crash is ignored"""
+    records = {}
+    if not os.path.exists(journal_file):
+        return records
+    with open(journal_file, encoding='utf-8') as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            records[record['input']] = record
+    return records
+
+def is_finished(record, input_file, output_file):
+    """Whether a journal record shows this exact input was already converted to output_file"""
+    if record is None or record['status'] not in ('converted', 'cached'):
+        return False
+    stat = os.stat(input_file)
+    return (record['output'] == output_file and os.path.exists(output_file)
+            and record['size'] == stat.st_size and record['mtime_ns'] == stat.st_mtime_ns)
+
+def convert_job(input_file, output_file, target, cache_dir=None, link=False, options=None, max_memory=None,
+                limits=None):
+    """Convert one file, going through the output cache when one is configured; returns a journal record
+
+    With limits (a guards.Limits), oversized or runaway documents fail with ResourceLimitError.
+    """
+    stat = os.stat(input_file)
+    record = {'input': input_file, 'output': output_file, 'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+    start = time.perf_counter()
+    cache_before = paragraph_cache.shared_cache().stats()
+    writing = False
+    try:
+        module_name, func_name = CONVERTERS[(os.path.splitext(input_file)[1].lower(), target)]
+        cache = key = None
+        if cache_dir:
+            cache = OutputCache(cache_dir, link=link)
+            record['sha256'] = file_sha256(input_file)
+            key = cache.key(input_file, f"{module_name}.{func_name}", options, record['sha256'])
+        if cache and cache.get(key, output_file):
+            record['status'] = 'cached'
+        else:
+            convert = getattr(importlib.import_module(module_name), func_name)
+            # An earlier hit may have left output_file hardlinked to a cache entry; writing
+            # through it would overwrite that entry with this input's output
+            if os.path.lexists(output_file):
+                os.remove(output_file)
+            writing = True
+            # Converters report each file they write; batch prints its own summary line instead
+            with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+                if limits is not None:
+                    with guarded(limits):
+                        convert(input_file, output_file, max_memory=max_memory, **(options or {}))
+                else:
+                    convert(input_file, output_file, max_memory=max_memory, **(options or {}))
+            if cache:
+                cache.put(key, output_file)
+            record['status'] = 'converted'
+    except Exception as e:
+        record['status'] = 'failed'
+        record['error'] = f"{type(e).__name__}: {e}"
+        # Don't leave a truncated output behind for a later run to mistake for a finished one
+        if writing:
+            with contextlib.suppress(OSError):
+                os.remove(output_file)
+    # Line breaks this conversion reused from documents the same worker rendered before
+    cache_after = paragraph_cache.shared_cache().stats()
+    hits = cache_after['hits']['lines'] - cache_before['hits']['lines']
+    misses = cache_after['misses']['lines'] - cache_before['misses']['lines']
+    if hits or misses:
+        record['paragraph_cache'] = {'hits': hits, 'misses': misses}
+    record['seconds'] = round(time.perf_counter() - start, 4)
+    return record
+
+def run_batch(inputs, target, output_dir=None, journal_file=None, cache_dir=None, cache_size=None,
+              link=False, workers=1, options=None, max_memory=None, order='longest',
+              huge_bytes=None, max_huge=1, limits=None, failed_list=None, paragraph_cache_size=None,
+              asset_cache_bytes=None):
+    """Convert many files, skipping those the journal marks done and reusing cached outputs
+
+    Jobs are ordered by estimated cost, and at most max_huge jobs costing huge_bytes or more
+    run at the same time; smaller jobs fill the remaining workers meanwhile. Inputs that fail
+    (including those rejected by resource guards) are appended to failed_list if given.
+    paragraph_cache_size sets how many distinct paragraphs each worker keeps parsed and wrapped
+    for the PDF converter; the hits and misses end up in the journal records and in counts.
+    asset_cache_bytes bounds the decoded background images each worker keeps for reuse.
+    """
+    if output_dir:
+        os.makedirs(output_dir, exist_ok=True)
+    finished = load_journal(journal_file) if journal_file else {}
+    counts = {'converted': 0, 'cached': 0, 'failed': 0, 'skipped': 0,
+              'paragraph_cache_hits': 0, 'paragraph_cache_misses': 0}
+
+    jobs = []
+    outputs = set()
+    for input_file in inputs:
+        output_file = output_path(input_file, target, output_dir)
+        if output_file in outputs:
+            # e.g. report.docx and report.pdf both converting to UDF
+            base, ext = os.path.splitext(input_file)
+            output_file = output_path(f"{base}_{ext[1:].lower()}{ext}", target, output_dir)
+        outputs.add(output_file)
+        if is_finished(finished.get(input_file), input_file, output_file):
+            counts['skipped'] += 1
+        else:
+            jobs.append((estimate_cost(input_file), input_file, output_file))
+    jobs = order_jobs(jobs, order)
+
+    cache = OutputCache(cache_dir, cache_size, link) if cache_dir else None
+    journal = open(journal_file, 'a', encoding='utf-8') if journal_file else None
+    failed = open(failed_list, 'a', encoding='utf-8') if failed_list else None
+    stored = 0
+
+    def record_result(record):
+        nonlocal stored
+        counts[record['status']] += 1
+        if 'paragraph_cache' in record:
+            counts['paragraph_cache_hits'] += record['paragraph_cache']['hits']
+            counts['paragraph_cache_misses'] += record['paragraph_cache']['misses']
+        if record['status'] == 'failed':
+            print(f"FAILED {record['input']}: {record['error']}")
+            if failed:
+                failed.write(record['input'] + '\n')
+                failed.flush()
+        else:
+            print(f"{record['status']:>9} {record['output']} ({record['seconds']:.2f}s)")
+        if journal:
+            # One fsynced line per file, so a crash loses at most the conversions still in flight
+            journal.write(json.dumps(record, ensure_ascii=False) + '\n')
+            journal.flush()
+            os.fsync(journal.fileno())
+        if cache and record['status'] == 'converted':
+            stored += 1
+            if stored % EVICT_EVERY == 0:
+                cache.evict()
+
+    try:
+        job_args = (target, cache_dir, link, options, max_memory, limits)
+        # A job stuck past its time or memory limit can only be stopped by ending its process,
+        # so watched jobs always run in a worker, never in this process
+        watched = limits is not None and (limits.timeout is not None or limits.max_rss is not None)
+        if workers <= 1 and not watched:
+            configure_caches(paragraph_cache_size, asset_cache_bytes)
+            for _, input_file, output_file in jobs:
+                record_result(convert_job(input_file, output_file, *job_args))
+        else:
+            dispatch(jobs, job_args, max(workers, 1), huge_bytes, max_huge, record_result,
+                     (paragraph_cache_size, asset_cache_bytes))
+    finally:
+        if journal:
+            journal.close()
+        if failed:
+            failed.close()
+        if cache:
+            cache.evict()
+    return counts
+
+def configure_caches(paragraph_cache_size=None, asset_cache_bytes=None):
+    """Size the caches a process keeps across documents; None leaves a default (usable as a pool initializer)"""
+    if paragraph_cache_size is not None:
+        paragraph_cache.configure(paragraph_cache_size)
+    if asset_cache_bytes is not None:
+        asset_cache.configure(asset_cache_bytes)
+
+def dispatch(jobs, job_args, workers, huge_bytes, max_huge, on_result, cache_sizes=(None, None)):
+    """Keep `workers` jobs in flight in queue order, holding back huge jobs over the concurrency cap
+
+    If a worker process dies (killed for memory, or by a resource guard stuck in C code) the pool
+    is replaced and the jobs that were in flight are retried, up to MAX_ATTEMPTS each.
+    """
+    queue = [(cost, input_file, output_file, 1) for cost, input_file, output_file in jobs]
+    running = {}  # future -> (job, is huge)
+
+    def start_pool():
+        if cache_sizes == (None, None):
+            return ProcessPoolExecutor(max_workers=workers)
+        return ProcessPoolExecutor(max_workers=workers, initializer=configure_caches, initargs=cache_sizes)
+
+    pool = start_pool()
+    try:
+        while queue or running:
+            huge_running = sum(huge for _, huge in running.values())
+            while queue and len(running) < workers:
+                for i, job in enumerate(queue):
+                    huge = huge_bytes is not None and job[0] >= huge_bytes
+                    if not huge or huge_running < max_huge:
+                        break
+                else:
+                    break  # only huge jobs left and the cap is reached
+                del queue[i]
+                running[pool.submit(convert_job, job[1], job[2], *job_args)] = (job, huge)
+                huge_running += huge
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            broken = False
+            for future in done:
+                job, _ = running.pop(future)
+                try:
+                    on_result(future.result())
+                except BrokenProcessPool:
+                    broken = True
+                    retry(queue, job, on_result)
+            if broken:
+                for job, _ in running.values():
+                    retry(queue, job, on_result)
+                running.clear()
+                pool.shutdown(wait=False, cancel_futures=True)
+                pool = start_pool()
+    finally:
+        pool.shutdown()
+
+def retry(queue, job, on_result):
+    cost, input_file, output_file, attempt = job
+    if attempt < MAX_ATTEMPTS:
+        queue.insert(0, (cost, input_file, output_file, attempt + 1))
+    else:
+        on_result({'input': input_file, 'output': output_file, 'status': 'failed', 'seconds': 0.0,
+                   'error': "BrokenProcessPool: the worker process died while converting this file"})
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert many files at once, with an output cache and a resumable journal.")
+    parser.add_argument('inputs', nargs='+', help="input files or directories (searched recursively)")
+    parser.add_argument('--to', required=True, choices=sorted({to for _, to in CONVERTERS}), help="target format")
+    parser.add_argument('-o', '--output-dir', help="directory for outputs (default: next to each input)")
+    parser.add_argument('--journal', metavar='FILE', help="append-only JSONL journal; rerunning with the same journal resumes an interrupted batch")
+    parser.add_argument('--cache', metavar='DIR', help="output cache directory; unchanged inputs reuse the cached output")
+    parser.add_argument('--cache-size', type=float, metavar='MB', help="evict least recently used cache entries beyond this size")
+    parser.add_argument('--link', action='store_true', help="hardlink cached outputs instead of copying (don't edit outputs in place)")
+    parser.add_argument('-j', '--workers', type=int, default=os.cpu_count() or 1, help="parallel worker processes (default: CPU count)")
+    parser.add_argument('--max-memory', type=float, metavar='MB', help="per-conversion image memory budget, see the converters' --max-memory")
+    parser.add_argument('--order', choices=ORDERS, default='longest',
+                        help="longest-first for total throughput, shortest-first for quick small results, or input order (default: longest)")
+    parser.add_argument('--huge', type=float, default=200, metavar='MB',
+                        help="jobs whose estimated size (uncompressed zip contents) is at least MB count as huge (default: 200)")
+    parser.add_argument('--max-huge', type=int, default=1, help="huge jobs allowed to run at once (default: 1)")
+    parser.add_argument('--failed-list', metavar='FILE', help="append the paths of inputs that failed to FILE")
+    parser.add_argument('--paragraph-cache', type=int, default=paragraph_cache.DEFAULT_MAX_ENTRIES, metavar='N',
+                        help=f"distinct paragraphs each worker keeps parsed and wrapped for PDF output, reused across documents; 0 disables (default: {paragraph_cache.DEFAULT_MAX_ENTRIES})")
+    parser.add_argument('--asset-cache', type=float, default=asset_cache.DEFAULT_MAX_BYTES / (1024 * 1024), metavar='MB',
+                        help=f"memory each worker keeps for decoded letterheads and background images, reused across documents; 0 disables (default: {asset_cache.DEFAULT_MAX_BYTES // (1024 * 1024)})")
+    add_guard_args(parser)
+    args = parser.parse_args()
+
+    inputs = find_inputs(args.inputs, args.to)
+    cache_size = int(args.cache_size * 1024 * 1024) if args.cache_size is not None else None
+    max_memory = int(args.max_memory * 1024 * 1024) if args.max_memory is not None else None
+    counts = run_batch(inputs, args.to, args.output_dir, args.journal, args.cache, cache_size,
+                       args.link, args.workers, max_memory=max_memory, order=args.order,
+                       huge_bytes=int(args.huge * 1024 * 1024), max_huge=max(args.max_huge, 1),
+                       limits=limits_from_args(args), failed_list=args.failed_list,
+                       paragraph_cache_size=args.paragraph_cache,
+                       asset_cache_bytes=int(args.asset_cache * 1024 * 1024))
+    print(f"{counts['converted']} converted, {counts['cached']} from cache, "
+          f"{counts['skipped']} already done, {counts['failed']} failed")
+    lookups = counts['paragraph_cache_hits'] + counts['paragraph_cache_misses']
+    if lookups:
+        print(f"Paragraph cache: {counts['paragraph_cache_hits']} of {lookups} paragraph layouts reused "
+              f"({counts['paragraph_cache_hits'] / lookups:.0%})")
+    if counts['failed']:
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
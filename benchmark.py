@@ -0,0 +1,133 @@
+import os
+import sys
+import json
+import time
+import platform
+import argparse
+import tempfile
+import importlib
+import contextlib
+import multiprocessing
+from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor
+from make_corpus import make_corpus, add_shape_args, shape_from_args
+from memory_budget import peak_rss_mb
+
+# Benchmark name -> (input extension, module, bytes-in/bytes-out function)
+CONVERTERS = {
+    'udf_to_pdf': ('.udf', 'udf_to_pdf', 'udf_to_pdf_bytes'),
+    'udf_to_docx': ('.udf', 'udf_to_docx', 'udf_to_docx_bytes'),
+    'udf_to_markdown': ('.udf', 'udf_to_md', 'udf_to_markdown'),
+    'docx_to_udf': ('.docx', 'main', 'docx_to_udf_bytes'),
+    'pdf_to_udf': ('.pdf', 'scanned_pdf_to_udf', 'pdf_to_udf_bytes'),
+}
+
+def run_converter(name, files, repeat):
+    """Time one converter over the corpus; runs in a fresh process so peak RSS is its own"""
+    ext, module_name, func_name = CONVERTERS[name]
+    convert = getattr(importlib.import_module(module_name), func_name)
+
+    inputs = []
+    for path in files:
+        with open(path, 'rb') as f:
+            inputs.append(f.read())
+
+    runs = []
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        # Warm up imports, font registration and caches before timing
+        convert(inputs[0])
+        for _ in range(repeat):
+            start = time.perf_counter()
+            for data in inputs:
+                convert(data)
+            runs.append(time.perf_counter() - start)
+
+    return {'runs': runs, 'peak_rss_mb': peak_rss_mb()}
+
+def benchmark(corpus_dir, converters, repeat):
+    with open(os.path.join(corpus_dir, 'manifest.json'), encoding='utf-8') as f:
+        manifest = json.load(f)
+
+    results = []
+    context = multiprocessing.get_context('spawn')
+    for name in converters:
+        ext = CONVERTERS[name][0]
+        files = sorted(os.path.join(corpus_dir, f) for f in manifest['files'] if f.endswith(ext))
+        if not files:
+            print(f"{name}: no {ext} files in corpus, skipped")
+            continue
+
+        with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+            measured = pool.submit(run_converter, name, files, repeat).result()
+
+        seconds = min(measured['runs'])
+        total_bytes = sum(os.path.getsize(path) for path in files)
+        total_elements = sum(manifest['files'][os.path.basename(path)] for path in files)
+        results.append({
+            'converter': name,
+            'files': len(files),
+            'input_mb': round(total_bytes / 1e6, 3),
+            'elements': total_elements,
+            'seconds': round(seconds, 4),
+            'runs': [round(run, 4) for run in measured['runs']],
+            'elements_per_s': round(total_elements / seconds, 1),
+            'mb_per_s': round(total_bytes / 1e6 / seconds, 3),
+            'peak_rss_mb': measured['peak_rss_mb'],
+        })
+    return {
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'repeat': repeat,
+        'shape': manifest['shape'],
+        'results': results,
+    }
+
+def print_report(report, baseline=None):
+    previous = {r['converter']: r for r in baseline['results']} if baseline else {}
+    print(f"{'converter':<16} {'files':>5} {'seconds':>9} {'elem/s':>10} {'MB/s':>8} {'peak RSS':>9}  vs baseline")
+    for r in report['results']:
+        rss = f"{r['peak_rss_mb']:.1f}MB" if r['peak_rss_mb'] is not None else 'n/a'
+        line = f"{r['converter']:<16} {r['files']:>5} {r['seconds']:>9.4f} {r['elements_per_s']:>10.1f} {r['mb_per_s']:>8.3f} {rss:>9}"
+        old = previous.get(r['converter'])
+        if old:
+            line += f"  {old['seconds'] / r['seconds']:.2f}x"
+        print(line)
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the converters on a synthetic or existing corpus.")
+    parser.add_argument('--corpus', help="corpus directory made by make_corpus.py (default: generate one in a temp dir)")
+    parser.add_argument('--count', type=int, default=3, help="documents per format when generating a corpus (default: 3)")
+    parser.add_argument('--converters', default=','.join(CONVERTERS), help="comma separated converters to run (default: all)")
+    parser.add_argument('--repeat', type=int, default=3, help="timed passes over the corpus; the fastest is reported (default: 3)")
+    parser.add_argument('-o', '--output', help="JSON results file (default: benchmark-<timestamp>.json)")
+    parser.add_argument('--compare', metavar='JSON', help="earlier results file to report speedups against")
+    add_shape_args(parser)
+    args = parser.parse_args()
+
+    converters = args.converters.split(',')
+    unknown = [name for name in converters if name not in CONVERTERS]
+    if unknown:
+        parser.error(f"unknown converters: {', '.join(unknown)}")
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        corpus_dir = args.corpus
+        if corpus_dir is None:
+            corpus_dir = temp_dir
+            with contextlib.redirect_stdout(sys.stderr):
+                make_corpus(corpus_dir, args.count, **shape_from_args(args))
+        report = benchmark(corpus_dir, converters, args.repeat)
+
+    baseline = None
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            baseline = json.load(f)
+    print_report(report, baseline)
+
+    output = args.output or f"benchmark-{datetime.now():%Y%m%d-%H%M%S}.json"
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {output}")
+
+if __name__ == '__main__':
+    main()
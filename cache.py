@@ -0,0 +1,122 @@
+import os
+import json
+import shutil
+import hashlib
+import threading
+import functools
+
+HASH_CHUNK = 1024 * 1024
+
+def file_sha256(path):
+    """SHA-256 of a file's contents, read in chunks"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+@functools.lru_cache(maxsize=None)
+def code_version():
+    """Hash of the toolkit's Python sources, so any converter change invalidates cached outputs"""
+    digest = hashlib.sha256()
+    source_dir = os.path.dirname(os.path.abspath(__file__))
+    for name in sorted(os.listdir(source_dir)):
+        if name.endswith('.py'):
+            with open(os.path.join(source_dir, name), 'rb') as f:
+                digest.update(name.encode('utf-8'))
+                digest.update(f.read())
+    return digest.hexdigest()[:16]
+
+class OutputCache:
+    """On-disk conversion output cache keyed by input hash, converter, code version and options
+
+    Entries are plain files under cache_dir/<2 hex chars>/<key>. A hit refreshes the entry's
+    mtime, and eviction removes the least recently used entries once the cache exceeds max_bytes.
+    """
+    def __init__(self, cache_dir, max_bytes=None, link=False):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.link = link
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def key(self, input_file, converter, options=None, input_hash=None):
+        payload = json.dumps({
+            'input': input_hash or file_sha256(input_file),
+            'converter': converter,
+            'version': code_version(),
+            'options': options or {},
+        }, sort_keys=True)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def _entry(self, key):
+        return os.path.join(self.cache_dir, key[:2], key)
+
+    def get(self, key, output_file):
+        """Materialize a cached output at output_file; returns False on a miss"""
+        entry = self._entry(key)
+        try:
+            os.utime(entry)  # mark as recently used
+        except FileNotFoundError:
+            return False
+        if os.path.lexists(output_file):
+            os.remove(output_file)
+        if self.link:
+            try:
+                os.link(entry, output_file)
+                return True
+            except OSError:
+                pass  # different filesystem or no hardlink support; fall back to a copy
+        try:
+            shutil.copyfile(entry, output_file)
+        except FileNotFoundError:
+            return False  # evicted by another process in the meantime
+        return True
+
+    def put(self, key, output_file):
+        """Store a freshly converted output; call evict() afterwards to apply the size limit"""
+        entry = self._entry(key)
+        os.makedirs(os.path.dirname(entry), exist_ok=True)
+        # Copy to a temp name and rename, so concurrent readers never see a partial entry
+        temp_path = os.path.join(os.path.dirname(entry), f".tmp-{os.getpid()}-{threading.get_ident()}-{key}")
+        try:
+            shutil.copyfile(output_file, temp_path)
+            os.replace(temp_path, entry)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+
+    def entries(self):
+        """(mtime, size, path) for every cache entry"""
+        result = []
+        for prefix in os.listdir(self.cache_dir):
+            subdir = os.path.join(self.cache_dir, prefix)
+            if not os.path.isdir(subdir):
+                continue
+            for entry in os.scandir(subdir):
+                if entry.name.startswith('.tmp-'):
+                    continue
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                result.append((stat.st_mtime, stat.st_size, entry.path))
+        return result
+
+    def evict(self):
+        """Remove least recently used entries until the cache fits in max_bytes"""
+        if self.max_bytes is None:
+            return 0
+        entries = self.entries()
+        total = sum(size for _, size, _ in entries)
+        removed = 0
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+            removed += 1
+        return removed
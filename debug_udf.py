@@ -1,7 +1,23 @@
 import sys
 import os
+import json
+import time
+import argparse
 import zipfile
 import xml.etree.ElementTree as ET
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from udf_io import load_udf_root, load_content_text, find_udf_files
+from errors import UdfError
+
+# Element sections whose offsets are checked for document order separately from the body
+SECTIONS = ('header', 'footer')
+
+# Issue types that make a document invalid; gaps (uncovered text) are only reported
+ERRORS = ('bad_offset', 'negative', 'out_of_bounds', 'out_of_order', 'overlap')
+
+# Examples kept per issue type in the report
+MAX_EXAMPLES = 5
 
 def debug_udf(udf_file):
     print(f"Analyzing {udf_file}")
@@ -66,8 +82,141 @@ def debug_udf(udf_file):
                     
                     last_end = start + length
 
-if __name__ == "__main__":
-    if len(sys.argv) > 1:
-        debug_udf(sys.argv[1])
+def collect_offsets(elements):
+    """Gather startOffset/length of every element (tables, cells, headers and footers included) into arrays"""
+    starts, lengths, sections, tags, bad = [], [], [], [], []
+    for section_id, top in enumerate(elements, 1):
+        section = section_id if top.tag in SECTIONS else 0
+        for elem in top.iter():
+            start = elem.get('startOffset')
+            if start is None:
+                continue
+            try:
+                starts.append(int(start))
+                lengths.append(int(elem.get('length', '0')))
+            except ValueError:
+                bad.append({'tag': elem.tag, 'startOffset': start, 'length': elem.get('length')})
+                continue
+            sections.append(section)
+            tags.append(elem.tag)
+    return (np.array(starts, dtype=np.int64), np.array(lengths, dtype=np.int64),
+            np.array(sections, dtype=np.int64), tags, bad)
+
+def check_offsets(starts, lengths, sections, content_length):
+    """Return {issue type: element indices} plus the uncovered (start, end) text ranges"""
+    ends = starts + lengths
+    issues = {}
+    issues['negative'] = np.flatnonzero((starts < 0) | (lengths < 0))
+    issues['out_of_bounds'] = np.flatnonzero((starts >= 0) & (lengths >= 0) & (ends > content_length))
+
+    # Within the body and within each header/footer, elements should move forward through the text
+    same_section = sections[1:] == sections[:-1]
+    issues['out_of_order'] = np.flatnonzero(same_section & (starts[1:] < starts[:-1])) + 1
+
+    # Overlaps and gaps come from the intervals sorted by start; zero-length markers take no text
+    spans = np.flatnonzero((lengths > 0) & (starts >= 0))
+    order = spans[np.argsort(starts[spans], kind='stable')]
+    sorted_starts, sorted_ends = starts[order], ends[order]
+    gaps = np.empty((0, 2), dtype=np.int64)
+    if len(order):
+        reach = np.maximum.accumulate(sorted_ends)
+        issues['overlap'] = np.sort(order[1:][sorted_starts[1:] < reach[:-1]])
+        gap_mask = sorted_starts[1:] > reach[:-1]
+        gap_starts = np.concatenate(([0], reach[:-1][gap_mask], [reach[-1]]))
+        gap_ends = np.concatenate(([sorted_starts[0]], sorted_starts[1:][gap_mask], [content_length]))
+        keep = gap_ends > gap_starts
+        gaps = np.stack((gap_starts[keep], gap_ends[keep]), axis=1)
     else:
-        print("Usage: python debug_udf.py <filename>")
+        issues['overlap'] = np.empty(0, dtype=np.int64)
+        if content_length:
+            gaps = np.array([[0, content_length]], dtype=np.int64)
+    return issues, gaps
+
+def validate_udf(udf_file):
+    """Check every element's offsets against the content text and return a JSON-ready report"""
+    start_time = time.perf_counter()
+    report = {'file': udf_file}
+    try:
+        root = load_udf_root(udf_file)
+        content_text = load_content_text(root)
+    except UdfError as e:
+        report.update(ok=False, error=f"{type(e).__name__}: {e}")
+        return report
+    elements = root.find('elements')
+    if elements is None:
+        report.update(ok=False, error="MissingElementsError: 'elements' could not be found in the XML.")
+        return report
+
+    starts, lengths, sections, tags, bad = collect_offsets(elements)
+    issues, gaps = check_offsets(starts, lengths, sections, len(content_text))
+
+    counts = {'bad_offset': len(bad)}
+    examples = {'bad_offset': bad[:MAX_EXAMPLES]} if bad else {}
+    for kind, indices in issues.items():
+        counts[kind] = int(len(indices))
+        if len(indices):
+            examples[kind] = [{'element': int(i), 'tag': tags[i], 'startOffset': int(starts[i]),
+                               'length': int(lengths[i])} for i in indices[:MAX_EXAMPLES]]
+    counts['gap'] = int(len(gaps))
+    if len(gaps):
+        examples['gap'] = [{'start': int(a), 'end': int(b), 'text': content_text[a:b][:40]}
+                           for a, b in gaps[:MAX_EXAMPLES]]
+
+    report.update(
+        ok=not any(counts[kind] for kind in ERRORS),
+        content_length=len(content_text),
+        elements=int(len(starts)),
+        uncovered_chars=int((gaps[:, 1] - gaps[:, 0]).sum()) if len(gaps) else 0,
+        counts=counts,
+        examples=examples,
+        seconds=round(time.perf_counter() - start_time, 4),
+    )
+    return report
+
+def validate_many(files, workers=1):
+    """Validate files on a process pool and return the reports in input order"""
+    if workers <= 1 or len(files) < 2:
+        return [validate_udf(f) for f in files]
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(validate_udf, files, chunksize=max(1, min(64, len(files) // (workers * 4)))))
+
+def describe(report):
+    if 'error' in report:
+        return f"ERROR   {report['file']}: {report['error']}"
+    found = ', '.join(f"{n} {kind}" for kind, n in report['counts'].items() if n)
+    status = 'OK     ' if report['ok'] else 'INVALID'
+    return f"{status} {report['file']} ({report['elements']} elements, {report['seconds'] * 1000:.1f} ms){': ' + found if found else ''}"
+
+def main():
+    parser = argparse.ArgumentParser(description="Validate UDF element offsets against the document text.")
+    parser.add_argument('paths', nargs='+', help="UDF files or directories to scan recursively")
+    parser.add_argument('--json', metavar='FILE', help="write a JSON report to FILE, or - for stdout")
+    parser.add_argument('-j', '--workers', type=int, default=os.cpu_count() or 1, help="parallel worker processes (default: CPU count)")
+    parser.add_argument('--dump', action='store_true', help="print the detailed paragraph dump of the old debug output instead")
+    args = parser.parse_args()
+
+    files = find_udf_files(args.paths)
+    if args.dump:
+        for udf_file in files:
+            debug_udf(udf_file)
+        return
+
+    reports = validate_many(files, args.workers)
+    invalid = sum(1 for r in reports if not r['ok'])
+    if args.json != '-':
+        for report in reports:
+            print(describe(report))
+        print(f"{len(reports) - invalid} valid, {invalid} invalid")
+    if args.json:
+        summary = {'files': len(reports), 'valid': len(reports) - invalid, 'invalid': invalid}
+        data = json.dumps({'summary': summary, 'reports': reports}, ensure_ascii=False, indent=2)
+        if args.json == '-':
+            print(data)
+        else:
+            with open(args.json, 'w', encoding='utf-8') as f:
+                f.write(data)
+    if invalid:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+import zipfile
+import posixpath
+from lxml import etree
+from docx.oxml.ns import qn
+from udf_io import as_input
+from errors import DocxLoadError
+from guards import current_limits, check_zip, check_elements, read_member
+from docx_styles import StyleIndex
+
+OFFICE_DOCUMENT = 'http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument'
+RELATIONSHIP = '{http://schemas.openxmlformats.org/package/2006/relationships}Relationship'
+STYLES = 'http://schemas.openxmlformats.org/officeDocument/2006/relationships/styles'
+NUMBERING = 'http://schemas.openxmlformats.org/officeDocument/2006/relationships/numbering'
+BODY = qn('w:body')
+# Only paragraphs and tables are converted; filtering in lxml saves an event per run and property
+BODY_TAGS = (qn('w:p'), qn('w:tbl'))
+
+def _rels_name(part_name):
+    directory, name = posixpath.split(part_name)
+    return posixpath.join(directory, '_rels', name + '.rels')
+
+def _resolve(base_dir, target):
+    """Zip member name of a relationship target, which is relative to its source part"""
+    if target.startswith('/'):
+        return target.lstrip('/')
+    return posixpath.normpath(posixpath.join(base_dir, target))
+
+class DocxReader:
+    """Reads a DOCX body straight from the zip, one top-level paragraph or table at a time
+
+    Unlike python-docx's Document, nothing but the relationships is loaded up front: document.xml is
+    parsed incrementally and each body element is detached once the caller moves on, and media parts
+    are read from the zip only when a drawing asks for them.
+    """
+    def __init__(self, docx_file):
+        self.source = as_input(docx_file)
+        try:
+            self.zip = zipfile.ZipFile(self.source)
+        except (zipfile.BadZipFile, OSError) as e:
+            raise DocxLoadError(f"Error loading DOCX file: {e}") from e
+        try:
+            check_zip(self.zip)
+            self.part_name = 'word/document.xml'
+            for rel_type, target, external in self._read_rels('_rels/.rels', '').values():
+                if rel_type == OFFICE_DOCUMENT and not external:
+                    self.part_name = target
+            if self.part_name not in self.zip.NameToInfo:
+                raise DocxLoadError(f"Error loading DOCX file: {self.part_name} not found")
+            self.rels = self._read_rels(_rels_name(self.part_name), posixpath.dirname(self.part_name))
+            self.body_size = self.zip.getinfo(self.part_name).file_size
+            self._styles = None
+        except BaseException:
+            self.zip.close()
+            raise
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+    def close(self):
+        self.zip.close()
+
+    def _read_rels(self, name, base_dir):
+        """rId -> (type, zip member name or external URL, is external) for one .rels part"""
+        if name not in self.zip.NameToInfo:
+            return {}
+        try:
+            root = etree.fromstring(read_member(self.zip, name), etree.XMLParser(resolve_entities=False))
+        except etree.XMLSyntaxError as e:
+            raise DocxLoadError(f"Error loading DOCX file: {name}: {e}") from e
+        rels = {}
+        for rel in root.iter(RELATIONSHIP):
+            external = rel.get('TargetMode') == 'External'
+            target = rel.get('Target', '')
+            rels[rel.get('Id')] = (rel.get('Type'), target if external else _resolve(base_dir, target), external)
+        return rels
+
+    def image_blob(self, rId):
+        """Bytes of an embedded part by relationship id, or None when it is missing or external"""
+        _, target, external = self.rels.get(rId, (None, None, True))
+        if external or target not in self.zip.NameToInfo:
+            return None
+        return read_member(self.zip, target)
+
+    def part_by_type(self, rel_type):
+        """Bytes of the document part's first internal relationship of a type, or None"""
+        for rId, (type_, _, external) in self.rels.items():
+            if type_ == rel_type and not external:
+                return self.image_blob(rId)
+        return None
+
+    @property
+    def styles(self):
+        """StyleIndex for styles.xml and numbering.xml, built on first use"""
+        if self._styles is None:
+            self._styles = StyleIndex(self.part_by_type(STYLES), self.part_by_type(NUMBERING))
+        return self._styles
+
+    def body_elements(self):
+        """Yield the top-level paragraphs and tables of the body as they are parsed"""
+        count = 0
+        counting = current_limits() is not None
+        try:
+            with self.zip.open(self.part_name) as stream:
+                # Same parser settings as python-docx, so processed text is identical
+                for _, element in etree.iterparse(stream, events=('end',), tag=BODY_TAGS,
+                                                  remove_blank_text=True, resolve_entities=False):
+                    parent = element.getparent()
+                    if parent is None or parent.tag != BODY:
+                        continue
+                    if counting:
+                        count += sum(1 for _ in element.iter())
+                        check_elements(count)
+                    yield element
+                    # Detach it so the parsed tree never holds more than the current element
+                    parent.remove(element)
+        except etree.XMLSyntaxError as e:
+            raise DocxLoadError(f"Error loading DOCX file: {self.part_name}: {e}") from e
@@ -0,0 +1,201 @@
+import hashlib
+from xml.sax.saxutils import escape
+from lxml import etree
+from docx.oxml.ns import qn
+from errors import DocxLoadError
+
+VAL = qn('w:val')
+FALSE_VALUES = ('0', 'false', 'off')
+
+# Used when neither the styles nor the run set a font or size; 20 half-points as Word assumes
+DEFAULT_FAMILY = 'Times New Roman'
+DEFAULT_SIZE = '20'
+
+# (numFmt, closing character of lvlText) -> UDF NumberType; None matches any other text
+NUMBER_TYPES = {
+    ('decimal', ')'): 'NUMBER_TYPE_NUMBER_PARANTHESE',
+    ('decimal', '-'): 'NUMBER_TYPE_NUMBER_TRE',
+    ('decimal', None): 'NUMBER_TYPE_NUMBER_DOT',
+    ('lowerLetter', ')'): 'NUMBER_TYPE_CHAR_SMALL_PARANTHESE',
+    ('lowerLetter', None): 'NUMBER_TYPE_CHAR_SMALL_DOT',
+    ('upperLetter', None): 'NUMBER_TYPE_CHAR_BIG_DOT',
+    ('lowerRoman', None): 'NUMBER_TYPE_ROMAN_SMALL_DOT',
+    ('upperRoman', None): 'NUMBER_TYPE_ROMAN_BIG_DOT',
+}
+DEFAULT_NUMBER_TYPE = 'NUMBER_TYPE_NUMBER_TRE'
+
+# Bullet characters, including the Symbol/Wingdings private-use code points Word writes
+BULLET_TYPES = {
+    '•': 'BULLET_TYPE_ELLIPSE', '●': 'BULLET_TYPE_ELLIPSE', '\uf0b7': 'BULLET_TYPE_ELLIPSE',
+    'o': 'BULLET_TYPE_ELLIPSE', '○': 'BULLET_TYPE_ELLIPSE',
+    '▪': 'BULLET_TYPE_RECTANGLE', '■': 'BULLET_TYPE_RECTANGLE', '\uf0a7': 'BULLET_TYPE_RECTANGLE',
+    '□': 'BULLET_TYPE_RECTANGLE_D', '❑': 'BULLET_TYPE_RECTANGLE_D', '\uf071': 'BULLET_TYPE_RECTANGLE_D',
+    '➢': 'BULLET_TYPE_ARROW', '➤': 'BULLET_TYPE_ARROW', '>': 'BULLET_TYPE_ARROW', '\uf0d8': 'BULLET_TYPE_ARROW',
+    '◆': 'BULLET_TYPE_DIAMOND', '♦': 'BULLET_TYPE_DIAMOND', '❖': 'BULLET_TYPE_DIAMOND', '\uf076': 'BULLET_TYPE_DIAMOND',
+    '►': 'BULLET_TYPE_TRIANGLE', '▶': 'BULLET_TYPE_TRIANGLE', '▲': 'BULLET_TYPE_TRIANGLE',
+}
+DEFAULT_BULLET_TYPE = 'BULLET_TYPE_ELLIPSE'
+
+def _parse(data, name):
+    if data is None:
+        return None
+    try:
+        return etree.fromstring(data, etree.XMLParser(resolve_entities=False))
+    except etree.XMLSyntaxError as e:
+        raise DocxLoadError(f"Error loading DOCX file: {name}: {e}") from e
+
+RFONTS, ASCII, HANSI = qn('w:rFonts'), qn('w:ascii'), qn('w:hAnsi')
+SIZE = qn('w:sz')
+TOGGLES = {qn('w:b'): 'bold', qn('w:i'): 'italic'}
+RSTYLE = qn('w:rStyle')
+
+def run_properties(rPr):
+    """The formatting an rPr sets: family, size (half-points), bold and italic; unset ones are left out
+
+    A run's character style, if any, is returned under 'style'. Runs are formatted by the tens of
+    thousands, so the children are scanned once instead of looked up one by one.
+    """
+    props = {}
+    if rPr is None:
+        return props
+    for child in rPr:
+        tag = child.tag
+        if tag in TOGGLES:
+            props[TOGGLES[tag]] = child.get(VAL, 'true').lower() not in FALSE_VALUES
+        elif tag == RFONTS:
+            family = child.get(ASCII) or child.get(HANSI)
+            if family:
+                props['family'] = family
+        elif tag == SIZE:
+            if (child.get(VAL) or '').isdigit():
+                props['size'] = child.get(VAL)
+        elif tag == RSTYLE:
+            props['style'] = child.get(VAL)
+    return props
+
+def style_attrs(props):
+    """UDF <content> formatting attributes for resolved run properties"""
+    attrs = [f'family="{escape(props.get("family", DEFAULT_FAMILY), {chr(34): "&quot;"})}"',
+             f'size="{int(props.get("size", DEFAULT_SIZE)) // 2}"']  # half-points to points
+    if props.get('bold'):
+        attrs.append('bold="true"')
+    if props.get('italic'):
+        attrs.append('italic="true"')
+    return ' '.join(attrs)
+
+def number_type(num_fmt, level_text):
+    """UDF NumberType or BulletType for a numbering level"""
+    if num_fmt == 'bullet':
+        return BULLET_TYPES.get(level_text[:1], DEFAULT_BULLET_TYPE)
+    return NUMBER_TYPES.get((num_fmt, level_text[-1:]), NUMBER_TYPES.get((num_fmt, None), DEFAULT_NUMBER_TYPE))
+
+class StyleIndex:
+    """Effective formatting from styles.xml and numbering.xml, resolved once per document
+
+    Style chains (basedOn) are flattened when the index is built, and the properties for each
+    paragraph style / character style pair are kept after first use, so a run only has to lay its
+    own rPr over a dictionary hit. Numbering formats are precomputed for every (numId, ilvl).
+    """
+    def __init__(self, styles_xml=None, numbering_xml=None):
+        digest = hashlib.sha256()
+        for data in (styles_xml, numbering_xml):
+            digest.update(data or b'')
+            digest.update(b'\0')
+        self.digest = digest.hexdigest()
+        self.paragraph_styles = {}  # styleId -> run properties, basedOn chain applied
+        self.character_styles = {}
+        self.paragraph_numbering = {}  # paragraph styleId -> (numId, ilvl) from the style
+        self.default_paragraph_style = None
+        self.defaults = {}
+        self.numbering = {}  # (numId, ilvl) -> UDF list type
+        self._runs = {}
+        self._attrs = {}
+        self._load_styles(_parse(styles_xml, 'styles.xml'))
+        self._load_numbering(_parse(numbering_xml, 'numbering.xml'))
+
+    def _load_styles(self, root):
+        if root is None:
+            return
+        self.defaults = run_properties(root.find(f"{qn('w:docDefaults')}/{qn('w:rPrDefault')}/{qn('w:rPr')}"))
+        styles = {}
+        for style in root.iter(qn('w:style')):
+            style_id = style.get(qn('w:styleId'))
+            style_type = style.get(qn('w:type'))
+            if style_id is None or style_type not in ('paragraph', 'character'):
+                continue
+            based_on = style.find(qn('w:basedOn'))
+            styles[style_type, style_id] = (based_on.get(VAL) if based_on is not None else None,
+                                            run_properties(style.find(qn('w:rPr'))), style)
+            if style_type == 'paragraph' and style.get(qn('w:default')) in ('1', 'true'):
+                self.default_paragraph_style = style_id
+
+        def flatten(style_type, style_id, seen):
+            based_on, props, _ = styles[style_type, style_id]
+            if based_on is None or (style_type, based_on) not in styles or based_on in seen:
+                return dict(props)
+            return {**flatten(style_type, based_on, seen | {style_id}), **props}
+
+        for style_type, style_id in styles:
+            if style_type == 'character':
+                self.character_styles[style_id] = flatten(style_type, style_id, frozenset())
+                continue
+            self.paragraph_styles[style_id] = flatten(style_type, style_id, frozenset())
+            numbering = self._style_numbering(styles, style_id, frozenset())
+            if numbering is not None:
+                self.paragraph_numbering[style_id] = numbering
+
+    def _style_numbering(self, styles, style_id, seen):
+        """(numId, ilvl) a paragraph style or the styles it is based on attach to their paragraphs"""
+        based_on, _, style = styles['paragraph', style_id]
+        num_pr = style.find(f"{qn('w:pPr')}/{qn('w:numPr')}")
+        if num_pr is not None and num_pr.find(qn('w:numId')) is not None:
+            ilvl = num_pr.find(qn('w:ilvl'))
+            return num_pr.find(qn('w:numId')).get(VAL), ilvl.get(VAL) if ilvl is not None else '0'
+        if based_on is None or ('paragraph', based_on) not in styles or based_on in seen:
+            return None
+        return self._style_numbering(styles, based_on, seen | {style_id})
+
+    def _load_numbering(self, root):
+        if root is None:
+            return
+        abstract = {}
+        for abstract_num in root.iter(qn('w:abstractNum')):
+            abstract[abstract_num.get(qn('w:abstractNumId'))] = self._levels(abstract_num)
+        for num in root.iter(qn('w:num')):
+            abstract_id = num.find(qn('w:abstractNumId'))
+            levels = dict(abstract.get(abstract_id.get(VAL) if abstract_id is not None else None, {}))
+            for override in num.iter(qn('w:lvlOverride')):
+                levels.update(self._levels(override))
+            for ilvl, list_type in levels.items():
+                self.numbering[num.get(qn('w:numId')), ilvl] = list_type
+
+    def _levels(self, parent):
+        levels = {}
+        for lvl in parent.iter(qn('w:lvl')):
+            num_fmt = lvl.find(qn('w:numFmt'))
+            level_text = lvl.find(qn('w:lvlText'))
+            levels[lvl.get(qn('w:ilvl'), '0')] = number_type(
+                num_fmt.get(VAL, 'decimal') if num_fmt is not None else 'decimal',
+                level_text.get(VAL, '') if level_text is not None else '')
+        return levels
+
+    def run_attrs(self, paragraph_style, rPr):
+        """UDF formatting attributes of a run: defaults, then its paragraph and character style, then its rPr"""
+        direct = run_properties(rPr)
+        key = (paragraph_style, direct.pop('style', None))
+        if key not in self._runs:
+            props = dict(self.defaults)
+            props.update(self.paragraph_styles.get(paragraph_style or self.default_paragraph_style, {}))
+            props.update(self.character_styles.get(key[1], {}))
+            self._runs[key] = (props, style_attrs(props))
+        props, attrs = self._runs[key]
+        if not direct:
+            return attrs
+        direct_key = (key, tuple(direct.items()))
+        if direct_key not in self._attrs:
+            self._attrs[direct_key] = style_attrs({**props, **direct})
+        return self._attrs[direct_key]
+
+    def list_type(self, num_id, ilvl):
+        """UDF NumberType/BulletType of a numbering level, or None when it isn't a defined list"""
+        return self.numbering.get((num_id, ilvl))
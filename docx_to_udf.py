@@ -1,13 +1,30 @@
 import sys
 import os
-from main import main
+import argparse
+import functools
+from main import main, docx_to_udf_bytes
+from udf_io import pipe_convert, run_cli
+from timings import instrumented, add_instrumentation_args
+from memory_budget import memory_limited, add_memory_args
 
 def docx_to_udf():
-    if len(sys.argv) < 2:
-        print("Usage: python main.py input.docx")
-        sys.exit(1)
+    parser = argparse.ArgumentParser(description="Convert a DOCX file to UDF.")
+    parser.add_argument('input', help="input .docx file, or - to read from stdin")
+    parser.add_argument('-o', '--output', help="output .udf file, or - to write to stdout (default: next to the input)")
+    parser.add_argument('-j', '--workers', type=int, default=os.cpu_count() or 1, help="worker processes for large documents (default: CPU count)")
+    parser.add_argument('--no-coalesce', dest='coalesce', action='store_false', help="keep one <content> element per DOCX text run instead of merging runs with the same formatting")
+    parser.add_argument('--inline-styles', dest='share_styles', action='store_false', help="repeat the formatting on every <content> element instead of writing shared named styles")
+    parser.add_argument('--cache', metavar='DIR', help="reuse unchanged paragraphs and tables from earlier conversions cached in DIR")
+    add_instrumentation_args(parser)
+    add_memory_args(parser)
+    args = parser.parse_args()
+
+    input_file = args.input
 
-    input_file = sys.argv[1]
+    if input_file == '-' or args.output == '-':
+        convert = functools.partial(docx_to_udf_bytes, cache_dir=args.cache, workers=args.workers, coalesce=args.coalesce, share_styles=args.share_styles)
+        run_cli(pipe_convert, instrumented(memory_limited(convert, args.max_memory), args.timings, args.profile), input_file, args.output or '-')
+        return
 
     if not os.path.isfile(input_file):
         print(f"Input file not found: {input_file}")
@@ -16,8 +33,9 @@ def docx_to_udf():
     filename, ext = os.path.splitext(input_file)
 
     if ext.lower() == '.docx':
-        udf_file = filename + '.udf'
-        main(input_file, udf_file)
+        udf_file = args.output or filename + '.udf'
+        convert = functools.partial(main, cache_dir=args.cache, workers=args.workers, coalesce=args.coalesce, share_styles=args.share_styles)
+        run_cli(instrumented(memory_limited(convert, args.max_memory), args.timings, args.profile), input_file, udf_file)
     else:
         print("Please provide a .docx file.")
         sys.exit(1)
@@ -0,0 +1,150 @@
+import os
+import re
+import time
+import sqlite3
+import hashlib
+from lxml import etree
+from docx.oxml.ns import qn
+from cache import code_version
+from memory_budget import SPILL_TOKEN
+from errors import CacheError
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS elements (
+    key TEXT PRIMARY KEY,
+    text TEXT NOT NULL,
+    xml TEXT NOT NULL,
+    used INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS elements_used ON elements (used);
+'''
+
+# Entries kept after a conversion; the least recently used ones are dropped beyond this
+DEFAULT_MAX_ENTRIES = 200000
+
+# SQLite's default limit on bound parameters is 999 in older builds
+FETCH_BATCH = 500
+
+OFFSET = re.compile(r'(startOffset=")(\d+)')
+
+def rebase_offsets(element_xml, offset):
+    """Shift every startOffset in UDF element XML produced from offset 0 by `offset`"""
+    if not offset:
+        return element_xml
+    return OFFSET.sub(lambda m: m.group(1) + str(int(m.group(2)) + offset), element_xml)
+
+class ElementCache:
+    """Processed DOCX body elements keyed by their source XML, for fast reconversion of edited documents
+
+    Each entry holds an element's content text and its UDF element XML with offsets counted from 0.
+    The key covers the element's serialized XML, the bytes of every image it embeds, the document's
+    styles and numbering and the code version, so an unchanged paragraph or table is reused and
+    only edited ones are processed again.
+    Entries live in one SQLite file under cache_dir and can be shared between documents: a
+    conversion only reads while it runs and writes once, in save(), so concurrent conversions
+    don't hold each other's locks. A lookup or save the database refuses counts as a miss.
+    """
+    def __init__(self, cache_dir, max_entries=DEFAULT_MAX_ENTRIES):
+        os.makedirs(cache_dir, exist_ok=True)
+        try:
+            self.db = sqlite3.connect(os.path.join(cache_dir, 'elements.sqlite'), timeout=30)
+            self.db.executescript(SCHEMA)
+        except sqlite3.Error as e:
+            raise CacheError(f"Could not open the element cache in {cache_dir}: {e}") from e
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._pending = {}
+        self._used = set()  # keys reused by this conversion; their time is updated in save()
+        self._image_hashes = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.save()
+        self.db.close()
+        return False
+
+    def _image_hash(self, document, rId):
+        """Hash of the image behind a relationship id; rIds are renumbered when images change"""
+        if rId not in self._image_hashes:
+            self._image_hashes[rId] = hashlib.sha256(document.image_blob(rId) or b'').hexdigest()
+        return self._image_hashes[rId]
+
+    def key(self, element, document):
+        digest = hashlib.sha256(code_version().encode('utf-8'))
+        # Formatting and list types come from the document's styles and numbering as well
+        digest.update(document.styles.digest.encode('utf-8'))
+        digest.update(etree.tostring(element))
+        for blip in element.iter(qn('a:blip')):
+            rId = blip.get(qn('r:embed'))
+            if rId:
+                digest.update(f"{rId}={self._image_hash(document, rId)}".encode('utf-8'))
+        return digest.hexdigest()
+
+    def _fetch(self, keys):
+        found = {}
+        keys = list(keys)
+        if not keys:
+            return found
+        try:
+            for i in range(0, len(keys), FETCH_BATCH):
+                batch = keys[i:i + FETCH_BATCH]
+                placeholders = ','.join('?' * len(batch))
+                for key, text, xml in self.db.execute(
+                        f'SELECT key, text, xml FROM elements WHERE key IN ({placeholders})', batch):
+                    found[key] = (text, xml)
+        except sqlite3.Error as e:
+            print(f"Element cache lookup failed, processing these elements again: {e}")
+            return {}
+        return found
+
+    def convert(self, elements, document, process_many):
+        """Yield (text, element XML with offsets from 0) per body element, processing only misses
+
+        elements may be a stream; it is consumed in batches so each batch needs one cache lookup.
+        process_many(list of elements) returns their results, in order, with offsets from 0.
+        """
+        batch = []
+        for element in elements:
+            # Key it before the stream moves on, while it is still in place in the parsed tree
+            batch.append((element, self.key(element, document)))
+            if len(batch) == FETCH_BATCH:
+                yield from self._convert_batch(batch, process_many)
+                batch = []
+        yield from self._convert_batch(batch, process_many)
+
+    def _convert_batch(self, batch, process_many):
+        found = self._fetch({key for _, key in batch})
+        self._used.update(found)
+        # Repeated elements (empty paragraphs, boilerplate) are processed once
+        misses = {key: element for element, key in batch if key not in found}
+        self.hits += len(batch) - len(misses)
+        self.misses += len(misses)
+        results = process_many(list(misses.values()))
+        for key, result in zip(misses, results):
+            # Spill tokens point into this run's temporary files and can't be reused later
+            if not SPILL_TOKEN.search(result[1]):
+                self._pending[key] = result
+            found[key] = result
+        for _, key in batch:
+            yield found[key]
+
+    def save(self):
+        """Store new entries, refresh reused ones and drop the least recently used beyond max_entries"""
+        now = int(time.time())
+        try:
+            with self.db:
+                self.db.executemany('UPDATE elements SET used = ? WHERE key = ?', [(now, key) for key in self._used])
+                self.db.executemany('INSERT OR REPLACE INTO elements (key, text, xml, used) VALUES (?, ?, ?, ?)',
+                                    [(key, text, xml, now) for key, (text, xml) in self._pending.items()])
+                if self.max_entries is not None:
+                    self.db.execute('''DELETE FROM elements WHERE key IN (
+                        SELECT key FROM elements ORDER BY used DESC LIMIT -1 OFFSET ?)''', (self.max_entries,))
+        except sqlite3.Error as e:
+            # The converted document doesn't depend on the cache; only this run's entries are lost
+            print(f"Could not update the element cache: {e}")
+        self._pending = {}
+        self._used = set()
@@ -0,0 +1,35 @@
+class UdfError(Exception):
+    """Base class for errors raised by the converters"""
+
+class UdfParseError(UdfError):
+    """The input is neither a valid UDF archive nor valid UDF XML"""
+
+class MissingContentError(UdfError):
+    """The UDF has no content.xml or no <content> section"""
+
+class MissingElementsError(UdfError):
+    """The UDF XML has no <elements> section"""
+
+class DocxLoadError(UdfError):
+    """The DOCX input could not be opened"""
+
+class PdfLoadError(UdfError):
+    """The PDF input could not be opened"""
+
+class ImageDecodeError(UdfError):
+    """An image embedded in the input could not be decoded or re-encoded"""
+
+class FontNotFoundError(UdfError):
+    """The DejaVuSerif fonts needed for PDF output could not be found or loaded"""
+
+class OutputWriteError(UdfError):
+    """The converted document could not be written"""
+
+class CacheError(UdfError):
+    """The element cache database could not be opened"""
+
+class ResourceLimitError(UdfError):
+    """The input exceeds a configured resource guard (size, pixels, elements, time or memory)"""
+
+class TemplateFieldError(UdfError):
+    """A merge record has no value for a template placeholder, or its output name can't be built"""
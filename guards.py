@@ -0,0 +1,207 @@
+import os
+import time
+import signal
+import threading
+import contextlib
+import contextvars
+import multiprocessing
+from PIL import Image
+from errors import ResourceLimitError
+
+MB = 1024 * 1024
+
+# Limits for the conversion running in this context; None means no guards are active
+_limits = contextvars.ContextVar('udf_limits', default=None)
+
+class Limits:
+    """Per-document resource limits; any limit left as None is not checked"""
+    def __init__(self, max_uncompressed=None, max_ratio=None, max_pixels=None, max_elements=None,
+                 timeout=None, max_rss=None):
+        self.max_uncompressed = max_uncompressed  # bytes in one zip member
+        self.max_ratio = max_ratio  # uncompressed / compressed size of one zip member
+        self.max_pixels = max_pixels  # width * height of one image
+        self.max_elements = max_elements  # XML elements in a document
+        self.timeout = timeout  # wall-clock seconds per conversion
+        self.max_rss = max_rss  # resident memory in bytes of the converting process
+
+    def as_dict(self):
+        return dict(vars(self))
+
+def current_limits():
+    return _limits.get()
+
+@contextlib.contextmanager
+def applied(limits):
+    """Make limits visible to the guard checks called from the converters in this context"""
+    token = _limits.set(limits)
+    try:
+        yield limits
+    finally:
+        _limits.reset(token)
+
+def check_zip(z):
+    """Reject zip members that are too large or compressed suspiciously well, before reading them"""
+    limits = _limits.get()
+    if limits is None:
+        return
+    for info in z.infolist():
+        if limits.max_uncompressed is not None and info.file_size > limits.max_uncompressed:
+            raise ResourceLimitError(f"{info.filename} expands to {info.file_size / MB:.1f} MB, "
+                                     f"over the {limits.max_uncompressed / MB:.0f} MB limit")
+        # Tiny members can have large ratios legitimately
+        if (limits.max_ratio is not None and info.file_size > MB
+                and info.file_size > limits.max_ratio * max(info.compress_size, 1)):
+            raise ResourceLimitError(f"{info.filename} has a compression ratio of "
+                                     f"{info.file_size / max(info.compress_size, 1):.0f}:1, over the {limits.max_ratio}:1 limit")
+
+def read_member(z, name):
+    """Read a zip member, stopping at the size limit even if the directory understates the size"""
+    limits = _limits.get()
+    if limits is None or limits.max_uncompressed is None:
+        return z.read(name)
+    with z.open(name) as f:
+        data = f.read(limits.max_uncompressed + 1)
+    if len(data) > limits.max_uncompressed:
+        raise ResourceLimitError(f"{name} expands beyond the {limits.max_uncompressed / MB:.0f} MB limit")
+    return data
+
+def check_pixels(width, height, what='image'):
+    limits = _limits.get()
+    if limits is None or limits.max_pixels is None or width is None or height is None:
+        return
+    if width * height > limits.max_pixels:
+        raise ResourceLimitError(f"{what} is {width}x{height} ({width * height / 1e6:.0f} megapixels), "
+                                 f"over the {limits.max_pixels / 1e6:.0f} megapixel limit")
+
+def check_image(source, what='image'):
+    """Read only an image's header (path or seekable stream) and reject it if it has too many pixels"""
+    limits = _limits.get()
+    if limits is None or limits.max_pixels is None or source is None:
+        return
+    position = None if isinstance(source, (str, os.PathLike)) else source.tell()
+    try:
+        # Image.open parses the header lazily; pixel data is not decoded here
+        with Image.open(source) as img:
+            width, height = img.size
+    except Image.DecompressionBombError as e:
+        raise ResourceLimitError(f"{what}: {e}") from e
+    except Exception:
+        return  # not an image Pillow understands; the converter reports it as before
+    finally:
+        if position is not None:
+            source.seek(position)
+    check_pixels(width, height, what)
+
+def check_elements(count, what='document'):
+    limits = _limits.get()
+    if limits is not None and limits.max_elements is not None and count > limits.max_elements:
+        raise ResourceLimitError(f"{what} has {count} elements, over the {limits.max_elements} limit")
+
+def element_limit():
+    """The element limit of the conversion running in this context, or None"""
+    limits = _limits.get()
+    return limits.max_elements if limits is not None else None
+
+def _rss_bytes():
+    """Current resident set size, or None where /proc isn't available"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError, AttributeError):
+        return None
+
+class _Watchdog(threading.Thread):
+    """Interrupts the main thread when the job runs too long or uses too much memory
+
+    The interrupt is delivered as SIGALRM, which Python handles between bytecodes, and is sent
+    once: sending it again could raise inside cleanup code while the stack unwinds. If the job
+    is stuck (or swallowed the interrupt) for `grace` seconds beyond the limit and this is a pool
+    worker, the process exits so the pool can replace it. Any other process is left running,
+    since exiting would take the caller (a batch's journal and summary) down with the job;
+    guarded() fails the job when the block finishes instead.
+    """
+    def __init__(self, limits, interval=0.05, grace=10.0):
+        super().__init__(daemon=True)
+        self.limits = limits
+        self.interval = interval
+        self.grace = grace
+        self.reason = None
+        self.stopped = threading.Event()
+
+    def run(self):
+        start = time.monotonic()
+        tripped_at = None
+        while not self.stopped.wait(self.interval):
+            time_now = time.monotonic()
+            if tripped_at is None:
+                if self.limits.timeout is not None and time_now - start > self.limits.timeout:
+                    self.reason = f"conversion exceeded the {self.limits.timeout:g} s time limit"
+                elif self.limits.max_rss is not None:
+                    rss = _rss_bytes()
+                    if rss is not None and rss > self.limits.max_rss:
+                        self.reason = (f"conversion used {rss / MB:.0f} MB of memory, "
+                                       f"over the {self.limits.max_rss / MB:.0f} MB limit")
+                if self.reason:
+                    tripped_at = time_now
+                    signal.pthread_kill(threading.main_thread().ident, signal.SIGALRM)
+            elif time_now - tripped_at > self.grace:
+                if multiprocessing.parent_process() is not None:
+                    os._exit(70)
+                return
+
+@contextlib.contextmanager
+def guarded(limits):
+    """Apply limits to the conversion run inside this block, including time and memory watchdogs
+
+    Time and memory limits need signals, so they are only enforced on Unix in the main thread
+    (as in process pool workers); the other checks work everywhere. A block that completes
+    after the watchdog tripped (the interrupt was swallowed) still fails on exit.
+    """
+    with applied(limits):
+        watch = ((limits.timeout is not None or limits.max_rss is not None)
+                 and hasattr(signal, 'pthread_kill')
+                 and threading.current_thread() is threading.main_thread())
+        if not watch:
+            yield limits
+            return
+        watchdog = _Watchdog(limits)
+
+        def interrupt(signum, frame):
+            # A signal still in flight when the block exits is dropped
+            if not watchdog.stopped.is_set():
+                raise ResourceLimitError(watchdog.reason or "resource limit exceeded")
+
+        previous = signal.signal(signal.SIGALRM, interrupt)
+        watchdog.start()
+        try:
+            yield limits
+        finally:
+            watchdog.stopped.set()
+            watchdog.join()
+            signal.signal(signal.SIGALRM, previous)
+        if watchdog.reason:
+            raise ResourceLimitError(watchdog.reason)
+
+def add_guard_args(parser):
+    """Add the per-document resource limit options to a batch tool's argument parser"""
+    group = parser.add_argument_group('resource guards')
+    group.add_argument('--max-uncompressed', type=float, default=1024, metavar='MB',
+                       help="reject zip members that expand beyond MB (default: 1024)")
+    group.add_argument('--max-ratio', type=float, default=200,
+                       help="reject zip members compressed more than this ratio, i.e. zip bombs (default: 200)")
+    group.add_argument('--max-pixels', type=float, default=200, metavar='MEGAPIXELS',
+                       help="reject images larger than this, checked from the image header (default: 200)")
+    group.add_argument('--max-elements', type=int, default=2000000,
+                       help="reject documents with more XML elements than this (default: 2000000)")
+    group.add_argument('--timeout', type=float, metavar='SECONDS', help="wall-clock limit per document")
+    group.add_argument('--max-rss', type=float, metavar='MB', help="memory limit per converting process")
+
+def limits_from_args(args):
+    return Limits(
+        max_uncompressed=int(args.max_uncompressed * MB) if args.max_uncompressed else None,
+        max_ratio=args.max_ratio or None,
+        max_pixels=int(args.max_pixels * 1e6) if args.max_pixels else None,
+        max_elements=args.max_elements or None,
+        timeout=args.timeout,
+        max_rss=int(args.max_rss * MB) if args.max_rss else None,
+    )
@@ -1,9 +1,87 @@
-import base64
 from docx.oxml.ns import qn
 from PIL import Image
 import io
+import os
+import re
+import collections
+import contextlib
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from timings import span
+from memory_budget import encode_image
+from guards import check_image
+from errors import ResourceLimitError
 
-def process_image(drawing, document):
+# The image encoder for the conversion running in this context; None encodes images inline
+_encoder = contextvars.ContextVar('udf_image_encoder', default=None)
+
+# Marks where an image still being encoded goes in generated XML; NUL can't appear in real XML
+IMAGE_TOKEN = re.compile('\x00image:(\\d+)\x00')
+
+def to_png(image_bytes):
+    """Re-encode an image as PNG, or return it unchanged if Pillow can't read it"""
+    try:
+        with Image.open(io.BytesIO(image_bytes)) as img:
+            png_buffer = io.BytesIO()
+            img.save(png_buffer, format='PNG')
+            return png_buffer.getvalue()
+    except ResourceLimitError:
+        raise
+    except Exception:
+        return image_bytes
+
+class ImageEncoder:
+    """Decodes and re-encodes images on a thread pool while the text keeps being processed
+
+    Pillow releases the GIL in its codecs, so images overlap with each other and with the
+    paragraph work. process_image puts a token in the XML and resolve() swaps in the base64.
+    Finished images are base64-encoded (or spilled) as they complete, so an ImageSpill budget
+    still bounds memory.
+    """
+    def __init__(self, images=None, workers=None):
+        self.images = images
+        self.workers = workers or min(8, (os.cpu_count() or 1) + 2)
+        self.pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='udf-image')
+        self.jobs = []  # a Future until collected, then the encoded string
+        self.pending = collections.deque()  # indices of jobs not collected yet
+
+    def close(self):
+        self.pool.shutdown(cancel_futures=True)
+
+    def submit(self, image_bytes):
+        """Start encoding an image and return the token that stands for it in the XML"""
+        self.pending.append(len(self.jobs))
+        self.jobs.append(self.pool.submit(to_png, image_bytes))
+        # Don't let more than a few decoded images pile up in memory
+        self._collect(wait=len(self.pending) > self.workers * 2)
+        return f'\x00image:{len(self.jobs) - 1}\x00'
+
+    def _collect(self, wait=False):
+        """Encode finished images in order; with wait, block for the oldest one first"""
+        while self.pending and (wait or self.jobs[self.pending[0]].done()):
+            index = self.pending.popleft()
+            self.jobs[index] = encode_image(self.jobs[index].result(), self.images)
+            wait = False
+
+    def resolve(self, xml):
+        """Replace the image tokens in generated XML with the encoded images"""
+        with span('encode_images'):
+            while self.pending:
+                self._collect(wait=True)
+        return IMAGE_TOKEN.sub(lambda m: self.jobs[int(m.group(1))], xml)
+
+@contextlib.contextmanager
+def image_jobs(images=None, workers=None):
+    """Encode the images of process_image calls in this block on a thread pool; yields the encoder"""
+    encoder = ImageEncoder(images, workers)
+    token = _encoder.set(encoder)
+    try:
+        yield encoder
+    finally:
+        _encoder.reset(token)
+        encoder.close()
+
+def process_image(drawing, document, images=None):
     try:
         inline = drawing.find('.//wp:inline', namespaces={'wp': 'http://schemas.openxmlformats.org/drawingml/2006/wordprocessingDrawing'})
         anchor = drawing.find('.//wp:anchor', namespaces={'wp': 'http://schemas.openxmlformats.org/drawingml/2006/wordprocessingDrawing'})
@@ -23,21 +101,20 @@ def process_image(drawing, document):
         blip = drawing.find('.//a:blip', namespaces={'a': 'http://schemas.openxmlformats.org/drawingml/2006/main'})
         if blip is not None:
             rId = blip.get(qn('r:embed'))
-            if rId in document.part.rels:
-                image_part = document.part.rels[rId].target_part
-                image_bytes = image_part.blob
-                
-                try:
-                    with Image.open(io.BytesIO(image_bytes)) as img:
-                        png_buffer = io.BytesIO()
-                        img.save(png_buffer, format='PNG')
-                        png_bytes = png_buffer.getvalue()
-                        image_data = base64.b64encode(png_bytes).decode('utf-8')
-                except Exception:
-                    image_data = base64.b64encode(image_bytes).decode('utf-8')
-                
+            image_bytes = document.image_blob(rId)
+            if image_bytes is not None:
+                # Reject huge bitmaps from the header before Pillow decodes them
+                check_image(io.BytesIO(image_bytes))
+                encoder = _encoder.get()
+                if encoder is not None:
+                    return encoder.submit(image_bytes), width, height
+                with span('encode_images'):
+                    image_data = encode_image(to_png(image_bytes), images)
+
                 return image_data, width, height
 
+    except ResourceLimitError:
+        raise
     except Exception:
         pass
     
@@ -0,0 +1,182 @@
+import os
+import sys
+import json
+import argparse
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from udf_io import as_input, is_path, is_zip_file, find_udf_files
+from errors import MissingContentError
+
+READ_CHUNK = 1024 * 1024
+
+# Markers that change what the following bytes are: the document text or an image payload
+TEXT_START = b'<content>'
+MARKERS = (TEXT_START, b'imageData="', b'bgImageData="')
+# Element start tags counted with bytes.count between markers; runs are <content> tags with attributes
+TAGS = {'paragraph': b'<paragraph', 'table': b'<table', 'row': b'<row', 'cell': b'<cell', 'run': b'<content ',
+        'image': b'<image', 'field': b'<field', 'page_break': b'<page-break',
+        'header': b'<header', 'footer': b'<footer', 'background': b'<bgImage'}
+# Bytes held back at the end of a chunk so no marker or tag is split across chunks
+TOKEN_TAIL = 32
+
+CONTINUATION_BYTES = bytes(range(0x80, 0xC0))
+CDATA_START, CDATA_END = b'<![CDATA[', b']]>'
+
+def utf8_chars(data):
+    """Number of characters in UTF-8 bytes: every byte that isn't a continuation byte starts one"""
+    return len(data.translate(None, CONTINUATION_BYTES))
+
+class _Probe:
+    """Counting-only scanner over raw content.xml bytes; image payloads are measured, never kept"""
+    def __init__(self):
+        self.counts = dict.fromkeys(TAGS, 0)
+        self.content_length = 0
+        self.cdata = False
+        self.image_data = 0
+        self.state = None  # None, 'text' (document text) or 'data' (inside an image attribute)
+        self.buffer = b''
+
+    def count_tags(self, buffer, start, end):
+        """Count tags starting in buffer[start:end]"""
+        for name, tag in TAGS.items():
+            self.counts[name] += buffer.count(tag, start, end + len(tag) - 1)
+
+    def feed(self, chunk, final=False):
+        buffer = self.buffer + chunk
+        pos = 0
+        while pos < len(buffer):
+            if self.state == 'data':
+                end = buffer.find(b'"', pos)
+                if end < 0:
+                    self.image_data += len(buffer) - pos
+                    pos = len(buffer)
+                    break
+                self.image_data += end - pos
+                pos = end + 1
+                self.state = None
+            elif self.state == 'text':
+                end = buffer.find(b'</content>', pos)
+                if end < 0:
+                    # Hold back a possible partial closing tag, but never split a character
+                    keep = len(buffer) if final else max(pos, len(buffer) - TOKEN_TAIL)
+                    while keep < len(buffer) and 0x80 <= buffer[keep] < 0xC0:
+                        keep += 1
+                    self.content_length += utf8_chars(buffer[pos:keep])
+                    pos = keep
+                    break
+                self.content_length += utf8_chars(buffer[pos:end])
+                pos = end + len(b'</content>')
+                self.state = None
+            else:
+                limit = len(buffer) if final else len(buffer) - TOKEN_TAIL
+                # bytes.find is much faster than a regex alternation over megabytes of markup
+                found = [(buffer.find(marker, pos), marker) for marker in MARKERS]
+                start, marker = min(((i, m) for i, m in found if i >= 0), default=(-1, None))
+                if marker is None or start >= limit:
+                    self.count_tags(buffer, pos, max(pos, limit))
+                    pos = max(pos, limit)
+                    break
+                self.count_tags(buffer, pos, start)
+                pos = start + len(marker)
+                if marker == TEXT_START:
+                    # The top-level <content> holding the document text
+                    self.state = 'text'
+                    self.cdata = buffer.startswith(CDATA_START, pos)
+                    if self.cdata:
+                        pos += len(CDATA_START)
+                else:
+                    self.state = 'data'
+        self.buffer = buffer[pos:]
+
+def _probe_stream(stream):
+    probe = _Probe()
+    for chunk in iter(lambda: stream.read(READ_CHUNK), b''):
+        probe.feed(chunk)
+    probe.feed(b'', final=True)
+    return probe
+
+def inspect_udf(udf_file):
+    """Cheap facts about a UDF from the zip directory and one counting pass over content.xml
+
+    No XML tree is built and imageData payloads are only measured. content_length counts the
+    characters between <content> and </content> without the CDATA markers; it is exact for
+    CDATA-wrapped text, which is what UYAP and these converters write.
+    """
+    source = as_input(udf_file)
+    info = {'file': udf_file if is_path(udf_file) else None}
+    if is_zip_file(source):
+        with zipfile.ZipFile(source, 'r') as z:
+            try:
+                entry = z.getinfo('content.xml')
+            except KeyError:
+                raise MissingContentError("The 'content.xml' file could not be found in the UDF file.") from None
+            info.update(format='zip', members=len(z.infolist()),
+                        compressed_size=entry.compress_size, uncompressed_size=entry.file_size)
+            with z.open(entry) as content_file:
+                probe = _probe_stream(content_file)
+    else:
+        if is_path(source):
+            with open(source, 'rb') as f:
+                probe = _probe_stream(f)
+            size = os.path.getsize(source)
+        else:
+            probe = _probe_stream(source)
+            size = source.tell()
+        info.update(format='xml', members=None, compressed_size=size, uncompressed_size=size)
+
+    info.update(
+        content_length=max(probe.content_length - len(CDATA_END), 0) if probe.cdata else probe.content_length,
+        paragraphs=probe.counts['paragraph'],
+        tables=probe.counts['table'],
+        rows=probe.counts['row'],
+        cells=probe.counts['cell'],
+        runs=probe.counts['run'],
+        images=probe.counts['image'],
+        fields=probe.counts['field'],
+        page_breaks=probe.counts['page_break'],
+        image_data_chars=probe.image_data,  # base64 characters of inline and background images
+        image_bytes=probe.image_data * 3 // 4,  # decoded size estimate from the base64 length
+        has_header=probe.counts['header'] > 0,
+        has_footer=probe.counts['footer'] > 0,
+        has_background=probe.counts['background'] > 0,
+    )
+    return info
+
+def inspect_job(path):
+    """Worker wrapper that reports a broken file instead of raising"""
+    try:
+        return inspect_udf(path)
+    except Exception as e:
+        return {'file': path, 'error': f"{type(e).__name__}: {e}"}
+
+def main():
+    parser = argparse.ArgumentParser(description="Print basic facts about UDF files as JSON without parsing them fully.")
+    parser.add_argument('paths', nargs='+', help="UDF files or directories to scan recursively")
+    parser.add_argument('-j', '--workers', type=int, default=1, help="parallel worker processes for many files (default: 1)")
+    parser.add_argument('--lines', action='store_true', help="print one compact JSON object per line instead of an array")
+    args = parser.parse_args()
+
+    files = [os.path.abspath(path) for path in find_udf_files(args.paths)]
+    pool = ProcessPoolExecutor(max_workers=args.workers) if args.workers > 1 and len(files) > 1 else None
+    try:
+        if pool:
+            reports = pool.map(inspect_job, files, chunksize=max(1, min(256, len(files) // (args.workers * 4))))
+        else:
+            reports = map(inspect_job, files)
+        failed = False
+        if args.lines:
+            for report in reports:
+                failed = failed or 'error' in report
+                print(json.dumps(report, ensure_ascii=False))
+        else:
+            reports = list(reports)
+            failed = any('error' in report for report in reports)
+            print(json.dumps(reports[0] if len(reports) == 1 else reports, ensure_ascii=False, indent=2))
+    finally:
+        if pool:
+            pool.shutdown()
+    if failed:
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -1,55 +1,144 @@
-import zipfile
-from docx import Document
-from paragraph_processor import process_paragraph
+import io
+import os
+import contextlib
+from docx_reader import DocxReader
+from paragraph_processor import process_paragraph, coalesce_runs, SharedStyles
 from table_processor import process_table
+from image_processor import image_jobs
+from udf_io import is_path, write_udf
+from timings import span
+from memory_budget import ImageSpill
+from element_cache import ElementCache, rebase_offsets
+from parallel_body import BodyPool
 
-def main(docx_file, udf_file):
-    udf_template = '''<?xml version="1.0" encoding="UTF-8" ?>
+# Smaller documents convert faster than a process pool starts
+PARALLEL_MIN_BYTES = 2 * 1024 * 1024  # of uncompressed document.xml
+
+def usable_cpus():
+    """CPUs this process may run on: its affinity mask where the platform has one, else the CPU count"""
+    if hasattr(os, 'sched_getaffinity'):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+UDF_TEMPLATE = '''<?xml version="1.0" encoding="UTF-8" ?>
 <template format_id="1.8">
 <content><![CDATA[{content}]]></content>
 <properties><pageFormat mediaSizeName="1" leftMargin="42.51968479156494" rightMargin="28.34645652770996" topMargin="14.17322826385498" bottomMargin="14.17322826385498" paperOrientation="1" headerFOffset="20.0" footerFOffset="20.0" /></properties>
 <elements resolver="hvl-default">
 {elements}
 </elements>
-<styles><style name="default" description="Geçerli" family="Dialog" size="12" bold="false" italic="false" foreground="-13421773" FONT_ATTRIBUTE_KEY="javax.swing.plaf.FontUIResource[family=Dialog,name=Dialog,style=plain,size=12]" /><style name="hvl-default" family="Times New Roman" size="12" description="Gövde" /></styles>
+<styles><style name="default" description="Geçerli" family="Dialog" size="12" bold="false" italic="false" foreground="-13421773" FONT_ATTRIBUTE_KEY="javax.swing.plaf.FontUIResource[family=Dialog,name=Dialog,style=plain,size=12]" /><style name="hvl-default" family="Times New Roman" size="12" description="Gövde" />{styles}</styles>
 </template>'''
 
-    try:
-        document = Document(docx_file)
-    except Exception as e:
-        print(f"Error loading DOCX file: {e}")
-        return
+def main(docx_file, udf_file, max_memory=None, cache_dir=None, workers=1, coalesce=True, share_styles=True):
+    """Convert a DOCX (path, bytes, mmap or file-like) to UDF (path or writable binary stream)
+
+    With max_memory (bytes), encoded images beyond that budget are kept in temporary files
+    until the UDF is written. With cache_dir, processed paragraphs and tables are cached there
+    and unchanged ones are reused on the next conversion. With workers > 1, large documents are
+    processed on that many processes, at most one per usable CPU (with a single CPU the pool only adds
+    serialization); this needs the images in memory, so max_memory turns it off.
+    Adjacent runs with the same formatting are merged into one <content> unless coalesce is False.
+    Run formatting is written once per distinct combination as a named <style> that elements
+    reference by resolver, unless share_styles is False.
+    """
+    with span('read_zip'):
+        document = DocxReader(docx_file)
+    with document, ImageSpill(max_memory) as images, contextlib.ExitStack() as stack:
+        element_cache = stack.enter_context(ElementCache(cache_dir)) if cache_dir is not None else None
+        body_pool = None
+        workers = min(workers, usable_cpus())
+        if workers > 1 and max_memory is None and document.body_size >= PARALLEL_MIN_BYTES:
+            body_pool = stack.enter_context(BodyPool(document.source, process_body_element, workers))
+        stats = {}
+        udf_content = build_udf_content(document, images, element_cache, body_pool, coalesce, share_styles, stats)
+        if element_cache is not None:
+            print(f"Element cache: {element_cache.hits} reused, {element_cache.misses} processed")
+        if coalesce and stats['merged']:
+            print(f"Coalesced {stats['runs']} text runs into {stats['runs'] - stats['merged']} content elements")
+        if share_styles and stats['styles']:
+            print(f"Shared {stats['styles']} run styles")
+        write_udf(udf_content, udf_file, images)
+    if is_path(udf_file):
+        print(f"UDF file created successfully: {udf_file}")
+
+def process_body_element(element, document, current_offset, images=None):
+    """Process one paragraph or table of the document body into (text, UDF element XML)"""
+    if element.tag.endswith('tbl'):
+        return process_table(element, document, current_offset, images)
+    return process_paragraph(element, document, current_offset, images)
+
+def build_udf_content(document, images=None, element_cache=None, body_pool=None, coalesce=True,
+                      share_styles=True, stats=None):
+    """Build the content.xml text for a DocxReader"""
+    content, elements, styles = build_body(document, images, element_cache, body_pool, coalesce, share_styles, stats)
+    return UDF_TEMPLATE.format(content=content, elements=elements, styles=styles)
 
+def build_body(document, images=None, element_cache=None, body_pool=None, coalesce=True,
+               share_styles=True, stats=None):
+    """Process the document body into its content text, the joined UDF element XML and its <style> entries
+
+    stats, if given, receives the number of text runs before coalescing, how many were merged and
+    the number of shared styles.
+    """
     content = []
     elements = []
     current_offset = 0
     EMPTY_PARAGRAPH_PLACEHOLDER = '\u200B'  # Zero-width space
 
-    for element in document.element.body:
-        if element.tag.endswith('p'):  # Paragraph
-            para_text, para_elements = process_paragraph(element, document, current_offset)
-            elements.append(para_elements)
-            content.append(para_text)
-            current_offset += len(para_text)
-        elif element.tag.endswith('tbl'):  # Table
-            table_text, table_element = process_table(element, document, current_offset)
-            elements.append(table_element)
-            content.append(table_text)
-            current_offset += len(table_text)
+    # Images are encoded on a thread pool while the text is processed; their tokens are resolved below
+    with span('layout'), image_jobs(images) as encoder:
+        body = (element for element in document.body_elements()
+                if element.tag.endswith('p') or element.tag.endswith('tbl'))
+        if element_cache is not None or body_pool is not None:
+            def process_many(batch):
+                if body_pool is not None:
+                    return body_pool.process(batch)
+                results = [process_body_element(element, document, 0, images) for element in batch]
+                return [(text, encoder.resolve(element_xml)) for text, element_xml in results]
+
+            results = element_cache.convert(body, document, process_many) if element_cache is not None else process_many(body)
+            # Cached and pooled results have offsets counted from 0; shift them by the text before them
+            for text, element_xml in results:
+                elements.append(rebase_offsets(element_xml, current_offset))
+                content.append(text)
+                current_offset += len(text)
+        else:
+            for element in body:
+                text, element_xml = process_body_element(element, document, current_offset, images)
+                elements.append(element_xml)
+                content.append(text)
+                current_offset += len(text)
+            elements = [encoder.resolve(element_xml) for element_xml in elements]
+
+    if coalesce:
+        # Cached and pooled results are stored uncoalesced, so the option never changes what they hold
+        runs = merged = 0
+        for i, element_xml in enumerate(elements):
+            runs += element_xml.count('<content ')
+            elements[i], count = coalesce_runs(element_xml)
+            merged += count
+        if stats is not None:
+            stats.update(runs=runs, merged=merged)
+
+    styles = ''
+    if share_styles:
+        # Done after the cache and the pool, so their results keep inline formatting and names are per document
+        shared = SharedStyles()
+        elements = [shared.share(element_xml) for element_xml in elements]
+        styles = shared.styles_xml()
+        if stats is not None:
+            stats['styles'] = len(shared.names)
 
     # Ensure there's at least one paragraph after the table
     if not content:
         content.append(EMPTY_PARAGRAPH_PLACEHOLDER)
         elements.append(f'<paragraph Alignment="0" LeftIndent="0.0" RightIndent="0.0"><content startOffset="{current_offset}" length="1" /></paragraph>')
 
-    udf_content = udf_template.format(
-        content=''.join(content),
-        elements='\n'.join(elements)
-    )
+    return ''.join(content), '\n'.join(elements), styles
 
-    try:
-        with zipfile.ZipFile(udf_file, 'w', zipfile.ZIP_DEFLATED) as zipf:
-            zipf.writestr('content.xml', udf_content)
-        print(f"UDF file created successfully: {udf_file}")
-    except Exception as e:
-        print(f"Error creating UDF file: {e}")
+def docx_to_udf_bytes(docx_data, max_memory=None, cache_dir=None, workers=1, coalesce=True, share_styles=True):
+    """Convert DOCX bytes (or an mmap / file-like object) to UDF and return the UDF bytes"""
+    output = io.BytesIO()
+    main(docx_data, output, max_memory, cache_dir, workers, coalesce, share_styles)
+    return output.getvalue()
@@ -0,0 +1,224 @@
+import os
+import io
+import json
+import base64
+import random
+import argparse
+from xml.sax.saxutils import quoteattr
+from PIL import Image
+from docx import Document
+from docx.shared import Pt
+from udf_io import write_udf
+from udf_to_pdf import udf_to_pdf
+
+WORDS = ("dava", "davacı", "vekili", "mahkeme", "karar", "talep", "dilekçe", "madde", "kanun", "tarih",
+         "esas", "hüküm", "tebligat", "duruşma", "itiraz", "gerekçe", "delil", "tanık", "bilirkişi", "sayın")
+
+def random_text(rng, words):
+    return ' '.join(rng.choice(WORDS) for _ in range(words))
+
+def random_png(rng, width, height):
+    """Return PNG bytes of random noise, which compresses about as badly as a scanned photo"""
+    img = Image.frombytes('RGB', (width, height), rng.randbytes(width * height * 3))
+    buffer = io.BytesIO()
+    img.save(buffer, format='PNG')
+    return buffer.getvalue()
+
+class UdfBuilder:
+    """Accumulates UDF content text and element markup while tracking offsets"""
+    def __init__(self):
+        self.content = []
+        self.offset = 0
+
+    def add_text(self, text):
+        start = self.offset
+        self.content.append(text)
+        self.offset += len(text)
+        return start
+
+    def paragraph(self, rng, runs, words_per_run):
+        parts = []
+        for i in range(runs):
+            text = random_text(rng, words_per_run) + ('\n' if i == runs - 1 else ' ')
+            start = self.add_text(text)
+            bold = ' bold="true"' if i % 3 == 1 else ''
+            italic = ' italic="true"' if i % 4 == 2 else ''
+            parts.append(f'<content family="Times New Roman" size="12"{bold}{italic} startOffset="{start}" length="{len(text)}" />')
+        return f'<paragraph Alignment="3" LeftIndent="0.0" RightIndent="0.0">{"".join(parts)}</paragraph>'
+
+def make_udf(udf_file, paragraphs=100, runs=4, words_per_run=8, tables=0, rows=5, cols=3,
+             images=0, image_size=(200, 150), header=False, footer=False, background=False, seed=0):
+    """Write a synthetic UDF with the given shape and return its paragraph + table cell + image count"""
+    rng = random.Random(seed)
+    builder = UdfBuilder()
+    elements = []
+    count = 0
+
+    if header:
+        text = "T.C. " + random_text(rng, 4).upper() + '\n'
+        start = builder.add_text(text)
+        elements.append(f'<header background="-1" foreground="-16777216"><paragraph Alignment="1"><content bold="true" size="12" startOffset="{start}" length="{len(text)}" /></paragraph></header>')
+        count += 1
+    if footer:
+        text = random_text(rng, 5) + '\n'
+        start = builder.add_text(text)
+        elements.append(f'<footer background="-1" foreground="-16777216"><paragraph Alignment="0"><content size="9" startOffset="{start}" length="{len(text)}" /></paragraph></footer>')
+        count += 1
+
+    # Spread tables and images evenly through the body
+    table_every = paragraphs // tables if tables else 0
+    image_every = paragraphs // images if images else 0
+    tables_left, images_left = tables, images
+
+    for p in range(paragraphs):
+        elements.append(builder.paragraph(rng, runs, words_per_run))
+        count += 1
+
+        if tables_left and (p + 1) % max(table_every, 1) == 0:
+            row_markup = []
+            for r in range(rows):
+                cells = []
+                for c in range(cols):
+                    text = random_text(rng, 3) + '\n'
+                    start = builder.add_text(text)
+                    cells.append(f'<cell><paragraph Alignment="0"><content size="10" startOffset="{start}" length="{len(text)}" /></paragraph></cell>')
+                row_markup.append(f'<row rowName="row{r + 1}" rowType="dataRow">{"".join(cells)}</row>')
+            spans = ','.join([str(300 // cols)] * cols)
+            elements.append(f'<table tableName="Sabit" columnCount="{cols}" columnSpans="{spans}" border="borderCell">{"".join(row_markup)}</table>')
+            count += rows * cols
+            tables_left -= 1
+
+        if images_left and (p + 1) % max(image_every, 1) == 0:
+            # Each image gets its own noise so nothing downstream can dedupe them
+            image_data = base64.b64encode(random_png(rng, *image_size)).decode('ascii')
+            start = builder.add_text('\uFFFC')  # Object Replacement Character
+            elements.append(f'<paragraph Alignment="1"><image imageData="{image_data}" width="{image_size[0]}" height="{image_size[1]}" startOffset="{start}" length="1" /></paragraph>')
+            count += 1
+            images_left -= 1
+
+    properties = '<pageFormat mediaSizeName="1" leftMargin="42.51968479156494" rightMargin="28.34645652770996" topMargin="14.17322826385498" bottomMargin="14.17322826385498" paperOrientation="1" headerFOffset="20.0" footerFOffset="20.0" />'
+    if background:
+        bg_data = base64.b64encode(random_png(rng, *image_size)).decode('ascii')
+        properties += f'<bgImage bgImageData={quoteattr(bg_data)} bgImageSource="/resources/background.png" />'
+
+    udf_content = f'''<?xml version="1.0" encoding="UTF-8" ?>
+<template format_id="1.8">
+<content><![CDATA[{''.join(builder.content)}]]></content>
+<properties>{properties}</properties>
+<elements resolver="hvl-default">
+{chr(10).join(elements)}
+</elements>
+<styles><style name="default" description="Geçerli" family="Dialog" size="12" bold="false" italic="false" foreground="-13421773" /><style name="hvl-default" family="Times New Roman" size="12" description="Gövde" /></styles>
+</template>'''
+
+    write_udf(udf_content, udf_file)
+    return count
+
+def make_docx(docx_file, paragraphs=100, runs=4, words_per_run=8, tables=0, rows=5, cols=3,
+              images=0, image_size=(200, 150), header=False, footer=False, background=False, seed=0):
+    """Write a synthetic DOCX with the given shape and return its paragraph + table cell + image count"""
+    rng = random.Random(seed)
+    document = Document()
+    count = 0
+
+    if header:
+        document.sections[0].header.paragraphs[0].text = "T.C. " + random_text(rng, 4).upper()
+        count += 1
+    if footer:
+        document.sections[0].footer.paragraphs[0].text = random_text(rng, 5)
+        count += 1
+    # DOCX has no page background equivalent; the flag only affects UDF output
+
+    table_every = paragraphs // tables if tables else 0
+    image_every = paragraphs // images if images else 0
+    tables_left, images_left = tables, images
+
+    for p in range(paragraphs):
+        paragraph = document.add_paragraph()
+        for i in range(runs):
+            run = paragraph.add_run(random_text(rng, words_per_run) + ' ')
+            run.font.size = Pt(12)
+            run.bold = i % 3 == 1
+            run.italic = i % 4 == 2
+        count += 1
+
+        if tables_left and (p + 1) % max(table_every, 1) == 0:
+            table = document.add_table(rows=rows, cols=cols)
+            table.style = 'Table Grid'
+            for row in table.rows:
+                for cell in row.cells:
+                    cell.text = random_text(rng, 3)
+            count += rows * cols
+            tables_left -= 1
+
+        if images_left and (p + 1) % max(image_every, 1) == 0:
+            document.add_paragraph().add_run().add_picture(io.BytesIO(random_png(rng, *image_size)))
+            count += 1
+            images_left -= 1
+
+    document.save(docx_file)
+    return count
+
+def make_corpus(output_dir, count=1, formats=('udf', 'docx', 'pdf'), **shape):
+    """Generate `count` documents of one shape in each format and write a manifest.json next to them"""
+    os.makedirs(output_dir, exist_ok=True)
+    manifest = {'shape': {k: list(v) if isinstance(v, tuple) else v for k, v in shape.items()}, 'files': {}}
+    seed = shape.pop('seed', 0)
+
+    for i in range(count):
+        base = os.path.join(output_dir, f"bench_{i:03d}")
+        udf_file = base + '.udf'
+        elements = make_udf(udf_file, seed=seed + i, **shape)
+        manifest['files'][os.path.basename(udf_file)] = elements
+        if 'docx' in formats:
+            manifest['files'][os.path.basename(base + '.docx')] = make_docx(base + '.docx', seed=seed + i, **shape)
+        if 'pdf' in formats:
+            # Scanned-PDF input is produced by rendering the UDF, so no external files are needed
+            udf_to_pdf(udf_file, base + '.pdf')
+            manifest['files'][os.path.basename(base + '.pdf')] = elements
+        if 'udf' not in formats:
+            os.remove(udf_file)
+            del manifest['files'][os.path.basename(udf_file)]
+
+    with open(os.path.join(output_dir, 'manifest.json'), 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
+
+def parse_size(value):
+    width, height = value.lower().split('x')
+    return int(width), int(height)
+
+def add_shape_args(parser):
+    """Add the document shape options shared by make_corpus.py and benchmark.py"""
+    parser.add_argument('--paragraphs', type=int, default=200, help="body paragraphs per document (default: 200)")
+    parser.add_argument('--runs', type=int, default=4, help="formatted runs per paragraph (default: 4)")
+    parser.add_argument('--words-per-run', type=int, default=8, help="words per run (default: 8)")
+    parser.add_argument('--tables', type=int, default=2, help="tables per document (default: 2)")
+    parser.add_argument('--rows', type=int, default=10, help="rows per table (default: 10)")
+    parser.add_argument('--cols', type=int, default=4, help="columns per table (default: 4)")
+    parser.add_argument('--images', type=int, default=2, help="images per document (default: 2)")
+    parser.add_argument('--image-size', type=parse_size, default=(400, 300), help="image size as WxH pixels (default: 400x300)")
+    parser.add_argument('--header', action='store_true', help="add a header")
+    parser.add_argument('--footer', action='store_true', help="add a footer")
+    parser.add_argument('--background', action='store_true', help="add a background image (UDF only)")
+    parser.add_argument('--seed', type=int, default=0, help="random seed (default: 0)")
+
+def shape_from_args(args):
+    return dict(paragraphs=args.paragraphs, runs=args.runs, words_per_run=args.words_per_run,
+                tables=args.tables, rows=args.rows, cols=args.cols, images=args.images,
+                image_size=args.image_size, header=args.header, footer=args.footer,
+                background=args.background, seed=args.seed)
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate synthetic UDF, DOCX and PDF documents for benchmarking.")
+    parser.add_argument('output_dir', help="directory to write the corpus to")
+    parser.add_argument('--count', type=int, default=1, help="documents per format (default: 1)")
+    parser.add_argument('--formats', default='udf,docx,pdf', help="comma separated formats to generate (default: udf,docx,pdf)")
+    add_shape_args(parser)
+    args = parser.parse_args()
+
+    manifest = make_corpus(args.output_dir, args.count, tuple(args.formats.split(',')), **shape_from_args(args))
+    print(f"Generated {len(manifest['files'])} files in {args.output_dir}")
+
+if __name__ == '__main__':
+    main()
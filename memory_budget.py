@@ -0,0 +1,146 @@
+import io
+import os
+import re
+import sys
+import base64
+import binascii
+import tempfile
+import tracemalloc
+from timings import span
+from guards import check_image
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# Base64 is decoded/encoded in blocks so a payload never exists twice in memory at full size
+DECODE_CHUNK = 4 * 256 * 1024  # characters, a multiple of 4
+ENCODE_CHUNK = 3 * 256 * 1024  # bytes, a multiple of 3
+
+# Marks where a spilled image's base64 goes in generated XML; NUL can't appear in real XML
+SPILL_TOKEN = re.compile('\x00spill:(\\d+)\x00')
+
+# Attribute holding a spilled payload's file on a parsed element; no XML input can name an
+# attribute with a NUL, so a document can't point a reader at a file of its choosing
+SPILL_FILE = '\x00spill-file'
+
+class ImageSpill:
+    """Keeps image payloads in memory up to a byte budget and spills the rest to temporary files"""
+    def __init__(self, max_memory=None):
+        self.max_memory = max_memory
+        self.in_memory = 0
+        self.files = []
+        self._temp_dir = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+    def close(self):
+        if self._temp_dir is not None:
+            self._temp_dir.cleanup()
+            self._temp_dir = None
+
+    def _fits(self, size):
+        """Reserve `size` bytes of the in-memory budget if there is room left"""
+        if self.max_memory is None or self.in_memory + size <= self.max_memory:
+            self.in_memory += size
+            return True
+        return False
+
+    def _new_file(self):
+        if self._temp_dir is None:
+            self._temp_dir = tempfile.TemporaryDirectory(prefix='udf-spill-')
+        path = os.path.join(self._temp_dir.name, f"image{len(self.files)}")
+        self.files.append(path)
+        return path
+
+    def decode(self, image_data):
+        """Return a spilled file path for base64 data over budget, or None to keep it in memory"""
+        if self._fits(len(image_data)):
+            return None
+        if any(c in image_data for c in '\r\n '):
+            # Whitespace would shift the 4-character groups across chunk boundaries
+            image_data = ''.join(image_data.split())
+        path = self._new_file()
+        with open(path, 'wb') as f:
+            for i in range(0, len(image_data), DECODE_CHUNK):
+                f.write(binascii.a2b_base64(image_data[i:i + DECODE_CHUNK]))
+        return path
+
+    def encode(self, image_bytes):
+        """Return base64 text for image bytes, or a spill token resolved when the UDF is written"""
+        if self._fits((len(image_bytes) + 2) // 3 * 4):
+            return base64.b64encode(image_bytes).decode('utf-8')
+        path = self._new_file()
+        with open(path, 'wb') as f:
+            f.write(image_bytes)
+        return f'\x00spill:{len(self.files) - 1}\x00'
+
+    def write_xml(self, udf_content, stream):
+        """Write UDF XML to a binary stream, expanding spill tokens from their files in chunks"""
+        position = 0
+        for match in SPILL_TOKEN.finditer(udf_content):
+            stream.write(udf_content[position:match.start()].encode('utf-8'))
+            with open(self.files[int(match.group(1))], 'rb') as f:
+                for chunk in iter(lambda: f.read(ENCODE_CHUNK), b''):
+                    stream.write(base64.b64encode(chunk))
+            position = match.end()
+        stream.write(udf_content[position:].encode('utf-8'))
+
+def encode_image(image_bytes, images=None):
+    """Base64-encode image bytes, letting an ImageSpill keep them on disk when over budget"""
+    if images is not None:
+        return images.encode(image_bytes)
+    return base64.b64encode(image_bytes).decode('utf-8')
+
+def image_source(elem, data_attr='imageData'):
+    """Return a spill file path or a decoded in-memory stream for an element's image, or None"""
+    source = elem.get(SPILL_FILE)
+    if not source:
+        image_data = elem.get(data_attr)
+        if not image_data:
+            return None
+        with span('decode_images'):
+            source = io.BytesIO(base64.b64decode(image_data))
+    # Oversized bitmaps are rejected from their header before anything decodes the pixels
+    check_image(source)
+    return source
+
+def peak_rss_mb():
+    """Peak resident set size of this process in MB, or None where it can't be measured"""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and kilobytes elsewhere
+    return round(peak / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+
+def memory_limited(func, max_memory_mb):
+    """Wrap a converter to run with an image memory budget and report peak memory to stderr"""
+    if max_memory_mb is None:
+        return func
+
+    def wrapper(*args, **kwargs):
+        # Without the resource module fall back to tracemalloc, which only sees Python allocations
+        tracing = resource is None
+        if tracing:
+            tracemalloc.start()
+        try:
+            return func(*args, max_memory=int(max_memory_mb * 1024 * 1024), **kwargs)
+        finally:
+            if tracing:
+                peak = f"{tracemalloc.get_traced_memory()[1] / (1024 * 1024):.1f} MB (Python heap)"
+                tracemalloc.stop()
+            else:
+                peak = f"{peak_rss_mb():.1f} MB RSS"
+            print(f"Peak memory: {peak}, image budget {max_memory_mb} MB", file=sys.stderr)
+    return wrapper
+
+def add_memory_args(parser):
+    """Add the --max-memory option to a converter's argument parser"""
+    parser.add_argument('--max-memory', type=float, metavar='MB',
+                        help="keep at most MB of image data in memory, spilling the rest to temporary files")
@@ -0,0 +1,109 @@
+import threading
+import collections
+from reportlab.platypus import Paragraph
+
+# Parsed paragraphs and line breaks kept per process; boilerplate repeats across documents
+DEFAULT_MAX_ENTRIES = 4096
+
+KINDS = ('parse', 'lines')
+
+def style_key(style):
+    """Hashable summary of a ParagraphStyle: every attribute (inherited ones included) but its name"""
+    return tuple(sorted((key, repr(value)) for key, value in style.__dict__.items() if key not in ('name', 'parent')))
+
+class ParagraphCache:
+    """LRU of parsed paragraphs and their line breaks, shared by every document a process renders
+
+    An entry is keyed by the paragraph markup and style and holds reportlab's parsed fragments plus,
+    for each width it was wrapped to (the frame or cell width less the indents), the line breaks
+    and the fragments breakLines left on the paragraph. Reportlab only reads these while drawing
+    and splitting, so one entry can back any number of Paragraphs. max_entries counts distinct
+    paragraphs.
+    """
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self.entries = collections.OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = dict.fromkeys(KINDS, 0)
+        self.misses = dict.fromkeys(KINDS, 0)
+
+    def count(self, kind, hit):
+        with self.lock:
+            if hit:
+                self.hits[kind] += 1
+            else:
+                self.misses[kind] += 1
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                self.misses['parse'] += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits['parse'] += 1
+            return entry
+
+    def put(self, key, entry):
+        with self.lock:
+            self.entries[key] = entry
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def resize(self, max_entries):
+        with self.lock:
+            self.max_entries = max_entries
+            while len(self.entries) > max_entries:
+                self.entries.popitem(last=False)
+
+    def stats(self):
+        """Entry count and hit/miss counters for parsing and line breaking, with the line breaking hit rate"""
+        with self.lock:
+            lookups = self.hits['lines'] + self.misses['lines']
+            return {'entries': len(self.entries),
+                    'hits': dict(self.hits), 'misses': dict(self.misses),
+                    'hit_rate': round(self.hits['lines'] / lookups, 4) if lookups else 0.0}
+
+_shared = ParagraphCache()
+
+def shared_cache():
+    return _shared
+
+def configure(max_entries):
+    """Set the process-wide cache size; 0 turns caching off (usable as a pool initializer)"""
+    _shared.resize(max_entries)
+
+class CachedParagraph(Paragraph):
+    """Paragraph that takes its parsed fragments and line breaks from a ParagraphCache when it can
+
+    Paragraphs reportlab creates itself (the parts of a split) pass frags and are built as usual.
+    """
+    def __init__(self, text, style=None, bulletText=None, frags=None, caseSensitive=1, encoding='utf8', cache=None):
+        self._cache = cache if cache is not None and cache.max_entries > 0 and frags is None else None
+        if self._cache is None:
+            Paragraph.__init__(self, text, style, bulletText, frags, caseSensitive, encoding)
+            return
+        key = (text, style_key(style))
+        entry = self._cache.get(key)
+        if entry is None:
+            Paragraph.__init__(self, text, style, bulletText, None, caseSensitive, encoding)
+            entry = (self.text, self.style, self.frags, self.bulletText, {})
+            self._cache.put(key, entry)
+        else:
+            text, style, frags, bulletText, _ = entry
+            Paragraph.__init__(self, text, style, bulletText, frags, caseSensitive, encoding)
+        self._lines = entry[4]  # widths -> (line breaks, fragments after breaking)
+
+    def breakLines(self, width):
+        if self._cache is None:
+            return Paragraph.breakLines(self, width)
+        widths = tuple(width) if isinstance(width, (list, tuple)) else (width,)
+        broken = self._lines.get(widths)
+        self._cache.count('lines', broken is not None)
+        if broken is None:
+            # Breaking replaces frags with per-word fragments for multi-fragment paragraphs; a hit
+            # has to leave the same ones behind, as splitting and drawing read them
+            broken = self._lines[widths] = (Paragraph.breakLines(self, width), self.frags)
+        lines, self.frags = broken
+        return lines
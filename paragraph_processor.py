@@ -1,36 +1,24 @@
-from docx.oxml.ns import qn
+import re
 from image_processor import process_image
-from utils import get_alignment, get_indent_attrs, get_bullet_attrs
+from utils import get_alignment, get_indent_attrs, get_bullet_attrs, get_paragraph_style, get_font_properties
 
-def process_paragraph(paragraph, document, current_offset):
+def process_paragraph(paragraph, document, current_offset, images=None):
     EMPTY_PARAGRAPH_PLACEHOLDER = '\u200B'  # Zero-width space
     TAB_CHARACTER = '\t'  # Tab character
     
     para_text = ""
     para_elements = []
     
-    # Numaralandırma ve madde işareti özelliklerini al
-    numPr = paragraph.find('.//w:numPr', namespaces={'w': 'http://schemas.openxmlformats.org/wordprocessingml/2006/main'})
-    numbered = False
-    list_id = ""
-    list_level = ""
-    number_type = ""
-    
-    if numPr is not None:
-        ilvl = numPr.find('.//w:ilvl', namespaces={'w': 'http://schemas.openxmlformats.org/wordprocessingml/2006/main'})
-        numId = numPr.find('.//w:numId', namespaces={'w': 'http://schemas.openxmlformats.org/wordprocessingml/2006/main'})
-        if ilvl is not None and numId is not None:
-            numbered = True
-            list_id = numId.get(qn("w:val"))
-            list_level = str(int(ilvl.get(qn("w:val"))) + 1)
-            number_type = get_number_type(list_id)
-    
+    # Biçim ve numaralandırma belgenin stil dizininden çözülür
+    styles = document.styles
+    paragraph_style = get_paragraph_style(paragraph)
+
     for run in paragraph.findall('.//w:r', namespaces={'w': 'http://schemas.openxmlformats.org/wordprocessingml/2006/main'}):
         # Process images in the run
         drawing_elements = run.findall('.//w:drawing', namespaces={'w': 'http://schemas.openxmlformats.org/wordprocessingml/2006/main'})
         if drawing_elements:
             for drawing in drawing_elements:
-                image_data, width, height = process_image(drawing, document)
+                image_data, width, height = process_image(drawing, document, images)
                 if image_data:
                     # Insert a placeholder character in content
                     placeholder = '\uFFFC'  # Object Replacement Character
@@ -50,18 +38,8 @@ def process_paragraph(paragraph, document, current_offset):
         # Process text and tab characters in the run
         text = run.findtext('.//w:t', namespaces={'w': 'http://schemas.openxmlformats.org/wordprocessingml/2006/main'}) or ''
         if text or run.find('.//w:tab', namespaces={'w': 'http://schemas.openxmlformats.org/wordprocessingml/2006/main'}) is not None:
-            # Get font properties
-            font_family = run.findtext('.//w:rFonts[@w:ascii]', namespaces={'w': 'http://schemas.openxmlformats.org/wordprocessingml/2006/main'}) or "Times New Roman"
-            font_size = run.findtext('.//w:sz', namespaces={'w': 'http://schemas.openxmlformats.org/wordprocessingml/2006/main'}) or "20"
-            font_size = str(int(font_size) // 2)  # Convert half-points to points
-
-            style_attrs = [f'family="{font_family}"', f'size="{font_size}"']
-            if run.find('.//w:b', namespaces={'w': 'http://schemas.openxmlformats.org/wordprocessingml/2006/main'}) is not None:
-                style_attrs.append('bold="true"')
-            if run.find('.//w:i', namespaces={'w': 'http://schemas.openxmlformats.org/wordprocessingml/2006/main'}) is not None:
-                style_attrs.append('italic="true"')
-
-            style_attr_str = ' '.join(style_attrs)
+            # Effective font properties from the styles and the run's own rPr
+            style_attr_str = get_font_properties(run, styles, paragraph_style)
 
             # Process text and tab characters
             for child in run:
@@ -82,31 +60,70 @@ def process_paragraph(paragraph, document, current_offset):
 
     # Numaralandırma ve madde işareti özelliklerini paragraf elementine ekle
     paragraph_attrs = f'Alignment="{get_alignment(paragraph)}" {get_indent_attrs(paragraph)}'
-    if numbered:
-        if number_type.startswith("NUMBER_TYPE_"):
-            paragraph_attrs += f' Numbered="true" ListId="{list_id}" ListLevel="{list_level}" NumberType="{number_type}"'
-        else:
-            paragraph_attrs += f' Bulleted="true" ListId="{list_id}" ListLevel="{list_level}" BulletType="{number_type}"'
+    list_attrs = get_bullet_attrs(paragraph, styles, paragraph_style)
+    if list_attrs:
+        paragraph_attrs += f' {list_attrs}'
 
     paragraph_element = f'<paragraph {paragraph_attrs}>{"".join(para_elements)}</paragraph>'
     return para_text, paragraph_element
 
-def get_number_type(list_id):
-    # Bu fonksiyonu, belgenizin numaralandırma tanımlarına göre özelleştirmeniz gerekebilir
-    number_types = {
-        "1": "NUMBER_TYPE_CHAR_SMALL_DOT",
-        "2": "BULLET_TYPE_ARROW",
-        "3": "NUMBER_TYPE_ROMAN_BIG_DOT",
-        "4": "NUMBER_TYPE_CHAR_BIG_DOT",
-        "5": "NUMBER_TYPE_CHAR_SMALL_PARANTHESE",
-        "6": "NUMBER_TYPE_NUMBER_TRE",
-        "7": "NUMBER_TYPE_ROMAN_SMALL_DOT",
-        "8": "BULLET_TYPE_ELLIPSE",
-        "9": "BULLET_TYPE_RECTANGLE",
-        "10": "BULLET_TYPE_RECTANGLE_D",
-        "11": "NUMBER_TYPE_NUMBER_PARANTHESE",
-        "12": "BULLET_TYPE_DIAMOND",
-        "13": "BULLET_TYPE_TRIANGLE",
-        # Diğer numaralandırma ve madde işareti türlerini buraya ekleyin
-    }
-    return number_types.get(list_id, "NUMBER_TYPE_NUMBER_TRE")  # Varsayılan olarak NUMBER_TYPE_NUMBER_TRE kullan
+# A text run as process_paragraph writes it; the last group is its formatting attributes
+CONTENT_RUN = re.compile(r'<content startOffset="(\d+)" length="(\d+)" ([^<>]*?) />')
+
+def coalesce_runs(element_xml):
+    """Merge adjacent <content> runs that continue each other with identical formatting
+
+    Word splits text into many runs with the same visible formatting (revision ids, spell-check
+    marks), which would otherwise become one UDF element each. Returns the XML and the number of
+    runs merged away.
+    """
+    if element_xml.count('<content ') < 2:
+        return element_xml, 0
+    parts = []
+    position = 0
+    merged = 0
+    run = None  # [xml start, start offset, length, attributes] of the run being extended
+    for match in CONTENT_RUN.finditer(element_xml):
+        start, length, attrs = int(match.group(1)), int(match.group(2)), match.group(3)
+        if (run is not None and match.start() == position and attrs == run[3]
+                and start == run[1] + run[2]):
+            run[2] += length
+            merged += 1
+        else:
+            if run is not None:
+                parts.append(f'<content startOffset="{run[1]}" length="{run[2]}" {run[3]} />')
+            parts.append(element_xml[position:match.start()])
+            run = [match.start(), start, length, attrs]
+        position = match.end()
+    if run is not None:
+        parts.append(f'<content startOffset="{run[1]}" length="{run[2]}" {run[3]} />')
+    parts.append(element_xml[position:])
+    return ''.join(parts), merged
+
+# A tab's formatting comes before its offsets
+TAB_RUN = re.compile(r'<tab ([^<>]*?) startOffset="(\d+)" length="1" />')
+
+class SharedStyles:
+    """Distinct run formatting collected into named <style> entries
+
+    share() replaces the inline family/size/bold/italic of <content> and <tab> elements with a
+    resolver naming the style; readers copy the style's attributes back onto the element.
+    """
+    def __init__(self):
+        self.names = {}  # attribute string -> style name
+
+    def name(self, attrs):
+        if attrs not in self.names:
+            self.names[attrs] = f'docx-{len(self.names) + 1}'
+        return self.names[attrs]
+
+    def share(self, element_xml):
+        element_xml = CONTENT_RUN.sub(
+            lambda m: f'<content startOffset="{m.group(1)}" length="{m.group(2)}" resolver="{self.name(m.group(3))}" />',
+            element_xml)
+        return TAB_RUN.sub(
+            lambda m: f'<tab resolver="{self.name(m.group(1))}" startOffset="{m.group(2)}" length="1" />',
+            element_xml)
+
+    def styles_xml(self):
+        return ''.join(f'<style name="{name}" {attrs} />' for attrs, name in self.names.items())
@@ -0,0 +1,71 @@
+import collections
+from concurrent.futures import ProcessPoolExecutor
+from lxml import etree
+from docx_reader import DocxReader
+from udf_io import is_path
+from guards import current_limits, applied
+from image_processor import image_jobs
+
+# A chunk goes to a worker once it holds this many elements or this much serialized XML
+CHUNK_ELEMENTS = 256
+CHUNK_BYTES = 512 * 1024
+
+# Chunks queued per worker; bounds memory while keeping every worker busy
+CHUNKS_PER_WORKER = 2
+
+# Set in each worker process by _init_worker
+_document = None
+_process = None
+
+def _init_worker(docx_source, process):
+    global _document, _process
+    _document = DocxReader(docx_source)
+    _process = process
+
+def _process_chunk(chunk_xml, limits):
+    """Worker: process each element of a serialized chunk on its own, starting from offset 0"""
+    root = etree.fromstring(chunk_xml, etree.XMLParser(remove_blank_text=True, resolve_entities=False))
+    with applied(limits), image_jobs() as encoder:
+        results = [_process(element, _document, 0) for element in root]
+        return [(text, encoder.resolve(element_xml)) for text, element_xml in results]
+
+class BodyPool:
+    """Processes DOCX body elements on worker processes; results come back in order with offsets from 0
+
+    Each worker opens the DOCX once for its relationships and media. Elements are sent as serialized
+    XML in chunks, so the caller only has to shift each result by the text length before it.
+    """
+    def __init__(self, source, process, workers):
+        if not is_path(source):
+            source.seek(0)
+            source = source.read()
+        self.workers = workers
+        self.limits = current_limits()
+        self.pool = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(source, process))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.pool.shutdown(cancel_futures=True)
+        return False
+
+    def _submit(self, chunk):
+        return self.pool.submit(_process_chunk, b'<chunk>' + b''.join(chunk) + b'</chunk>', self.limits)
+
+    def process(self, elements):
+        """Yield (text, element XML with offsets from 0) for each element, in order"""
+        pending = collections.deque()
+        chunk, size = [], 0
+        for element in elements:
+            chunk.append(etree.tostring(element))
+            size += len(chunk[-1])
+            if len(chunk) >= CHUNK_ELEMENTS or size >= CHUNK_BYTES:
+                pending.append(self._submit(chunk))
+                chunk, size = [], 0
+                while len(pending) > self.workers * CHUNKS_PER_WORKER:
+                    yield from pending.popleft().result()
+        if chunk:
+            pending.append(self._submit(chunk))
+        while pending:
+            yield from pending.popleft().result()
@@ -1,12 +1,41 @@
 import sys
 import os
-import zipfile
-import base64
+import argparse
 import fitz  # PyMuPDF
 import io
 from PIL import Image
+from udf_io import as_input, is_path, write_udf, pipe_convert, run_cli
+from errors import PdfLoadError, ImageDecodeError, ResourceLimitError
+from guards import check_pixels
+from timings import span, instrumented, add_instrumentation_args
+from memory_budget import ImageSpill, encode_image, memory_limited, add_memory_args
 
-def pdf_to_udf(pdf_file, udf_file):
+def pdf_to_udf(pdf_file, udf_file, max_memory=None):
+    """Convert a PDF (path, bytes, mmap or file-like) to UDF (path or writable binary stream)
+
+    With max_memory (bytes), encoded page images beyond that budget are kept in temporary files
+    until the UDF is written.
+    """
+    try:
+        with span('read_pdf'):
+            if is_path(pdf_file):
+                pdf_document = fitz.open(pdf_file)
+            else:
+                pdf_document = fitz.open(stream=as_input(pdf_file).read(), filetype='pdf')
+    except Exception as e:
+        raise PdfLoadError(f"Error loading PDF file: {e}") from e
+
+    with ImageSpill(max_memory) as images:
+        try:
+            udf_content = build_udf_content(pdf_document, images)
+        finally:
+            pdf_document.close()
+        write_udf(udf_content, udf_file, images)
+    if is_path(udf_file):
+        print(f"UDF file created successfully: {udf_file}")
+
+def build_udf_content(pdf_document, images=None):
+    """Build the content.xml text for an open PyMuPDF document"""
     udf_template = '''<?xml version="1.0" encoding="UTF-8" ?>
 <template format_id="1.8">
 <content><![CDATA[{content}]]></content>
@@ -17,65 +46,84 @@ def pdf_to_udf(pdf_file, udf_file):
 <styles><style name="default" description="Geçerli" family="Dialog" size="12" bold="false" italic="false" foreground="-13421773" FONT_ATTRIBUTE_KEY="javax.swing.plaf.FontUIResource[family=Dialog,name=Dialog,style=plain,size=12]" /><style name="hvl-default" family="Times New Roman" size="12" description="Gövde" /></styles>
 </template>'''
 
-    try:
-        pdf_document = fitz.open(pdf_file)
-        content = []
-        elements = []
-        current_offset = 0
+    content = []
+    elements = []
+    current_offset = 0
 
-        for page_num in range(len(pdf_document)):
-            page = pdf_document[page_num]
-            
-            # Extract text
+    for page_num in range(len(pdf_document)):
+        page = pdf_document[page_num]
+        
+        # Extract text
+        with span('extract_text'):
             text = page.get_text()
-            if text:
-                content.append(text)
-                elements.append(f'<paragraph Alignment="0" LeftIndent="0.0" RightIndent="0.0"><content startOffset="{current_offset}" length="{len(text)}" /></paragraph>')
-                current_offset += len(text)
+        if text:
+            content.append(text)
+            elements.append(f'<paragraph Alignment="0" LeftIndent="0.0" RightIndent="0.0"><content startOffset="{current_offset}" length="{len(text)}" /></paragraph>')
+            current_offset += len(text)
+        
+        # Extract images
+        image_list = page.get_images(full=True)
+        for img_index, img in enumerate(image_list):
+            xref = img[0]
+            where = f"image {img_index + 1} on page {page_num + 1}"
+            with span('decode_images'):
+                try:
+                    base_image = pdf_document.extract_image(xref)
+                    image_bytes = base_image["image"]
+                except Exception as e:
+                    raise ImageDecodeError(f"Could not extract {where}: {e}") from e
+            # The PDF states the bitmap size, so oversized scans are rejected before Pillow decodes them
+            check_pixels(base_image.get("width"), base_image.get("height"), f"image on page {page_num + 1}")
+            
+            # Convert image to base64
+            with span('encode_images'):
+                try:
+                    with Image.open(io.BytesIO(image_bytes)) as image:
+                        buffered = io.BytesIO()
+                        image.save(buffered, format="PNG")
+                except ResourceLimitError:
+                    raise
+                except Exception as e:
+                    raise ImageDecodeError(f"Could not decode {where}: {e}") from e
+                img_str = encode_image(buffered.getvalue(), images)
             
-            # Extract images
-            image_list = page.get_images(full=True)
-            for img_index, img in enumerate(image_list):
-                xref = img[0]
-                base_image = pdf_document.extract_image(xref)
-                image_bytes = base_image["image"]
-                
-                # Convert image to base64
-                image = Image.open(io.BytesIO(image_bytes))
-                buffered = io.BytesIO()
-                image.save(buffered, format="PNG")
-                img_str = base64.b64encode(buffered.getvalue()).decode()
-                
-                # Add placeholder for image in content
-                placeholder = '\uFFFC'  # Object Replacement Character
-                content.append(placeholder)
-                
-                # Add image element
-                elements.append(f'<image family="Times New Roman" size="10" imageData="{img_str}" startOffset="{current_offset}" length="1" />')
-                current_offset += 1
+            # Add placeholder for image in content
+            placeholder = '\uFFFC'  # Object Replacement Character
+            content.append(placeholder)
             
-            # Add a newline between pages
-            content.append('\n')
-            elements.append(f'<paragraph Alignment="0" LeftIndent="0.0" RightIndent="0.0"><content startOffset="{current_offset}" length="1" /></paragraph>')
+            # Add image element
+            elements.append(f'<image family="Times New Roman" size="10" imageData="{img_str}" startOffset="{current_offset}" length="1" />')
             current_offset += 1
+        
+        # Add a newline between pages
+        content.append('\n')
+        elements.append(f'<paragraph Alignment="0" LeftIndent="0.0" RightIndent="0.0"><content startOffset="{current_offset}" length="1" /></paragraph>')
+        current_offset += 1
 
-        udf_content = udf_template.format(
-            content=''.join(content),
-            elements='\n'.join(elements)
-        )
+    return udf_template.format(
+        content=''.join(content),
+        elements='\n'.join(elements)
+    )
 
-        with zipfile.ZipFile(udf_file, 'w', zipfile.ZIP_DEFLATED) as zipf:
-            zipf.writestr('content.xml', udf_content)
-        print(f"UDF file created successfully: {udf_file}")
-    except Exception as e:
-        print(f"Error creating UDF file: {e}")
+def pdf_to_udf_bytes(pdf_data, max_memory=None):
+    """Convert PDF bytes (or an mmap / file-like object) to UDF and return the UDF bytes"""
+    output = io.BytesIO()
+    pdf_to_udf(pdf_data, output, max_memory)
+    return output.getvalue()
 
 def main():
-    if len(sys.argv) < 2:
-        print("Usage: python pdf_to_udf.py input.pdf")
-        sys.exit(1)
+    parser = argparse.ArgumentParser(description="Convert a scanned PDF file to UDF.")
+    parser.add_argument('input', help="input .pdf file, or - to read from stdin")
+    parser.add_argument('-o', '--output', help="output .udf file, or - to write to stdout (default: next to the input)")
+    add_instrumentation_args(parser)
+    add_memory_args(parser)
+    args = parser.parse_args()
+
+    input_file = args.input
 
-    input_file = sys.argv[1]
+    if input_file == '-' or args.output == '-':
+        run_cli(pipe_convert, instrumented(memory_limited(pdf_to_udf_bytes, args.max_memory), args.timings, args.profile), input_file, args.output or '-')
+        return
 
     if not os.path.isfile(input_file):
         print(f"Input file not found: {input_file}")
@@ -84,11 +132,11 @@ def main():
     filename, ext = os.path.splitext(input_file)
 
     if ext.lower() == '.pdf':
-        udf_file = filename + '.udf'
-        pdf_to_udf(input_file, udf_file)
+        udf_file = args.output or filename + '.udf'
+        run_cli(instrumented(memory_limited(pdf_to_udf, args.max_memory), args.timings, args.profile), input_file, udf_file)
     else:
         print("Please provide a .pdf file.")
         sys.exit(1)
 
 if __name__ == '__main__':
-    main()
\ No newline at end of file
+    main()
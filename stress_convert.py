@@ -0,0 +1,96 @@
+import sys
+import os
+import argparse
+import hashlib
+import io
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from reportlab import rl_config
+from udf_to_pdf import udf_to_pdf_bytes
+from udf_to_docx import udf_to_docx_bytes
+from udf_to_md import udf_to_markdown
+from main import docx_to_udf_bytes
+from scanned_pdf_to_udf import pdf_to_udf_bytes
+from errors import UdfError
+
+# Converters exercised for each input extension
+CONVERTERS = {
+    '.udf': [udf_to_pdf_bytes, udf_to_docx_bytes, udf_to_markdown],
+    '.docx': [docx_to_udf_bytes],
+    '.pdf': [pdf_to_udf_bytes],
+}
+
+def fingerprint(output):
+    """Hash converter output, comparing ZIP containers by member content so timestamps don't matter"""
+    if isinstance(output, str):
+        output = output.encode('utf-8')
+    if zipfile.is_zipfile(io.BytesIO(output)):
+        digest = hashlib.sha256()
+        with zipfile.ZipFile(io.BytesIO(output)) as z:
+            for name in sorted(z.namelist()):
+                digest.update(name.encode('utf-8'))
+                digest.update(hashlib.sha256(z.read(name)).digest())
+        return digest.hexdigest()
+    return hashlib.sha256(output).hexdigest()
+
+def run_job(convert, data):
+    """Run one conversion and return its fingerprint, or the error class name for bad input"""
+    try:
+        return fingerprint(convert(data))
+    except UdfError as e:
+        return type(e).__name__
+
+def stress(input_files, workers, rounds):
+    # Deterministic PDF ids and timestamps so outputs can be compared byte for byte
+    rl_config.invariant = 1
+
+    jobs = []
+    for input_file in input_files:
+        ext = os.path.splitext(input_file)[1].lower()
+        with open(input_file, 'rb') as f:
+            data = f.read()
+        # Keyed by the path as given: inputs from different folders often share a file name
+        for convert in CONVERTERS.get(ext, []):
+            jobs.append((f"{input_file}:{convert.__name__}", convert, data))
+
+    # A corrupt document must fail with a typed error without disturbing other conversions
+    jobs.append(("<corrupt>:udf_to_pdf_bytes", udf_to_pdf_bytes, b"not a udf document"))
+    jobs.append(("<corrupt>:udf_to_docx_bytes", udf_to_docx_bytes, b"not a udf document"))
+
+    # Reference results from a sequential run
+    expected = {name: run_job(convert, data) for name, convert, data in jobs}
+
+    mismatches = []
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = [(name, pool.submit(run_job, convert, data))
+                   for _ in range(rounds) for name, convert, data in jobs]
+        for name, future in futures:
+            result = future.result()
+            if result != expected[name]:
+                mismatches.append(f"{name}: expected {expected[name]}, got {result}")
+
+    return len(futures), mismatches
+
+def main():
+    parser = argparse.ArgumentParser(description="Run converters concurrently and check the results match a sequential run.")
+    parser.add_argument('inputs', nargs='+', help="sample .udf, .docx and .pdf files")
+    parser.add_argument('--workers', type=int, default=8, help="number of threads (default: 8)")
+    parser.add_argument('--rounds', type=int, default=10, help="times each job is repeated (default: 10)")
+    args = parser.parse_args()
+
+    # Converters print status lines; keep them out of the report
+    stdout = sys.stdout
+    sys.stdout = open(os.devnull, 'w')
+    try:
+        total, mismatches = stress(args.inputs, args.workers, args.rounds)
+    finally:
+        sys.stdout.close()
+        sys.stdout = stdout
+
+    for mismatch in mismatches:
+        print(f"MISMATCH {mismatch}")
+    print(f"{total} concurrent conversions on {args.workers} threads, {len(mismatches)} mismatches")
+    sys.exit(1 if mismatches else 0)
+
+if __name__ == '__main__':
+    main()
@@ -1,10 +1,25 @@
 from docx.oxml.ns import qn
 from paragraph_processor import process_paragraph
 
-def process_table(table, document, current_offset):
+TR, TC, P, TBL = qn('w:tr'), qn('w:tc'), qn('w:p'), qn('w:tbl')
+# Content controls and custom XML wrap rows, cells and paragraphs without changing the structure
+CONTAINERS = (qn('w:sdt'), qn('w:sdtContent'), qn('w:customXml'))
+
+def child_elements(parent, tags):
+    """Direct children with one of the tags, looking through content control and custom XML wrappers
+
+    Unlike a './/' search this never reaches into nested tables, so each element is visited once.
+    """
+    for child in parent:
+        if child.tag in tags:
+            yield child
+        elif child.tag in CONTAINERS:
+            yield from child_elements(child, tags)
+
+def process_table(table, document, current_offset, images=None):
     table_text = ""
     rows = []
-    grid_cols = table.findall('.//w:gridCol', namespaces={'w': 'http://schemas.openxmlformats.org/wordprocessingml/2006/main'})
+    grid_cols = table.findall('w:tblGrid/w:gridCol', namespaces={'w': 'http://schemas.openxmlformats.org/wordprocessingml/2006/main'})
     column_count = len(grid_cols)
     
     # Calculate column widths
@@ -13,7 +28,7 @@ def process_table(table, document, current_offset):
     column_spans = ",".join([str(int((width / total_width) * 300)) for width in column_widths])  # Scale to 300
 
     # Check table borders
-    tblBorders = table.find('.//w:tblBorders', namespaces={'w': 'http://schemas.openxmlformats.org/wordprocessingml/2006/main'})
+    tblBorders = table.find('w:tblPr/w:tblBorders', namespaces={'w': 'http://schemas.openxmlformats.org/wordprocessingml/2006/main'})
     border_type = "borderCell"  # Default to visible borders
     if tblBorders is not None:
         border_elements = ['top', 'left', 'bottom', 'right', 'insideH', 'insideV']
@@ -28,10 +43,10 @@ def process_table(table, document, current_offset):
         # If tblBorders is not defined, assume borderless table
         border_type = "borderNone"
 
-    for row_index, row in enumerate(table.findall('.//w:tr', namespaces={'w': 'http://schemas.openxmlformats.org/wordprocessingml/2006/main'})):
+    for row_index, row in enumerate(child_elements(table, (TR,))):
         cells = []
-        for cell in row.findall('.//w:tc', namespaces={'w': 'http://schemas.openxmlformats.org/wordprocessingml/2006/main'}):
-            cell_text, cell_elements = process_cell(cell, document, current_offset)
+        for cell in child_elements(row, (TC,)):
+            cell_text, cell_elements = process_cell(cell, document, current_offset, images)
             cells.append(f'<cell>{"".join(cell_elements)}</cell>')
             table_text += cell_text
             current_offset += len(cell_text)
@@ -42,19 +57,23 @@ def process_table(table, document, current_offset):
     return table_text, table_element
 
 
-def process_cell(cell, document, current_offset):
+def process_cell(cell, document, current_offset, images=None):
     cell_text = ""
     cell_elements = []
-    paragraphs = cell.findall('.//w:p', namespaces={'w': 'http://schemas.openxmlformats.org/wordprocessingml/2006/main'})
+    # Paragraphs and nested tables, each nested table becoming its own <table> inside the cell
+    blocks = list(child_elements(cell, (P, TBL)))
     
-    for i, paragraph in enumerate(paragraphs):
-        para_text, para_elements = process_paragraph(paragraph, document, current_offset)
+    for i, block in enumerate(blocks):
+        if block.tag == TBL:
+            para_text, para_element = process_table(block, document, current_offset, images)
+        else:
+            para_text, para_element = process_paragraph(block, document, current_offset, images)
         cell_text += para_text
-        cell_elements.extend(para_elements)
+        cell_elements.append(para_element)
         current_offset += len(para_text)
         
-        # Add a line break between paragraphs, but not after the last paragraph
-        if i < len(paragraphs) - 1 and para_text.strip():
+        # Add a line break between blocks, but not after the last one
+        if i < len(blocks) - 1 and para_text.strip():
             cell_text += '\n'
             cell_elements.append(f'<content startOffset="{current_offset}" length="1" family="Times New Roman" size="10" />')
             current_offset += 1
@@ -0,0 +1,106 @@
+import sys
+import json
+import time
+import cProfile
+import contextlib
+import contextvars
+
+# The active recorder for the current conversion; None means instrumentation is off
+_recorder = contextvars.ContextVar('udf_timings', default=None)
+
+class _NullSpan:
+    """Do-nothing span handed out when timings are disabled"""
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+_NULL_SPAN = _NullSpan()
+
+class _Span:
+    __slots__ = ('recorder', 'name', 'start')
+
+    def __init__(self, recorder, name):
+        self.recorder = recorder
+        self.name = name
+
+    def __enter__(self):
+        self.recorder.nested.append(0.0)
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        elapsed = time.perf_counter() - self.start
+        nested = self.recorder.nested
+        # Time spent in spans opened inside this one is theirs, not this span's
+        self.recorder.add(self.name, elapsed - nested.pop())
+        if nested:
+            nested[-1] += elapsed
+        return False
+
+class Timings:
+    """Accumulated wall-clock time and call count per named span
+
+    Times are exclusive: a span nested in another (decode_images inside layout, say) is only
+    counted under its own name, so the stages add up to at most the total.
+    """
+    def __init__(self):
+        self.spans = {}
+        self.nested = []  # time taken by spans nested in each open span
+
+    def add(self, name, seconds):
+        total, count = self.spans.get(name, (0.0, 0))
+        self.spans[name] = (total + seconds, count + 1)
+
+    def summary(self):
+        return {name: {'seconds': round(total, 6), 'count': count}
+                for name, (total, count) in self.spans.items()}
+
+def span(name):
+    """Time a named stage of the current conversion if timings are being collected"""
+    recorder = _recorder.get()
+    if recorder is None:
+        return _NULL_SPAN
+    return _Span(recorder, name)
+
+@contextlib.contextmanager
+def collect_timings():
+    """Collect spans recorded in this context (thread or task) into a Timings object"""
+    recorder = Timings()
+    token = _recorder.set(recorder)
+    try:
+        yield recorder
+    finally:
+        _recorder.reset(token)
+
+def instrumented(func, timings=False, profile=None):
+    """Wrap a converter to print a JSON timing summary and/or dump cProfile stats to a file"""
+    if not timings and not profile:
+        return func
+
+    def wrapper(*args, **kwargs):
+        profiler = cProfile.Profile() if profile else None
+        with collect_timings() as recorder:
+            start = time.perf_counter()
+            if profiler:
+                profiler.enable()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                if profiler:
+                    profiler.disable()
+                    profiler.dump_stats(profile)
+                recorder.add('total', time.perf_counter() - start)
+                if timings:
+                    # stderr, so the summary never mixes with converter output piped to stdout
+                    print(json.dumps(recorder.summary(), indent=2), file=sys.stderr)
+    return wrapper
+
+def add_instrumentation_args(parser):
+    """Add the --timings and --profile options to a converter's argument parser"""
+    parser.add_argument('--timings', action='store_true',
+                        help="print a JSON summary of time spent per conversion stage to stderr; "
+                             "stages exclude time in stages nested in them, so they add up to at most the total")
+    parser.add_argument('--profile', metavar='FILE',
+                        help="write cProfile stats for the conversion to FILE (read with pstats)")
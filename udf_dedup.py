@@ -0,0 +1,243 @@
+import os
+import re
+import sys
+import json
+import zlib
+import argparse
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from udf_scan import scan_udf
+from udf_io import find_udf_files
+from errors import UdfError
+
+MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+WORD = re.compile(r'\w+')
+
+# Buckets bigger than this are verified against one member instead of pairwise
+MAX_PAIRWISE_BUCKET = 50
+
+# Clusters bigger than this are scored against one member instead of a full similarity matrix
+MAX_PAIRWISE_CLUSTER = 500
+
+def permutations(num_perm, seed=1):
+    """The (a, b) parameters of the num_perm universal hash functions, shared by every worker"""
+    rng = np.random.RandomState(seed)
+    a = rng.randint(1, int(MERSENNE_PRIME), size=num_perm, dtype=np.uint64)
+    b = rng.randint(0, int(MERSENNE_PRIME), size=num_perm, dtype=np.uint64)
+    return a[:, None], b[:, None]
+
+def mulmod(a, h):
+    """a * h modulo the Mersenne prime without uint64 overflow, for a below the prime and 32-bit h
+
+    a is split at bit 32: the low half times h fits in 64 bits, the high half times h fits in 61,
+    and shifting that back up by 32 bits folds the part above bit 61 down, as 2**61 = 1 (mod p).
+    """
+    low = (a & np.uint64(0xFFFFFFFF)) * h % MERSENNE_PRIME
+    high = (a >> np.uint64(32)) * h % MERSENNE_PRIME
+    high = (high >> np.uint64(29)) + ((high & np.uint64((1 << 29) - 1)) << np.uint64(32))
+    return (low + high) % MERSENNE_PRIME
+
+def shingle_hashes(text, shingle_size):
+    """32-bit hashes of the document's word k-grams, after lowercasing and dropping punctuation"""
+    words = WORD.findall(text.lower())
+    if len(words) < shingle_size:
+        words = [' '.join(words)] if words else []
+        shingle_size = 1
+    shingles = {' '.join(words[i:i + shingle_size]) for i in range(len(words) - shingle_size + 1)}
+    return np.fromiter((zlib.crc32(s.encode('utf-8')) for s in shingles), dtype=np.uint64, count=len(shingles))
+
+def minhash(hashes, a, b, chunk=4096):
+    """MinHash signature: the minimum of each permuted hash over all shingles"""
+    if len(hashes) and int(hashes.max()) >> 32:
+        raise ValueError("shingle hashes must fit in 32 bits")
+    signature = np.full(a.shape[0], np.iinfo(np.uint64).max, dtype=np.uint64)
+    for i in range(0, len(hashes), chunk):
+        permuted = (mulmod(a, hashes[i:i + chunk]) + b) % MERSENNE_PRIME
+        np.minimum(signature, permuted.min(axis=1), out=signature)
+    return signature.astype(np.uint32)
+
+def signature_job(args):
+    """Worker: scan one UDF's text and return its MinHash signature, or None with the error"""
+    path, num_perm, shingle_size = args
+    try:
+        text, _ = scan_udf(path)
+    except (UdfError, OSError) as e:
+        return path, None, f"{type(e).__name__}: {e}"
+    hashes = shingle_hashes(text, shingle_size)
+    if not len(hashes):
+        return path, None, "empty document"
+    a, b = permutations(num_perm)
+    return path, minhash(hashes, a, b), None
+
+def self_check(num_perm=128):
+    """Compare estimated and exact Jaccard similarity on known document pairs
+
+    Returns (exact, estimated, tolerance) per pair; the tolerance is four standard errors of the estimate.
+    """
+    words = [f"w{i}" for i in range(2000)]
+    pairs = [(words[:1000], words[500:1500]),          # a third shared
+             (words[:1000], words[100:1100]),          # mostly shared
+             (words[:1000], words[:1000])]             # identical
+    a, b = permutations(num_perm)
+    results = []
+    for first, second in pairs:
+        hashes1 = shingle_hashes(' '.join(first), 1)
+        hashes2 = shingle_hashes(' '.join(second), 1)
+        exact = len(np.intersect1d(hashes1, hashes2)) / len(np.union1d(hashes1, hashes2))
+        estimated = float(np.mean(minhash(hashes1, a, b) == minhash(hashes2, a, b)))
+        tolerance = 4 * (exact * (1 - exact) / num_perm) ** 0.5
+        results.append((exact, estimated, tolerance))
+    return results
+
+def lsh_parameters(num_perm, threshold):
+    """Pick bands x rows = num_perm with the highest S-curve midpoint (1/bands)^(1/rows) not above threshold
+
+    Erring low costs a few more candidate checks; erring high would miss true pairs near the threshold.
+    """
+    options = [(bands, num_perm // bands) for bands in range(1, num_perm + 1) if num_perm % bands == 0]
+    below = [option for option in options if (1 / option[0]) ** (1 / option[1]) <= threshold]
+    return max(below or [(num_perm, 1)], key=lambda option: (1 / option[0]) ** (1 / option[1]))
+
+class DisjointSet:
+    def __init__(self, size):
+        self.parent = list(range(size))
+
+    def find(self, i):
+        while self.parent[i] != i:
+            self.parent[i] = self.parent[self.parent[i]]
+            i = self.parent[i]
+        return i
+
+    def union(self, i, j):
+        root_i, root_j = self.find(i), self.find(j)
+        if root_i != root_j:
+            self.parent[max(root_i, root_j)] = min(root_i, root_j)
+
+def similar_pairs(signatures, bands, rows, threshold):
+    """Candidate pairs from LSH band buckets, kept when their estimated Jaccard reaches threshold"""
+    groups = DisjointSet(len(signatures))
+    for band in range(bands):
+        buckets = defaultdict(list)
+        band_values = np.ascontiguousarray(signatures[:, band * rows:(band + 1) * rows])
+        for i, row in enumerate(band_values):
+            buckets[row.tobytes()].append(i)
+        for members in buckets.values():
+            if len(members) < 2:
+                continue
+            if len(members) > MAX_PAIRWISE_BUCKET:
+                # Template boilerplate can put thousands of files in one bucket; compare to one anchor
+                anchor = members[0]
+                others = np.array(members[1:])
+                scores = (signatures[others] == signatures[anchor]).mean(axis=1)
+                for other in others[scores >= threshold]:
+                    groups.union(anchor, int(other))
+                continue
+            for x in range(len(members)):
+                for y in range(x + 1, len(members)):
+                    i, j = members[x], members[y]
+                    if groups.find(i) != groups.find(j) and (signatures[i] == signatures[j]).mean() >= threshold:
+                        groups.union(i, j)
+    return groups
+
+def find_clusters(signatures, paths, threshold=0.8, bands=None, rows=None):
+    """Group near-duplicate documents and score each member against the cluster's most central one"""
+    if bands is None:
+        bands, rows = lsh_parameters(signatures.shape[1], threshold)
+    groups = similar_pairs(signatures, bands, rows, threshold)
+    members = defaultdict(list)
+    for i in range(len(paths)):
+        members[groups.find(i)].append(i)
+
+    clusters = []
+    for indices in members.values():
+        if len(indices) < 2:
+            continue
+        block = signatures[indices]
+        if len(indices) <= MAX_PAIRWISE_CLUSTER:
+            similarity = (block[:, None, :] == block[None, :, :]).mean(axis=2)
+            center = int(similarity.sum(axis=1).argmax())
+            upper = similarity[np.triu_indices(len(indices), 1)]
+        else:
+            # A full similarity matrix would not fit in memory; score against the first member
+            center = 0
+            similarity = (block == block[0]).mean(axis=1)[None, :]
+            upper = similarity[0, 1:]
+        clusters.append({
+            'size': len(indices),
+            'representative': paths[indices[center]],
+            'min_similarity': round(float(upper.min()), 3),
+            'mean_similarity': round(float(upper.mean()), 3),
+            'members': sorted(({'file': paths[i], 'similarity': round(float(similarity[center, k]), 3)}
+                               for k, i in enumerate(indices)), key=lambda m: -m['similarity']),
+        })
+    clusters.sort(key=lambda c: (-c['size'], -c['mean_similarity']))
+    return clusters
+
+def compute_signatures(files, num_perm=128, shingle_size=5, workers=1):
+    """MinHash every file on a process pool; returns (paths, signature matrix, failures)"""
+    jobs = [(path, num_perm, shingle_size) for path in files]
+    if workers > 1 and len(files) > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(signature_job, jobs, chunksize=max(1, min(64, len(jobs) // (workers * 4)))))
+    else:
+        results = [signature_job(job) for job in jobs]
+    paths, signatures, failures = [], [], {}
+    for path, signature, error in results:
+        if signature is None:
+            failures[path] = error
+        else:
+            paths.append(path)
+            signatures.append(signature)
+    matrix = np.vstack(signatures) if signatures else np.empty((0, num_perm), dtype=np.uint32)
+    return paths, matrix, failures
+
+def main():
+    parser = argparse.ArgumentParser(description="Find clusters of near-duplicate UDF documents with MinHash and LSH.")
+    parser.add_argument('paths', nargs='*', help="UDF files or directories to scan recursively")
+    parser.add_argument('--threshold', type=float, default=0.8, help="minimum estimated Jaccard similarity (default: 0.8)")
+    parser.add_argument('--num-perm', type=int, default=128, help="MinHash permutations (default: 128)")
+    parser.add_argument('--shingle', type=int, default=5, help="words per shingle (default: 5)")
+    parser.add_argument('-j', '--workers', type=int, default=os.cpu_count() or 1, help="parallel worker processes (default: CPU count)")
+    parser.add_argument('--json', metavar='FILE', help="write the clusters as JSON to FILE, or - for stdout")
+    parser.add_argument('--self-check', action='store_true', help="check the MinHash estimate against exact Jaccard similarity on known pairs and exit")
+    args = parser.parse_args()
+
+    if args.self_check:
+        failed = 0
+        for exact, estimated, tolerance in self_check(args.num_perm):
+            ok = abs(estimated - exact) <= tolerance
+            failed += not ok
+            print(f"{'OK  ' if ok else 'FAIL'} exact {exact:.3f}, estimated {estimated:.3f} (tolerance {tolerance:.3f})")
+        sys.exit(1 if failed else 0)
+    if not args.paths:
+        parser.error("no UDF files or directories given")
+
+    files = [os.path.abspath(path) for path in find_udf_files(args.paths)]
+    paths, signatures, failures = compute_signatures(files, args.num_perm, args.shingle, args.workers)
+    bands, rows = lsh_parameters(args.num_perm, args.threshold)
+    clusters = find_clusters(signatures, paths, args.threshold, bands, rows)
+
+    if args.json != '-':
+        for path, error in failures.items():
+            print(f"Skipped {path}: {error}")
+        for number, cluster in enumerate(clusters, 1):
+            print(f"Cluster {number}: {cluster['size']} files, similarity {cluster['min_similarity']}-{cluster['mean_similarity']} (min-mean)")
+            for member in cluster['members']:
+                print(f"  {member['similarity']:.3f}  {member['file']}")
+        duplicates = sum(c['size'] for c in clusters)
+        print(f"{len(paths)} documents, {len(clusters)} clusters covering {duplicates} files "
+              f"(LSH {bands} bands x {rows} rows)")
+    if args.json:
+        report = {'threshold': args.threshold, 'num_perm': args.num_perm, 'shingle': args.shingle,
+                  'bands': bands, 'rows': rows, 'documents': len(paths),
+                  'skipped': failures, 'clusters': clusters}
+        data = json.dumps(report, ensure_ascii=False, indent=2)
+        if args.json == '-':
+            print(data)
+        else:
+            with open(args.json, 'w', encoding='utf-8') as f:
+                f.write(data)
+
+if __name__ == '__main__':
+    main()
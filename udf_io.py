@@ -0,0 +1,232 @@
+import io
+import os
+import mmap
+import sys
+import contextlib
+import zipfile
+import xml.etree.ElementTree as ET
+from errors import UdfError, UdfParseError, MissingContentError, OutputWriteError
+from timings import span
+from guards import check_zip, check_elements, element_limit, read_member
+from memory_budget import SPILL_FILE
+
+def is_path(source):
+    """Check if a converter argument refers to a file on disk"""
+    return isinstance(source, (str, os.PathLike))
+
+def as_input(source):
+    """Return a path or seekable binary stream for a path, bytes, mmap or file-like object"""
+    if is_path(source):
+        return source
+    if isinstance(source, (bytes, bytearray, memoryview, mmap.mmap)):
+        return io.BytesIO(source)
+    # Regular binary files already support read/seek/tell
+    if hasattr(source, 'seek'):
+        try:
+            source.seek(0)
+            return source
+        except (OSError, ValueError):
+            pass
+    # Non-seekable streams such as pipes have to be buffered for zipfile
+    return io.BytesIO(source.read())
+
+def is_zip_file(source):
+    """Check if the input is a valid ZIP file"""
+    try:
+        with zipfile.ZipFile(source, 'r'):
+            return True
+    except zipfile.BadZipFile:
+        return False
+    finally:
+        if not is_path(source):
+            source.seek(0)
+
+def _parse_streaming(stream, spill=None):
+    """Parse UDF XML incrementally, stopping as soon as the element limit is passed
+
+    With an ImageSpill, image payloads over its memory budget are moved to spill files as they
+    are read.
+    """
+    max_elements = element_limit()
+    parser = ET.iterparse(stream, events=('start',), parser=ET.XMLParser(encoding='utf-8'))
+    count = 0
+    for event, elem in parser:
+        count += 1
+        if max_elements is not None and count > max_elements:
+            check_elements(count)
+        if spill is None:
+            continue
+        # Attributes are complete at the start event, before later images are read
+        if elem.tag == 'image':
+            data_attr = 'imageData'
+        elif elem.tag == 'bgImage':
+            data_attr = 'bgImageData'
+        else:
+            continue
+        image_data = elem.get(data_attr)
+        if image_data:
+            path = spill.decode(image_data)
+            if path:
+                del elem.attrib[data_attr]
+                elem.set(SPILL_FILE, path)
+    return parser.root
+
+# Style attributes that describe the style itself rather than the text using it
+STYLE_OWN_ATTRS = ('name', 'description', 'parent')
+
+def resolve_styles(root):
+    """Copy the attributes of named <style> entries onto the elements that reference them by resolver
+
+    A style inherits what it doesn't set from its parent style. Attributes set on the element itself
+    win, so readers can look formatting up on the element alone.
+    """
+    styles_element = root.find('styles')
+    elements_element = root.find('elements')
+    if styles_element is None or elements_element is None:
+        return
+    defined = {style.get('name'): style for style in styles_element.findall('style')}
+    resolved = {}
+
+    def effective(name, seen=()):
+        if name not in resolved:
+            style = defined[name]
+            attrs = {}
+            parent = style.get('parent')
+            if parent in defined and parent not in seen:
+                attrs.update(effective(parent, seen + (name,)))
+            attrs.update((key, value) for key, value in style.attrib.items() if key not in STYLE_OWN_ATTRS)
+            resolved[name] = list(attrs.items())
+        return resolved[name]
+
+    for elem in elements_element.iter():
+        name = elem.get('resolver')
+        if name is None or elem is elements_element or name not in defined:
+            continue
+        for key, value in effective(name):
+            if key not in elem.attrib:
+                elem.set(key, value)
+
+def find_udf_files(paths):
+    """Expand files and directories (recursively, in sorted order) into the .udf files to process"""
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            for dirpath, dirnames, filenames in os.walk(path):
+                dirnames.sort()
+                files.extend(os.path.join(dirpath, name) for name in sorted(filenames)
+                             if name.lower().endswith('.udf'))
+        else:
+            files.append(path)
+    return files
+
+def load_udf_root(udf_file, spill=None):
+    """Parse the UDF XML from a path, bytes, mmap or file-like object and return its root element
+
+    With an ImageSpill that has a memory budget, the XML is parsed incrementally and image
+    payloads over the budget are decoded to temporary files, referenced by an internal attribute
+    (memory_budget.SPILL_FILE) that the document itself cannot set.
+    Named styles referenced by resolver are applied to the elements.
+    """
+    root = _parse_udf_root(udf_file, spill)
+    with span('parse_xml'):
+        resolve_styles(root)
+    return root
+
+def _parse_udf_root(udf_file, spill):
+    source = as_input(udf_file)
+    name = udf_file if is_path(udf_file) else 'input'
+    streaming = spill is not None and spill.max_memory is not None
+
+    # Check if the file is a ZIP file
+    if is_zip_file(source):
+        # Process as a ZIP file
+        with zipfile.ZipFile(source, 'r') as z:
+            if 'content.xml' not in z.namelist():
+                raise MissingContentError("The 'content.xml' file could not be found in the UDF file.")
+            check_zip(z)
+            if streaming:
+                # Parse straight from the decompressing stream instead of buffering content.xml
+                with span('parse_xml'), z.open('content.xml') as content_file:
+                    try:
+                        return _parse_streaming(content_file, spill)
+                    except ET.ParseError as e:
+                        raise UdfParseError(f"content.xml in {name} is not valid XML: {e}") from e
+            with span('read_zip'):
+                content_data = read_member(z, 'content.xml')
+        with span('parse_xml'):
+            try:
+                if element_limit() is not None:
+                    return _parse_streaming(io.BytesIO(content_data))
+                tree = ET.parse(io.BytesIO(content_data), parser=ET.XMLParser(encoding='utf-8'))
+            except ET.ParseError as e:
+                raise UdfParseError(f"content.xml in {name} is not valid XML: {e}") from e
+    else:
+        # Process as an XML file directly
+        with span('parse_xml'):
+            try:
+                if streaming or element_limit() is not None:
+                    return _parse_streaming(source, spill if streaming else None)
+                tree = ET.parse(source, parser=ET.XMLParser(encoding='utf-8'))
+            except ET.ParseError as e:
+                raise UdfParseError(f"The file {name} is neither a valid ZIP nor a valid XML file.") from e
+
+    return tree.getroot()
+
+def load_content_text(root):
+    """Return the raw document text stored in the <content> section"""
+    content_element = root.find('content')
+    if content_element is None:
+        raise MissingContentError("'content' could not be found in the XML.")
+    content_text = content_element.text or ''
+    if content_text.startswith('<![CDATA[') and content_text.endswith(']]>'):
+        content_text = content_text[9:-3]
+    return content_text
+
+def write_udf(udf_content, udf_file, spill=None):
+    """Write content.xml into a UDF archive at a path or into a writable binary stream
+
+    Images that an ImageSpill moved to temporary files are streamed back in from disk.
+    """
+    try:
+        with span('write_output'), zipfile.ZipFile(udf_file, 'w', zipfile.ZIP_DEFLATED) as zipf:
+            if spill is not None and spill.files:
+                with zipf.open('content.xml', 'w', force_zip64=True) as content_file:
+                    spill.write_xml(udf_content, content_file)
+            else:
+                zipf.writestr('content.xml', udf_content)
+    except OSError as e:
+        raise OutputWriteError(f"Error creating UDF file: {e}") from e
+
+def read_input(path):
+    """Read CLI input bytes from a file, or from stdin when path is '-'"""
+    if path == '-':
+        return sys.stdin.buffer.read()
+    with open(path, 'rb') as f:
+        return f.read()
+
+def write_output(data, path):
+    """Write CLI output bytes to a file, or to stdout when path is '-'"""
+    if isinstance(data, str):
+        data = data.encode('utf-8')
+    if path == '-':
+        sys.stdout.buffer.write(data)
+        sys.stdout.buffer.flush()
+    else:
+        with open(path, 'wb') as f:
+            f.write(data)
+
+def pipe_convert(convert, input_path, output_path):
+    """Run a bytes-in/bytes-out converter between files or stdin/stdout ('-')"""
+    data = read_input(input_path)
+    # Keep status messages off stdout so they don't corrupt piped output
+    with contextlib.redirect_stdout(sys.stderr):
+        result = convert(data)
+    write_output(result, output_path)
+
+def run_cli(func, *args):
+    """Call a converter from a CLI entry point, turning conversion errors into exit code 1"""
+    try:
+        return func(*args)
+    except UdfError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(1)
@@ -0,0 +1,249 @@
+import os
+import re
+import csv
+import sys
+import json
+import bisect
+import argparse
+import xml.etree.ElementTree as ET
+from concurrent.futures import ProcessPoolExecutor
+from main import UDF_TEMPLATE, build_body
+from docx_reader import DocxReader
+from udf_io import write_udf
+from errors import UdfError, TemplateFieldError
+
+# {{alan}} in the template text; the name may be surrounded by spaces
+PLACEHOLDER = re.compile(r'\{\{\s*([^{}\s]+)\s*\}\}')
+
+# Markers for the offset slots in the serialized skeleton; control characters can't occur in UDF XML
+SLOT = re.compile('\x01(\\d+)\x01')
+
+# Characters XML 1.0 does not allow, dropped from record values
+INVALID_XML_CHARS = re.compile('[\x00-\x08\x0b\x0c\x0e-\x1f]')
+
+UNSAFE_NAME_CHARS = re.compile(r'[\\/:*?"<>|\x00-\x1f]')
+
+def cdata_safe(text):
+    """Split ']]>' across two CDATA sections so text can't end the section early"""
+    return text.replace(']]>', ']]]]><![CDATA[>')
+
+class Skeleton:
+    """A template DOCX converted once to UDF, with {{name}} placeholders turned into slots
+
+    Each placeholder becomes a <field fieldName="name"> element carrying the formatting of the run
+    it starts in; runs that Word split a placeholder across are cut at its edges. Rendering a record
+    only joins precomputed text and XML pieces and shifts the offsets after each filled-in value,
+    so image payloads and formatting are encoded once for all records.
+    """
+    def __init__(self, content, elements_xml, styles_xml=''):
+        self.styles_xml = styles_xml
+        self.placeholders = [(m.start(), m.end(), m.group(1)) for m in PLACEHOLDER.finditer(content)]
+        self.fields = [name for _, _, name in self.placeholders]
+        # The template text around the placeholders
+        self.text_parts = []
+        position = 0
+        for start, end, _ in self.placeholders:
+            self.text_parts.append(content[position:start])
+            position = end
+        self.text_parts.append(content[position:])
+        self.text_parts = [cdata_safe(part) for part in self.text_parts]
+        self.slots = []  # (kind, value, placeholder index) per offset slot in the XML
+        parts = SLOT.split(self._mark_slots(elements_xml))
+        self.xml_parts = parts[::2]
+        # Put the slots in the order they appear in the serialized XML
+        self.slots = [self.slots[int(number)] for number in parts[1::2]]
+
+    def _add_slot(self, kind, value, index):
+        self.slots.append((kind, value, index))
+        return f'\x01{len(self.slots) - 1}\x01'
+
+    def _mark_slots(self, elements_xml):
+        """Split runs at placeholder edges, insert the fields and replace every offset with a slot marker"""
+        root = ET.fromstring(f'<elements>{elements_xml}</elements>')
+        starts = [start for start, _, _ in self.placeholders]
+        ends = [end for _, end, _ in self.placeholders]
+        for parent in list(root.iter()):
+            children = list(parent)
+            if not any('startOffset' in child.attrib for child in children):
+                continue
+            new_children = []
+            for child in children:
+                if 'startOffset' not in child.attrib:
+                    new_children.append(child)
+                    continue
+                start = int(child.get('startOffset'))
+                end = start + int(child.get('length', '0'))
+                first = bisect.bisect_right(ends, start)
+                last = bisect.bisect_left(starts, end)
+                if child.tag != 'content' or first >= last:
+                    # Outside every placeholder: only shifted by the values before it
+                    child.set('startOffset', self._add_slot('shift', start, first))
+                    new_children.append(child)
+                    continue
+                cuts = sorted({start, end} | {p for i in range(first, last) for p in self.placeholders[i][:2]
+                                              if start < p < end})
+                for a, b in zip(cuts, cuts[1:]):
+                    index = bisect.bisect_right(ends, a)
+                    inside = index < len(starts) and starts[index] <= a
+                    if inside and a != starts[index]:
+                        continue  # rest of a placeholder that began in an earlier run
+                    piece = ET.Element('field' if inside else 'content', child.attrib)
+                    if inside:
+                        piece.set('fieldName', self.fields[index])
+                        piece.set('startOffset', self._add_slot('shift', a, index))
+                        piece.set('length', self._add_slot('value', 0, index))
+                    else:
+                        piece.set('startOffset', self._add_slot('shift', a, index))
+                        piece.set('length', str(b - a))
+                    new_children.append(piece)
+            parent[:] = new_children
+        xml = ET.tostring(root, encoding='unicode')
+        return xml[len('<elements>'):-len('</elements>')]
+
+    def values(self, record):
+        """The record's value for each placeholder, as XML-safe text"""
+        values = []
+        for name in self.fields:
+            value = record.get(name)
+            if value is None:
+                raise TemplateFieldError(f"no value for '{name}'")
+            values.append(INVALID_XML_CHARS.sub('', str(value)))
+        return values
+
+    def render(self, record):
+        """content.xml text for one record"""
+        values = self.values(record)
+        # shift[i]: how far text after the first i placeholders moves
+        shift = [0]
+        for (start, end, _), value in zip(self.placeholders, values):
+            shift.append(shift[-1] + len(value) - (end - start))
+        text = [self.text_parts[0]]
+        for value, part in zip(values, self.text_parts[1:]):
+            text.append(cdata_safe(value))
+            text.append(part)
+        xml = [self.xml_parts[0]]
+        for (kind, value, index), part in zip(self.slots, self.xml_parts[1:]):
+            xml.append(str(value + shift[index]) if kind == 'shift' else str(len(values[index])))
+            xml.append(part)
+        return UDF_TEMPLATE.format(content=''.join(text), elements=''.join(xml), styles=self.styles_xml)
+
+def compile_template(docx_file):
+    """Convert a template DOCX once into a Skeleton"""
+    with DocxReader(docx_file) as document:
+        return Skeleton(*build_body(document))
+
+def load_records(data_file):
+    """Records from a CSV (comma, semicolon or tab separated), a JSON array or JSON lines file
+
+    A JSON record that isn't an object is returned as a TemplateFieldError in its place, so it
+    fails on its own like a record with a missing field.
+    """
+    ext = os.path.splitext(data_file)[1].lower()
+    if ext == '.csv':
+        # utf-8-sig drops the byte order mark Excel writes
+        with open(data_file, encoding='utf-8-sig', newline='') as f:
+            sample = f.read(64 * 1024)
+            f.seek(0)
+            try:
+                dialect = csv.Sniffer().sniff(sample, delimiters=',;\t')
+            except csv.Error:
+                dialect = csv.excel
+            return list(csv.DictReader(f, dialect=dialect))
+    with open(data_file, encoding='utf-8-sig') as f:
+        if ext == '.jsonl':
+            records = [json.loads(line) for line in f if line.strip()]
+        else:
+            records = json.load(f)
+    if not isinstance(records, list):
+        raise TemplateFieldError(f"{data_file} must contain a JSON array of objects")
+    return [record if isinstance(record, dict)
+            else TemplateFieldError(f"expected a JSON object, got {type(record).__name__}")
+            for record in records]
+
+def output_name(pattern, number, record):
+    """File name for a record from a pattern like '{dosya_no}.udf'; {n} is the record number"""
+    safe = {key: UNSAFE_NAME_CHARS.sub('_', str(value)) for key, value in record.items()}
+    try:
+        name = pattern.format_map({**safe, 'n': number})
+    except (KeyError, ValueError, IndexError) as e:
+        raise TemplateFieldError(f"output name pattern {pattern!r}: {e}") from e
+    return name if name.lower().endswith('.udf') else name + '.udf'
+
+_skeleton = None
+
+def _init_worker(skeleton):
+    global _skeleton
+    _skeleton = skeleton
+
+def render_job(job):
+    """Worker: write one record's UDF; returns the output path and (record number, error) or None"""
+    number, record, output_file = job
+    try:
+        write_udf(_skeleton.render(record), output_file)
+    except UdfError as e:
+        return output_file, (number, str(e))
+    return output_file, None
+
+def merge(template_file, data_file, output_dir, name_pattern='{n:05d}.udf', workers=1):
+    """Write one UDF per record of data_file into output_dir; returns the number written and the errors, in record order"""
+    skeleton = compile_template(template_file)
+    if not skeleton.fields:
+        print(f"Warning: no {{{{field}}}} placeholders found in {template_file}")
+    records = load_records(data_file)
+    os.makedirs(output_dir, exist_ok=True)
+
+    jobs, errors, seen = [], [], set()
+    for number, record in enumerate(records, 1):
+        if isinstance(record, TemplateFieldError):
+            errors.append((number, str(record)))
+            continue
+        try:
+            path = os.path.join(output_dir, output_name(name_pattern, number, record))
+        except TemplateFieldError as e:
+            errors.append((number, str(e)))
+            continue
+        if path in seen:
+            errors.append((number, f"output name {os.path.basename(path)} is already used"))
+            continue
+        seen.add(path)
+        jobs.append((number, record, path))
+
+    if workers > 1 and len(jobs) > 1:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(skeleton,)) as pool:
+            results = list(pool.map(render_job, jobs, chunksize=max(1, min(64, len(jobs) // (workers * 4)))))
+    else:
+        _init_worker(skeleton)
+        results = [render_job(job) for job in jobs]
+    errors.extend(error for _, error in results if error)
+    errors.sort()
+    return sum(1 for _, error in results if not error), [f"record {number}: {message}" for number, message in errors]
+
+def main():
+    parser = argparse.ArgumentParser(description="Fill a DOCX template with {{field}} placeholders from CSV/JSON records, writing one UDF per record.")
+    parser.add_argument('template', help="template .docx file")
+    parser.add_argument('data', nargs='?', help="records as .csv, .json (array of objects) or .jsonl")
+    parser.add_argument('-o', '--output-dir', default='.', help="directory for the UDF files (default: current directory)")
+    parser.add_argument('--name', default='{n:05d}.udf', help="output file name pattern using record fields, e.g. '{dosya_no}.udf'; {n} is the record number (default: {n:05d}.udf)")
+    parser.add_argument('-j', '--workers', type=int, default=os.cpu_count() or 1, help="parallel worker processes (default: CPU count)")
+    parser.add_argument('--list-fields', action='store_true', help="print the template's placeholders and exit")
+    args = parser.parse_args()
+
+    try:
+        if args.list_fields:
+            for name in dict.fromkeys(compile_template(args.template).fields):
+                print(name)
+            return
+        if not args.data:
+            parser.error("the data file is required")
+        written, errors = merge(args.template, args.data, args.output_dir, args.name, args.workers)
+    except (UdfError, OSError, ValueError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(1)
+    for error in errors:
+        print(f"FAILED {error}")
+    print(f"{written} UDF files written to {args.output_dir}, {len(errors)} failed")
+    if errors:
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
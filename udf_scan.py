@@ -0,0 +1,87 @@
+import zipfile
+import xml.parsers.expat
+from udf_io import as_input, is_path, is_zip_file
+from errors import UdfParseError, MissingContentError
+
+READ_CHUNK = 256 * 1024
+
+class _TextScanner:
+    """Expat handlers that keep only the <content> text and each paragraph's offset range"""
+    def __init__(self):
+        self.depth = 0
+        self.in_content = False
+        self.found_content = False
+        self.text = []
+        self.paragraphs = []
+        self.paragraph = None  # [start, end] of the open paragraph
+
+    def start(self, tag, attrs):
+        self.depth += 1
+        if tag == 'content' and self.depth == 2:
+            # The document text; <content> elements deeper down are runs pointing into it
+            self.in_content = self.found_content = True
+        elif tag == 'paragraph':
+            self.paragraph = [None, None]
+        elif self.paragraph is not None and 'startOffset' in attrs:
+            try:
+                start = int(attrs['startOffset'])
+                end = start + int(attrs.get('length', '0'))
+            except ValueError:
+                return
+            if self.paragraph[0] is None or start < self.paragraph[0]:
+                self.paragraph[0] = start
+            if self.paragraph[1] is None or end > self.paragraph[1]:
+                self.paragraph[1] = end
+
+    def end(self, tag):
+        if tag == 'content' and self.depth == 2:
+            self.in_content = False
+        elif tag == 'paragraph' and self.paragraph is not None:
+            if self.paragraph[0] is not None:
+                self.paragraphs.append(tuple(self.paragraph))
+            self.paragraph = None
+        self.depth -= 1
+
+    def data(self, text):
+        if self.in_content:
+            self.text.append(text)
+
+def _scan_stream(stream, name):
+    scanner = _TextScanner()
+    parser = xml.parsers.expat.ParserCreate('utf-8')
+    parser.buffer_text = True
+    parser.StartElementHandler = scanner.start
+    parser.EndElementHandler = scanner.end
+    parser.CharacterDataHandler = scanner.data
+    try:
+        for chunk in iter(lambda: stream.read(READ_CHUNK), b''):
+            parser.Parse(chunk, False)
+        parser.Parse(b'', True)
+    except xml.parsers.expat.ExpatError as e:
+        raise UdfParseError(f"content.xml in {name} is not valid XML: {e}") from e
+    if not scanner.found_content:
+        raise MissingContentError("'content' could not be found in the XML.")
+    content_text = ''.join(scanner.text)
+    if content_text.startswith('<![CDATA[') and content_text.endswith(']]>'):
+        content_text = content_text[9:-3]
+    return content_text, scanner.paragraphs
+
+def scan_udf(udf_file, name=None):
+    """Stream a UDF's content.xml and return its text and the (start, end) offsets of each paragraph
+
+    Nothing but the text is kept: no element tree is built and image data is never decoded,
+    which makes this much cheaper than load_udf_root for indexing and search. name is used in
+    error messages when udf_file isn't a path.
+    """
+    source = as_input(udf_file)
+    name = udf_file if is_path(udf_file) else name or 'input'
+    if is_zip_file(source):
+        with zipfile.ZipFile(source, 'r') as z:
+            if 'content.xml' not in z.namelist():
+                raise MissingContentError("The 'content.xml' file could not be found in the UDF file.")
+            with z.open('content.xml') as content_file:
+                return _scan_stream(content_file, name)
+    if is_path(source):
+        with open(source, 'rb') as f:
+            return _scan_stream(f, name)
+    return _scan_stream(source, name)
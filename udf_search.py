@@ -0,0 +1,182 @@
+import os
+import sys
+import json
+import sqlite3
+import hashlib
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+from udf_scan import scan_udf
+from udf_io import find_udf_files
+from errors import UdfError
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS files (
+    id INTEGER PRIMARY KEY,
+    path TEXT UNIQUE NOT NULL,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    sha256 TEXT NOT NULL
+);
+CREATE VIRTUAL TABLE IF NOT EXISTS paragraphs USING fts5(
+    text, file_id UNINDEXED, paragraph UNINDEXED, start UNINDEXED,
+    tokenize = 'unicode61 remove_diacritics 2'
+);
+'''
+
+# Highlight markers used to recover hit offsets; control characters never occur in UDF text
+HIT_START, HIT_END = '\x02', '\x03'
+
+def open_index(db_file):
+    db = sqlite3.connect(db_file)
+    db.executescript(SCHEMA)
+    return db
+
+def extract(path):
+    """Worker: hash a UDF and split its text into paragraphs, or return the error message"""
+    try:
+        # Read once: the same bytes are hashed and scanned
+        with open(path, 'rb') as f:
+            data = f.read()
+        text, paragraphs = scan_udf(data, path)
+    except (UdfError, OSError) as e:
+        return path, None, f"{type(e).__name__}: {e}"
+    rows = [(number, start, text[start:end]) for number, (start, end) in enumerate(paragraphs, 1)]
+    return path, hashlib.sha256(data).hexdigest(), rows
+
+def update_index(db, paths, workers=1, prune=False):
+    """Index new and changed UDFs under paths; unchanged files (same size and mtime) are skipped"""
+    counts = {'indexed': 0, 'unchanged': 0, 'failed': 0, 'removed': 0}
+    known = {path: (file_id, size, mtime_ns, sha256)
+             for file_id, path, size, mtime_ns, sha256 in db.execute('SELECT id, path, size, mtime_ns, sha256 FROM files')}
+    files = [os.path.abspath(path) for path in find_udf_files(paths)]
+
+    stale = []
+    for path in files:
+        stat = os.stat(path)
+        entry = known.get(path)
+        if entry and entry[1] == stat.st_size and entry[2] == stat.st_mtime_ns:
+            counts['unchanged'] += 1
+        else:
+            stale.append(path)
+
+    def store(path, sha256, rows):
+        stat = os.stat(path)
+        entry = known.get(path)
+        if entry and entry[3] == sha256:
+            # Touched but not modified: only the stat fields change
+            db.execute('UPDATE files SET size = ?, mtime_ns = ? WHERE id = ?', (stat.st_size, stat.st_mtime_ns, entry[0]))
+            counts['unchanged'] += 1
+            return
+        if entry:
+            db.execute('DELETE FROM paragraphs WHERE file_id = ?', (entry[0],))
+            db.execute('UPDATE files SET size = ?, mtime_ns = ?, sha256 = ? WHERE id = ?',
+                       (stat.st_size, stat.st_mtime_ns, sha256, entry[0]))
+            file_id = entry[0]
+        else:
+            file_id = db.execute('INSERT INTO files (path, size, mtime_ns, sha256) VALUES (?, ?, ?, ?)',
+                                 (path, stat.st_size, stat.st_mtime_ns, sha256)).lastrowid
+        db.executemany('INSERT INTO paragraphs (text, file_id, paragraph, start) VALUES (?, ?, ?, ?)',
+                       [(text, file_id, number, start) for number, start, text in rows])
+        counts['indexed'] += 1
+
+    with db:
+        if workers > 1 and len(stale) > 1:
+            pool = ProcessPoolExecutor(max_workers=workers)
+            results = pool.map(extract, stale, chunksize=max(1, min(32, len(stale) // (workers * 4))))
+        else:
+            pool = None
+            results = map(extract, stale)
+        try:
+            for path, sha256, rows in results:
+                if sha256 is None:
+                    print(f"FAILED {path}: {rows}")
+                    counts['failed'] += 1
+                else:
+                    store(path, sha256, rows)
+        finally:
+            if pool:
+                pool.shutdown()
+
+        if prune:
+            present = set(files)
+            for path, (file_id, _, _, _) in known.items():
+                if path not in present and not os.path.exists(path):
+                    db.execute('DELETE FROM paragraphs WHERE file_id = ?', (file_id,))
+                    db.execute('DELETE FROM files WHERE id = ?', (file_id,))
+                    counts['removed'] += 1
+    return counts
+
+def hit_offsets(marked):
+    """Turn highlight()-marked paragraph text into (start, end) offsets within the paragraph"""
+    hits = []
+    position = 0
+    start = None
+    for char in marked:
+        if char == HIT_START:
+            start = position
+        elif char == HIT_END:
+            hits.append((start, position))
+        else:
+            position += 1
+    return hits
+
+def search(db, query, limit=50):
+    """Run an FTS5 query and return hits with file, paragraph number and absolute content offsets
+
+    Offsets are in the same coordinates as the startOffset attributes of the UDF's elements,
+    so a hit can be mapped back to the runs it falls in for highlighting.
+    """
+    rows = db.execute(f'''
+        SELECT files.path, paragraphs.paragraph, paragraphs.start,
+               highlight(paragraphs, 0, '{HIT_START}', '{HIT_END}'), paragraphs.text
+        FROM paragraphs JOIN files ON files.id = paragraphs.file_id
+        WHERE paragraphs MATCH ? ORDER BY rank LIMIT ?''', (query, limit))
+    results = []
+    for path, number, start, marked, text in rows:
+        matches = [{'start': start + a, 'end': start + b, 'text': text[a:b]} for a, b in hit_offsets(marked)]
+        results.append({'file': path, 'paragraph': number, 'paragraph_start': start,
+                        'matches': matches, 'snippet': text.strip()[:200]})
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description="Full-text index and search over a UDF corpus (SQLite FTS5).")
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    index_parser = sub.add_parser('index', help="add new and changed UDF files to the index")
+    index_parser.add_argument('db', help="index database file")
+    index_parser.add_argument('paths', nargs='+', help="UDF files or directories to scan recursively")
+    index_parser.add_argument('-j', '--workers', type=int, default=os.cpu_count() or 1, help="parallel extraction processes (default: CPU count)")
+    index_parser.add_argument('--prune', action='store_true', help="drop indexed files that no longer exist")
+
+    search_parser = sub.add_parser('search', help="query the index")
+    search_parser.add_argument('db', help="index database file")
+    search_parser.add_argument('query', help="FTS5 query, e.g. '\"Türk Borçlar Kanunu\" AND madde'")
+    search_parser.add_argument('--limit', type=int, default=50, help="maximum number of hits (default: 50)")
+    search_parser.add_argument('--json', action='store_true', help="print hits as JSON")
+    args = parser.parse_args()
+
+    if args.command == 'search' and not os.path.isfile(args.db):
+        print(f"Index not found: {args.db}")
+        sys.exit(1)
+    db = open_index(args.db)
+
+    if args.command == 'index':
+        counts = update_index(db, args.paths, args.workers, args.prune)
+        print(f"{counts['indexed']} indexed, {counts['unchanged']} unchanged, "
+              f"{counts['removed']} removed, {counts['failed']} failed")
+        return
+
+    try:
+        hits = search(db, args.query, args.limit)
+    except sqlite3.OperationalError as e:
+        print(f"Error: invalid query: {e}", file=sys.stderr)
+        sys.exit(1)
+    if args.json:
+        print(json.dumps(hits, ensure_ascii=False, indent=2))
+        return
+    for hit in hits:
+        offsets = ', '.join(f"{m['start']}-{m['end']}" for m in hit['matches'])
+        print(f"{hit['file']} ¶{hit['paragraph']} [{offsets}]: {hit['snippet']}")
+
+if __name__ == '__main__':
+    main()
@@ -1,23 +1,18 @@
 import sys
 import os
-import xml.etree.ElementTree as ET
 from docx import Document
 from docx.shared import Pt, RGBColor, Inches
 from docx.enum.text import WD_ALIGN_PARAGRAPH, WD_UNDERLINE
 from docx.oxml import parse_xml, OxmlElement
 from docx.oxml.ns import nsdecls, qn
 from docx.enum.section import WD_ORIENT
-import base64
 import io
-import zipfile
-
-def is_zip_file(file_path):
-    """Check if the file is a valid ZIP file"""
-    try:
-        with zipfile.ZipFile(file_path, 'r') as z:
-            return True
-    except zipfile.BadZipFile:
-        return False
+import argparse
+from udf_io import is_path, load_udf_root, load_content_text, pipe_convert, run_cli
+from errors import MissingElementsError, ResourceLimitError
+from timings import span, instrumented, add_instrumentation_args
+from memory_budget import ImageSpill, SPILL_FILE, image_source, memory_limited, add_memory_args
+import asset_cache
 
 def get_alignment_style(alignment_value):
     """Convert alignment value from XML to Word alignment constant"""
@@ -76,55 +71,79 @@ def set_cell_background(cell, color_info):
     shading_elm.set(qn('w:fill'), hex_color)
     cell._tc.get_or_add_tcPr().append(shading_elm)
 
-def process_background_image(document, bg_image_data, bg_image_source, output_file):
-    """Process background image data and add to document background"""
-    if bg_image_data:
+def process_background_image(document, bg_image_data, bg_image_source, output_file, bg_image_file=None):
+    """Process background image data and add it behind the text of every page"""
+    if bg_image_data or bg_image_file:
         try:
-            # Decode base64 image data
-            image_bytes = base64.b64decode(bg_image_data)
-            
-            # Save the image to a file next to the output document
-            temp_img_path = os.path.join(os.path.dirname(output_file), os.path.splitext(os.path.basename(output_file))[0] + "_background.png")
-            with open(temp_img_path, "wb") as img_file:
-                img_file.write(image_bytes)
-            
-            # Unfortunately python-docx doesn't directly support setting background images
-            # This requires OOXML manipulation, which is beyond the scope of this script
-            print(f"Background image saved to {temp_img_path}. Please manually set it as document background in Word.")
+            if bg_image_file:
+                # Already decoded to a spill file by a memory-budgeted load
+                image_stream = bg_image_file
+            else:
+                # Documents from one unit share a letterhead; it is decoded once per process
+                image_stream = io.BytesIO(asset_cache.shared_cache().get(bg_image_data).data)
+            add_background_picture(document, image_stream)
             return True
+        except ResourceLimitError:
+            raise
         except Exception as e:
             print(f"Error processing background image data: {e}")
     elif bg_image_source:
         print(f"Background image source path: {bg_image_source}. Please manually set it as document background in Word.")
     return False
 
-def udf_to_docx(udf_file, docx_file):
-    root = None
-    
-    # Check if the file is a ZIP file
-    if is_zip_file(udf_file):
-        # Process as a ZIP file
-        with zipfile.ZipFile(udf_file, 'r') as z:
-            if 'content.xml' in z.namelist():
-                with z.open('content.xml') as content_file:
-                    tree = ET.parse(content_file, parser=ET.XMLParser(encoding='utf-8'))
-                    root = tree.getroot()
-            else:
-                print("The 'content.xml' file could not be found in the UDF file.")
-                exit()
-    else:
-        # Process as an XML file directly
-        try:
-            tree = ET.parse(udf_file, parser=ET.XMLParser(encoding='utf-8'))
-            root = tree.getroot()
-        except ET.ParseError:
-            print(f"The file {udf_file} is neither a valid ZIP nor a valid XML file.")
-            exit()
-
-    if root is None:
-        print("Failed to parse the file.")
-        exit()
-
+# Faded like the PDF background, which is drawn at 10% opacity
+BACKGROUND_ALPHA = 10000  # thousandths of a percent
+
+def add_background_picture(document, image_stream):
+    """Anchor a picture behind the text in the first section's header, centered and fit to the margins
+
+    python-docx can't set a page background picture, but a header picture behind the text shows
+    on every page the same way; it is embedded in the package, so stream output keeps it too.
+    """
+    section = document.sections[0]
+    # In the last header paragraph, so the header doesn't grow by a line
+    paragraphs = section.header.paragraphs
+    run = (paragraphs[-1] if paragraphs else section.header.add_paragraph()).add_run()
+    shape = run.add_picture(image_stream)
+    max_width = section.page_width - section.left_margin - section.right_margin
+    max_height = section.page_height - section.top_margin - section.bottom_margin
+    scale = min(max_width / shape.width, max_height / shape.height)
+    width, height = int(shape.width * scale), int(shape.height * scale)
+
+    inline = shape._inline
+    anchor = parse_xml(
+        f'<wp:anchor {nsdecls("wp")} distT="0" distB="0" distL="0" distR="0" simplePos="0" '
+        f'relativeHeight="0" behindDoc="1" locked="0" layoutInCell="1" allowOverlap="1">'
+        f'<wp:simplePos x="0" y="0"/>'
+        f'<wp:positionH relativeFrom="margin"><wp:align>center</wp:align></wp:positionH>'
+        f'<wp:positionV relativeFrom="margin"><wp:align>center</wp:align></wp:positionV>'
+        f'<wp:extent cx="{width}" cy="{height}"/><wp:effectExtent l="0" t="0" r="0" b="0"/><wp:wrapNone/>'
+        f'</wp:anchor>')
+    for child in (inline.docPr, inline.find(qn('wp:cNvGraphicFramePr')), inline.graphic):
+        if child is not None:
+            anchor.append(child)
+    ext = anchor.find(f".//{qn('pic:spPr')}/{qn('a:xfrm')}/{qn('a:ext')}")
+    if ext is not None:
+        ext.set('cx', str(width))
+        ext.set('cy', str(height))
+    blip = anchor.find(f".//{qn('a:blip')}")
+    alpha = OxmlElement('a:alphaModFix')
+    alpha.set('amt', str(BACKGROUND_ALPHA))
+    blip.append(alpha)
+    inline.addprevious(anchor)
+    inline.getparent().remove(inline)
+
+def udf_to_docx(udf_file, docx_file, max_memory=None):
+    """Convert a UDF (path, bytes, mmap or file-like) to DOCX (path or writable binary stream)
+
+    With max_memory (bytes), image payloads beyond that budget are spilled to temporary files.
+    """
+    with ImageSpill(max_memory) as spill:
+        root = load_udf_root(udf_file, spill)
+        build_docx(root, docx_file)
+
+def build_docx(root, docx_file):
+    """Write a parsed UDF tree as DOCX (path or writable binary stream)"""
     # Create a new Word document
     document = Document()
     
@@ -135,14 +154,7 @@ def udf_to_docx(udf_file, docx_file):
         section.footer.is_linked_to_previous = False
 
     # Retrieve content text
-    content_element = root.find('content')
-    if content_element is not None:
-        content_text = content_element.text
-        if content_text.startswith('<![CDATA[') and content_text.endswith(']]>'):
-            content_text = content_text[9:-3]
-    else:
-        print("'content' could not be found in the XML.")
-        exit()
+    content_text = load_content_text(root)
 
     # Extract page properties
     properties_element = root.find('properties')
@@ -169,17 +181,12 @@ def udf_to_docx(udf_file, docx_file):
             else:  # Portrait
                 section.orientation = WD_ORIENT.PORTRAIT
     
-    # Get background image if available
-    if properties_element is not None:
-        bg_image_elem = properties_element.find('bgImage')
-        if bg_image_elem is not None:
-            bg_image_data = bg_image_elem.get('bgImageData')
-            bg_image_source = bg_image_elem.get('bgImageSource')
-            process_background_image(document, bg_image_data, bg_image_source, docx_file)
-
     # Process the 'elements' section
     elements_element = root.find('elements')
-    if elements_element is not None:
+    if elements_element is None:
+        raise MissingElementsError("'elements' could not be found in the XML.")
+
+    with span('layout'):
         # Get header and footer elements
         header_element = elements_element.find('header')
         footer_element = elements_element.find('footer')
@@ -416,10 +423,8 @@ def udf_to_docx(udf_file, docx_file):
                         
                     elif child.tag == 'image':
                         # Add an image
-                        image_data = child.get('imageData')
-                        if image_data:
-                            image_bytes = base64.b64decode(image_data)
-                            image_stream = io.BytesIO(image_bytes)
+                        image_stream = image_source(child)
+                        if image_stream is not None:
                             run = paragraph.add_run()
                             run.add_picture(image_stream)
                             
@@ -439,8 +444,8 @@ def udf_to_docx(udf_file, docx_file):
                     try:
                         col_spans_list = col_spans.split(',')
                         if len(col_spans_list) == column_count:
-                            for span in col_spans_list:
-                                col_widths.append(Pt(float(span)))
+                            for col_span in col_spans_list:
+                                col_widths.append(Pt(float(col_span)))
                     except (ValueError, IndexError):
                         col_widths = []
                 
@@ -473,8 +478,8 @@ def udf_to_docx(udf_file, docx_file):
                         # Get the table cell
                         table_cell = table.rows[row_idx].cells[col_idx]
                         
-                        # Process cell paragraphs
-                        paragraphs = cell.findall('paragraph')
+                        # Process cell paragraphs, including those of nested tables
+                        paragraphs = list(cell.iter('paragraph'))
                         
                         # Use existing paragraph if possible
                         cell_paragraph = table_cell.paragraphs[0] if table_cell.paragraphs else table_cell.add_paragraph()
@@ -568,42 +573,61 @@ def udf_to_docx(udf_file, docx_file):
                                     cell_paragraph.add_run(" ")
                                 elif child.tag == 'image':
                                     # Add an image
-                                    image_data = child.get('imageData')
-                                    if image_data:
+                                    image_stream = image_source(child)
+                                    if image_stream is not None:
                                         try:
-                                            image_bytes = base64.b64decode(image_data)
-                                            image_stream = io.BytesIO(image_bytes)
                                             run = cell_paragraph.add_run()
                                             run.add_picture(image_stream)
                                         except Exception as e:
                                             print(f"Error processing image in table: {e}")
                                             cell_paragraph.add_run("[GÖRSEL]")
-    else:
-        print("'elements' could not be found in the XML.")
-        exit()
+
+    # Get background image if available; added last, as header processing clears the header
+    if properties_element is not None:
+        bg_image_elem = properties_element.find('bgImage')
+        if bg_image_elem is not None:
+            bg_image_data = bg_image_elem.get('bgImageData')
+            bg_image_source = bg_image_elem.get('bgImageSource')
+            process_background_image(document, bg_image_data, bg_image_source, docx_file, bg_image_elem.get(SPILL_FILE))
 
     # Save the document
-    document.save(docx_file)
-    print(f"DOCX file created: {docx_file}")
+    with span('write_output'):
+        document.save(docx_file)
+    if is_path(docx_file):
+        print(f"DOCX file created: {docx_file}")
+
+def udf_to_docx_bytes(udf_data, max_memory=None):
+    """Convert UDF bytes (or an mmap / file-like object) to DOCX and return the DOCX bytes"""
+    output = io.BytesIO()
+    udf_to_docx(udf_data, output, max_memory)
+    return output.getvalue()
 
 def main():
-    if len(sys.argv) < 2:
-        print("Usage: python udf_to_docx.py input.udf")
-        exit()
+    parser = argparse.ArgumentParser(description="Convert a UDF file to DOCX.")
+    parser.add_argument('input', help="input .udf file, or - to read from stdin")
+    parser.add_argument('-o', '--output', help="output .docx file, or - to write to stdout (default: next to the input)")
+    add_instrumentation_args(parser)
+    add_memory_args(parser)
+    args = parser.parse_args()
+
+    udf_file = args.input
 
-    udf_file = sys.argv[1]
+    if udf_file == '-' or args.output == '-':
+        run_cli(pipe_convert, instrumented(memory_limited(udf_to_docx_bytes, args.max_memory), args.timings, args.profile), udf_file, args.output or '-')
+        return
 
     if not os.path.isfile(udf_file):
         print(f"Input file not found: {udf_file}")
-        exit()
+        sys.exit(1)
 
     filename, ext = os.path.splitext(udf_file)
 
     if ext.lower() == '.udf':
-        docx_file = filename + '.docx'
-        udf_to_docx(udf_file, docx_file)
+        docx_file = args.output or filename + '.docx'
+        run_cli(instrumented(memory_limited(udf_to_docx, args.max_memory), args.timings, args.profile), udf_file, docx_file)
     else:
         print("Please provide a .udf file.")
+        sys.exit(1)
 
 if __name__ == '__main__':
-    main()
\ No newline at end of file
+    main()
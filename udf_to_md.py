@@ -1,44 +1,27 @@
 import sys
 import os
-import xml.etree.ElementTree as ET
-import zipfile
-import base64
-import io
-
-def is_zip_file(file_path):
-    """Check if the file is a valid ZIP file"""
-    try:
-        with zipfile.ZipFile(file_path, 'r') as z:
-            return True
-    except zipfile.BadZipFile:
-        return False
-
-def udf_to_markdown(udf_file):
-    root = None
-    
-    # Check if the file is a ZIP file
-    if is_zip_file(udf_file):
-        # Process as a ZIP file
-        with zipfile.ZipFile(udf_file, 'r') as z:
-            if 'content.xml' in z.namelist():
-                with z.open('content.xml') as content_file:
-                    tree = ET.parse(content_file)
-                    root = tree.getroot()
-            else:
-                print("The 'content.xml' file could not be found in the UDF file.")
-                exit()
-    else:
-        # Process as an XML file directly
-        try:
-            tree = ET.parse(udf_file)
-            root = tree.getroot()
-        except ET.ParseError:
-            print(f"The file {udf_file} is neither a valid ZIP nor a valid XML file.")
-            exit()
-
-    if root is None:
-        print("Failed to parse the file.")
-        exit()
+import argparse
+from udf_io import load_udf_root, load_content_text, pipe_convert, run_cli
+from timings import span, instrumented, add_instrumentation_args
+from memory_budget import ImageSpill, memory_limited, add_memory_args
+from errors import MissingElementsError
+
+def field_text(field, content_text):
+    """Text of a <field>: its span of the content text, or its fieldName when it has none"""
+    length = int(field.get('length', '0'))
+    if field.get('startOffset') and length > 0:
+        start_offset = int(field.get('startOffset'))
+        return content_text[start_offset:start_offset+length]
+    return field.get('fieldName', '')
+
+def udf_to_markdown(udf_file, max_memory=None):
+    """Convert a UDF (path, bytes, mmap or file-like) to a Markdown string
+
+    With max_memory (bytes), image payloads beyond that budget are moved out of the parsed tree
+    into temporary files; Markdown only marks where images were, so they are never read back.
+    """
+    with ImageSpill(max_memory) as spill:
+        root = load_udf_root(udf_file, spill)
 
     # Initialize the markdown output
     markdown_output = ""
@@ -61,19 +44,14 @@ def udf_to_markdown(udf_file):
             styles[style_name] = style_attributes
 
     # Retrieve content text
-    content_element = root.find('content')
-    if content_element is not None:
-        content_text = content_element.text
-        if content_text and content_text.startswith('<![CDATA[') and content_text.endswith(']]>'):
-            content_text = content_text[9:-3]
-    else:
-        print("'content' could not be found in the XML.")
-        exit()
+    content_text = load_content_text(root)
 
     # Process the 'elements' section
     elements_element = root.find('elements')
-    
-    if elements_element is not None:
+    if elements_element is None:
+        raise MissingElementsError("'elements' could not be found in the XML.")
+
+    with span('layout'):
         for elem in elements_element:
             if elem.tag == 'paragraph':
                 # Handle the paragraph
@@ -91,11 +69,15 @@ def udf_to_markdown(udf_file):
                 
                 # Process the paragraph content
                 for child in elem:
-                    if child.tag == 'content':
-                        # Get the text
-                        start_offset = int(child.get('startOffset', '0'))
-                        length = int(child.get('length', '0'))
-                        text = content_text[start_offset:start_offset+length]
+                    if child.tag in ('content', 'field'):
+                        if child.tag == 'field':
+                            # Merge fields and labels carry their value in the content text like a run
+                            text = field_text(child, content_text)
+                        else:
+                            # Get the text
+                            start_offset = int(child.get('startOffset', '0'))
+                            length = int(child.get('length', '0'))
+                            text = content_text[start_offset:start_offset+length]
                         
                         # Apply formatting
                         if child.get('bold', 'false') == 'true' and child.get('italic', 'false') == 'true':
@@ -134,17 +116,22 @@ def udf_to_markdown(udf_file):
                     
                     for cell in cells:
                         cell_text = ""
-                        paragraphs = cell.findall('paragraph')
+                        # Nested tables can't be drawn inside a Markdown cell; their paragraphs are kept
+                        paragraphs = cell.iter('paragraph')
                         
                         for para in paragraphs:
                             para_text = ""
                             
                             for child in para:
-                                if child.tag == 'content':
-                                    # Get the text
-                                    start_offset = int(child.get('startOffset', '0'))
-                                    length = int(child.get('length', '0'))
-                                    text = content_text[start_offset:start_offset+length]
+                                if child.tag in ('content', 'field'):
+                                    if child.tag == 'field':
+                                        # Merge fields and labels carry their value in the content text like a run
+                                        text = field_text(child, content_text)
+                                    else:
+                                        # Get the text
+                                        start_offset = int(child.get('startOffset', '0'))
+                                        length = int(child.get('length', '0'))
+                                        text = content_text[start_offset:start_offset+length]
                                     
                                     # Apply formatting
                                     if child.get('bold', 'false') == 'true' and child.get('italic', 'false') == 'true':
@@ -170,32 +157,43 @@ def udf_to_markdown(udf_file):
                     markdown_output += row_text + "\n"
                 
                 markdown_output += "\n"
-    else:
-        print("'elements' could not be found in the XML.")
 
     return markdown_output
 
+def udf_to_md_file(udf_file, md_file, max_memory=None):
+    """Convert a UDF to a Markdown file"""
+    markdown_content = udf_to_markdown(udf_file, max_memory)
+    with open(md_file, 'w', encoding='utf-8') as f:
+        f.write(markdown_content)
+
 def main():
-    if len(sys.argv) < 2:
-        print("Usage: python udf_to_markdown.py input.udf")
-        exit()
+    parser = argparse.ArgumentParser(description="Convert a UDF file to Markdown.")
+    parser.add_argument('input', help="input .udf file, or - to read from stdin")
+    parser.add_argument('-o', '--output', help="output .md file, or - to write to stdout (default: next to the input)")
+    add_instrumentation_args(parser)
+    add_memory_args(parser)
+    args = parser.parse_args()
+
+    udf_file = args.input
 
-    udf_file = sys.argv[1]
+    if udf_file == '-' or args.output == '-':
+        run_cli(pipe_convert, instrumented(memory_limited(udf_to_markdown, args.max_memory), args.timings, args.profile), udf_file, args.output or '-')
+        return
 
     if not os.path.isfile(udf_file):
         print(f"Input file not found: {udf_file}")
-        exit()
+        sys.exit(1)
 
     # Convert UDF to markdown and print to console
-    markdown_content = udf_to_markdown(udf_file)
+    markdown_content = run_cli(instrumented(memory_limited(udf_to_markdown, args.max_memory), args.timings, args.profile), udf_file)
     print(markdown_content)
     
     # Optionally save to a file
     filename, ext = os.path.splitext(udf_file)
-    markdown_file = filename + '.md'
+    markdown_file = args.output or filename + '.md'
     with open(markdown_file, 'w', encoding='utf-8') as md_file:
         md_file.write(markdown_content)
     print(f"Markdown file created: {markdown_file}")
 
 if __name__ == '__main__':
-    main()
\ No newline at end of file
+    main()
@@ -1,18 +1,25 @@
 import sys
 import os
-import xml.etree.ElementTree as ET
 from reportlab.lib.pagesizes import A4
 from reportlab.pdfgen import canvas
 from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 from reportlab.platypus import SimpleDocTemplate, Paragraph, Table, TableStyle, Spacer, Image, PageBreak
 from reportlab.lib import colors
 from reportlab.lib.units import mm, inch
-import base64
+from reportlab.lib.utils import ImageReader
 import io
-import zipfile
+import argparse
+import threading
 from reportlab.pdfbase import pdfmetrics
 from reportlab.pdfbase.ttfonts import TTFont
 from reportlab.lib.enums import TA_LEFT, TA_CENTER, TA_RIGHT, TA_JUSTIFY
+from udf_io import is_path, load_udf_root, load_content_text, pipe_convert, run_cli
+from errors import FontNotFoundError, MissingElementsError, ResourceLimitError
+from guards import check_image, check_pixels
+from timings import span, instrumented, add_instrumentation_args
+from memory_budget import ImageSpill, SPILL_FILE, image_source, memory_limited, add_memory_args
+from paragraph_cache import CachedParagraph, shared_cache
+import asset_cache
 
 # Get the directory where this script is located
 SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
@@ -41,54 +48,53 @@ def find_font_file(filename):
         return filename
     return None
 
-# Add fonts that support Turkish characters with bold and italic variations
-# Try to find fonts in script directory first, then current directory
-dejavu_normal = find_font_file('DejaVuSerif.ttf')
-dejavu_bold = find_font_file('DejaVuSerif-Bold.ttf')
-dejavu_italic = find_font_file('DejaVuSerif-Italic.ttf')
-dejavu_bolditalic = find_font_file('DejaVuSerif-BoldItalic.ttf')
-
-if not dejavu_normal:
-    print("ERROR: DejaVuSerif.ttf not found!")
-    print(f"Please place the font files in one of these locations:")
-    print(f"  - {os.path.join(SCRIPT_DIR, 'dejavu-serif')}")
-    print(f"  - {SCRIPT_DIR}")
-    print(f"  - {os.path.join(SCRIPT_DIR, 'fonts')}")
-    print("  - Current working directory")
-    print("\nRequired files:")
-    print("  - DejaVuSerif.ttf")
-    print("  - DejaVuSerif-Bold.ttf")
-    print("  - DejaVuSerif-Italic.ttf")
-    print("  - DejaVuSerif-BoldItalic.ttf")
-    print("\nDownload from: https://dejavu-fonts.github.io/")
-    sys.exit(1)
-
-try:
-    pdfmetrics.registerFont(TTFont('DejaVuSerif', dejavu_normal))
-    if dejavu_bold:
-        pdfmetrics.registerFont(TTFont('DejaVuSerif-Bold', dejavu_bold))
-    if dejavu_italic:
-        pdfmetrics.registerFont(TTFont('DejaVuSerif-Italic', dejavu_italic))
-    if dejavu_bolditalic:
-        pdfmetrics.registerFont(TTFont('DejaVuSerif-BoldItalic', dejavu_bolditalic))
-    
-    # Create font family
-    pdfmetrics.registerFontFamily('DejaVuSerif', 
-                                 normal='DejaVuSerif', 
-                                 bold='DejaVuSerif-Bold' if dejavu_bold else 'DejaVuSerif',
-                                 italic='DejaVuSerif-Italic' if dejavu_italic else 'DejaVuSerif',
-                                 boldItalic='DejaVuSerif-BoldItalic' if dejavu_bolditalic else 'DejaVuSerif')
-except Exception as e:
-    print(f"ERROR: Failed to load DejaVuSerif fonts: {e}")
-    sys.exit(1)
-
-def is_zip_file(file_path):
-    """Check if the file is a valid ZIP file"""
-    try:
-        with zipfile.ZipFile(file_path, 'r') as z:
-            return True
-    except zipfile.BadZipFile:
-        return False
+_fonts_lock = threading.Lock()
+_fonts_registered = False
+
+def register_fonts():
+    """Register the DejaVuSerif family with reportlab once per process"""
+    global _fonts_registered
+    with _fonts_lock:
+        if _fonts_registered:
+            return
+
+        # Add fonts that support Turkish characters with bold and italic variations
+        # Try to find fonts in script directory first, then current directory
+        dejavu_normal = find_font_file('DejaVuSerif.ttf')
+        dejavu_bold = find_font_file('DejaVuSerif-Bold.ttf')
+        dejavu_italic = find_font_file('DejaVuSerif-Italic.ttf')
+        dejavu_bolditalic = find_font_file('DejaVuSerif-BoldItalic.ttf')
+
+        if not dejavu_normal:
+            raise FontNotFoundError(
+                "DejaVuSerif.ttf not found! Please place the font files "
+                "(DejaVuSerif.ttf, DejaVuSerif-Bold.ttf, DejaVuSerif-Italic.ttf, DejaVuSerif-BoldItalic.ttf) "
+                f"in one of these locations: {os.path.join(SCRIPT_DIR, 'dejavu-serif')}, {SCRIPT_DIR}, "
+                f"{os.path.join(SCRIPT_DIR, 'fonts')} or the current working directory. "
+                "Download from: https://dejavu-fonts.github.io/"
+            )
+
+        try:
+            pdfmetrics.registerFont(TTFont('DejaVuSerif', dejavu_normal))
+            if dejavu_bold:
+                pdfmetrics.registerFont(TTFont('DejaVuSerif-Bold', dejavu_bold))
+            if dejavu_italic:
+                pdfmetrics.registerFont(TTFont('DejaVuSerif-Italic', dejavu_italic))
+            if dejavu_bolditalic:
+                pdfmetrics.registerFont(TTFont('DejaVuSerif-BoldItalic', dejavu_bolditalic))
+
+            # Create font family
+            pdfmetrics.registerFontFamily('DejaVuSerif',
+                                         normal='DejaVuSerif',
+                                         bold='DejaVuSerif-Bold' if dejavu_bold else 'DejaVuSerif',
+                                         italic='DejaVuSerif-Italic' if dejavu_italic else 'DejaVuSerif',
+                                         boldItalic='DejaVuSerif-BoldItalic' if dejavu_bolditalic else 'DejaVuSerif')
+        except ResourceLimitError:
+            raise
+        except Exception as e:
+            raise FontNotFoundError(f"Failed to load DejaVuSerif fonts: {e}") from e
+
+        _fonts_registered = True
 
 def get_alignment_style(alignment_value):
     """Convert alignment value from XML to reportlab alignment constant"""
@@ -121,21 +127,71 @@ def convert_color(color_value):
     except (ValueError, TypeError):
         return None
 
-def process_background_image(bg_image_data, bg_image_source, output_file):
-    """Process background image data and return Image object"""
-    if bg_image_data:
+# One pass escapes text for reportlab's markup and turns tabs (about four spaces) and newlines into markup
+MARKUP_ESCAPES = str.maketrans({'&': '&amp;', '<': '&lt;', '>': '&gt;', '\t': '&nbsp;' * 4, '\n': '<br/>'})
+
+# (bold, italic, underline) -> opening and closing tags
+PLAIN = (False, False, False)
+EMPHASIS_TAGS = {
+    (True, True, True): ('<u><b><i>', '</i></b></u>'),
+    (True, True, False): ('<b><i>', '</i></b>'),
+    (True, False, True): ('<u><b>', '</b></u>'),
+    (False, True, True): ('<u><i>', '</i></u>'),
+    (True, False, False): ('<b>', '</b>'),
+    (False, True, False): ('<i>', '</i>'),
+    (False, False, True): ('<u>', '</u>'),
+    PLAIN: ('', ''),
+}
+
+def emphasis(elem):
+    """(bold, italic, underline) of a <content> or <field> element"""
+    return (elem.get('bold', 'false') == 'true', elem.get('italic', 'false') == 'true',
+            elem.get('underline', 'false') == 'true')
+
+class ParagraphMarkup:
+    """Reportlab markup for one paragraph, compiled from its text runs
+
+    Adjacent runs with the same emphasis share one tagged fragment and the markup is joined once,
+    so reportlab's parser gets a few large fragments instead of one per DOCX run.
+    """
+    def __init__(self):
+        self.fragments = []  # (emphasis, escaped text pieces)
+
+    def add(self, text, run_emphasis=PLAIN):
+        if not text:
+            return
+        if self.fragments and self.fragments[-1][0] == run_emphasis:
+            self.fragments[-1][1].append(text.translate(MARKUP_ESCAPES))
+        else:
+            self.fragments.append((run_emphasis, [text.translate(MARKUP_ESCAPES)]))
+
+    def markup(self):
+        parts = []
+        for run_emphasis, pieces in self.fragments:
+            open_tags, close_tags = EMPHASIS_TAGS[run_emphasis]
+            parts.append(open_tags)
+            parts.extend(pieces)
+            parts.append(close_tags)
+        return ''.join(parts)
+
+def process_background_image(bg_image_data, bg_image_source, output_file, bg_image_file=None):
+    """Process background image data and return an ImageReader for it"""
+    if bg_image_file:
+        # Already decoded to a spill file by a memory-budgeted load
+        check_image(bg_image_file, 'background image')
+        return ImageReader(bg_image_file)
+    elif bg_image_data:
         try:
-            # Decode base64 image data
-            image_bytes = base64.b64decode(bg_image_data)
-            image_stream = io.BytesIO(image_bytes)
-            
-            # Create reportlab image
-            img = Image(image_stream)
-            return img
+            # Documents from one unit share a letterhead; it is decoded once per process
+            asset = asset_cache.shared_cache().get(bg_image_data)
+            check_pixels(asset.width, asset.height, 'background image')
+            return asset.reader()
+        except ResourceLimitError:
+            raise
         except Exception as e:
             print(f"Error processing background image data: {e}")
-    elif bg_image_source:
-        # Try to load from source path if available
+    elif bg_image_source and is_path(output_file):
+        # Try to load from source path if available (only when writing to disk)
         try:
             # Check if the source path exists relative to the output file
             output_dir = os.path.dirname(output_file)
@@ -144,7 +200,7 @@ def process_background_image(bg_image_data, bg_image_source, output_file):
             img_path = os.path.join(output_dir, source_path)
             
             if os.path.exists(img_path):
-                return Image(img_path)
+                return ImageReader(img_path)
             else:
                 print(f"Background image not found: {img_path}")
         except Exception as e:
@@ -152,42 +208,27 @@ def process_background_image(bg_image_data, bg_image_source, output_file):
     
     return None
 
-def udf_to_pdf(udf_file, pdf_file):
-    root = None
-    
-    # Check if the file is a ZIP file
-    if is_zip_file(udf_file):
-        # Process as a ZIP file
-        with zipfile.ZipFile(udf_file, 'r') as z:
-            if 'content.xml' in z.namelist():
-                with z.open('content.xml') as content_file:
-                    tree = ET.parse(content_file, parser=ET.XMLParser(encoding='utf-8'))
-                    root = tree.getroot()
-            else:
-                print("The 'content.xml' file could not be found in the UDF file.")
-                exit()
-    else:
-        # Process as an XML file directly
-        try:
-            tree = ET.parse(udf_file, parser=ET.XMLParser(encoding='utf-8'))
-            root = tree.getroot()
-        except ET.ParseError:
-            print(f"The file {udf_file} is neither a valid ZIP nor a valid XML file.")
-            exit()
+def udf_to_pdf(udf_file, pdf_file, max_memory=None):
+    """Convert a UDF (path, bytes, mmap or file-like) to PDF (path or writable binary stream)
 
-    if root is None:
-        print("Failed to parse the file.")
-        exit()
+    With max_memory (bytes), image payloads beyond that budget are spilled to temporary files.
+    """
+    with span('load_fonts'):
+        register_fonts()
+    with ImageSpill(max_memory) as spill:
+        root = load_udf_root(udf_file, spill)
+        build_pdf(root, pdf_file)
 
+class TimedCanvas(canvas.Canvas):
+    """Canvas that reports saving, where the pages are compressed and written out, as write_output"""
+    def save(self):
+        with span('write_output'):
+            canvas.Canvas.save(self)
+
+def build_pdf(root, pdf_file):
+    """Render a parsed UDF tree to PDF (path or writable binary stream)"""
     # Retrieve content text
-    content_element = root.find('content')
-    if content_element is not None:
-        content_text = content_element.text
-        if content_text.startswith('<![CDATA[') and content_text.endswith(']]>'):
-            content_text = content_text[9:-3]
-    else:
-        print("'content' could not be found in the XML.")
-        exit()
+    content_text = load_content_text(root)
 
     # Extract page properties
     properties_element = root.find('properties')
@@ -206,11 +247,14 @@ def udf_to_pdf(udf_file, pdf_file):
         if bg_image_elem is not None:
             bg_image_data = bg_image_elem.get('bgImageData')
             bg_image_source = bg_image_elem.get('bgImageSource')
-            bg_image = process_background_image(bg_image_data, bg_image_source, pdf_file)
+            bg_image = process_background_image(bg_image_data, bg_image_source, pdf_file, bg_image_elem.get(SPILL_FILE))
 
     # Process the 'elements' section
     elements_element = root.find('elements')
-    if elements_element is not None:
+    if elements_element is None:
+        raise MissingElementsError("'elements' could not be found in the XML.")
+
+    with span('layout'):
         # Create the PDF document with specified margins
         pdf = SimpleDocTemplate(
             pdf_file, 
@@ -267,61 +311,9 @@ def udf_to_pdf(udf_file, pdf_file):
         header_element = elements_element.find('header')
         footer_element = elements_element.find('footer')
         
-        # Function to process a text block and apply formatting
-        def process_text_block(content_elem, current_style):
-            text = ""
-            
-            # Get basic attributes
-            start_offset = int(content_elem.get('startOffset', '0'))
-            length = int(content_elem.get('length', '0'))
-            text_content = content_text[start_offset:start_offset+length]
-            
-            # XML Escape the content first
-            text_content = text_content.replace('&', '&amp;').replace('<', '&lt;').replace('>', '&gt;')
-            
-            # Replace tabs with non-breaking spaces (approx 4 spaces per tab)
-            text_content = text_content.replace('\t', '&nbsp;&nbsp;&nbsp;&nbsp;')
-            
-            # Preserve newlines in the content (convert \n to <br/> for ReportLab)
-            if '\n' in text_content:
-                text_content = text_content.replace('\n', '<br/>')
-            
-            # Get formatting attributes
-            bold = content_elem.get('bold', 'false') == 'true'
-            italic = content_elem.get('italic', 'false') == 'true'
-            underline = content_elem.get('underline', 'false') == 'true'
-            family = content_elem.get('family')
-            size = content_elem.get('size')
-            foreground = convert_color(content_elem.get('foreground'))
-            
-            # Apply text formatting - always use DejaVuSerif regardless of what's specified
-            if family:
-                # Ignore the family from XML and always use DejaVuSerif
-                current_style.fontName = 'DejaVuSerif'
-            if size:
-                current_style.fontSize = float(size)
-            if foreground:
-                current_style.textColor = foreground
-            
-            # Apply emphasis formatting
-            formatted_text = text_content
-            if bold and italic and underline:
-                formatted_text = f"<u><b><i>{formatted_text}</i></b></u>"
-            elif bold and italic:
-                formatted_text = f"<b><i>{formatted_text}</i></b>"
-            elif bold and underline:
-                formatted_text = f"<u><b>{formatted_text}</b></u>"
-            elif italic and underline:
-                formatted_text = f"<u><i>{formatted_text}</i></u>"
-            elif bold:
-                formatted_text = f"<b>{formatted_text}</b>"
-            elif italic:
-                formatted_text = f"<i>{formatted_text}</i>"
-            elif underline:
-                formatted_text = f"<u>{formatted_text}</u>"
-            
-            return formatted_text
-        
+        # Boilerplate (court headers, party labels, standard clauses) is parsed and wrapped once per process
+        paragraph_cache = shared_cache()
+
         # Function to process a paragraph element
         def process_paragraph(para_elem, content_buffer, in_header_footer=False):
             # Get paragraph alignment
@@ -365,7 +357,7 @@ def udf_to_pdf(udf_file, pdf_file):
             )
             
             # Process the paragraph content
-            paragraph_text = ''
+            paragraph_text = ParagraphMarkup()
             last_end_offset = None
             
             for child in para_elem:
@@ -376,17 +368,18 @@ def udf_to_pdf(udf_file, pdf_file):
                 # Check for gap between previous element and this one
                 if last_end_offset is not None and current_start is not None:
                     if current_start > last_end_offset:
-                        gap_text = content_buffer[last_end_offset:current_start]
-                        # XML Escape the gap text
-                        gap_text = gap_text.replace('&', '&amp;').replace('<', '&lt;').replace('>', '&gt;')
-                        # Replace tabs
-                        gap_text = gap_text.replace('\t', '&nbsp;&nbsp;&nbsp;&nbsp;')
-                        # Add the gap text, converting newlines to <br/>
-                        paragraph_text += gap_text.replace('\n', '<br/>')
+                        paragraph_text.add(content_buffer[last_end_offset:current_start])
                 
                 if child.tag == 'content':
-                    content_text_block = process_text_block(child, para_style)
-                    paragraph_text += content_text_block
+                    start = current_start or 0
+                    paragraph_text.add(content_buffer[start:start + current_length], emphasis(child))
+                    
+                    # The paragraph takes the size and color of its runs; the font is always DejaVuSerif
+                    if child.get('size'):
+                        para_style.fontSize = float(child.get('size'))
+                    foreground = convert_color(child.get('foreground'))
+                    if foreground:
+                        para_style.textColor = foreground
                     
                     # Update offset tracking
                     if current_start is not None:
@@ -394,44 +387,20 @@ def udf_to_pdf(udf_file, pdf_file):
                         
                 elif child.tag == 'field':
                     # Process field element (labels like DAVACI, VEKİLİ, etc.)
-                    field_name = child.get('fieldName', '')
-                    
                     # Get the text from the content buffer if startOffset and length are provided
                     if current_start is not None and current_length > 0:
                         field_text = content_buffer[current_start:current_start+current_length]
                     else:
                         # Use the fieldName as fallback
-                        field_text = field_name
-                    
-                    # Apply styling 
-                    bold = child.get('bold', 'false') == 'true'
-                    italic = child.get('italic', 'false') == 'true'
-                    underline = child.get('underline', 'false') == 'true'
-                    
-                    # Format text with style
-                    if bold and italic and underline:
-                        paragraph_text += f"<u><b><i>{field_text}</i></b></u>"
-                    elif bold and italic:
-                        paragraph_text += f"<b><i>{field_text}</i></b>"
-                    elif bold and underline:
-                        paragraph_text += f"<u><b>{field_text}</b></u>"
-                    elif italic and underline:
-                        paragraph_text += f"<u><i>{field_text}</i></u>"
-                    elif bold:
-                        paragraph_text += f"<b>{field_text}</b>"
-                    elif italic:
-                        paragraph_text += f"<i>{field_text}</i>"
-                    elif underline:
-                        paragraph_text += f"<u>{field_text}</u>"
-                    else:
-                        paragraph_text += field_text
+                        field_text = child.get('fieldName', '')
+                    paragraph_text.add(field_text, emphasis(child))
                     
                     # Update offset tracking
                     if current_start is not None:
                         last_end_offset = current_start + current_length
                         
                 elif child.tag == 'space':
-                    paragraph_text += ' '
+                    paragraph_text.add(' ')
                     # space usually doesn't have offset or it's handled by gap? 
                     # If we have explicit space tag, we add space.
                     # If gap covers it, we might double space? 
@@ -440,12 +409,10 @@ def udf_to_pdf(udf_file, pdf_file):
                 
                 elif child.tag == 'image':
                     # Add the image
-                    image_data = child.get('imageData')
-                    if image_data:
+                    if child.get('imageData') or child.get(SPILL_FILE):
                         try:
-                            # Decode base64 image data
-                            image_bytes = base64.b64decode(image_data)
-                            image_stream = io.BytesIO(image_bytes)
+                            # Decoded image data, or the path of a spill file that reportlab reads lazily
+                            image_stream = image_source(child)
                             
                             # Create reportlab image
                             img = Image(image_stream)
@@ -465,14 +432,16 @@ def udf_to_pdf(udf_file, pdf_file):
                                 # This means subsequent text in this paragraph tag is ignored/lost.
                                 # This is a known limitation/bug but keeping behavior consistent for now
                                 # except fixing the return signature handling in loop?
-                                return Paragraph(paragraph_text, para_style), img
+                                return CachedParagraph(paragraph_text.markup(), para_style, cache=paragraph_cache), img
+                        except ResourceLimitError:
+                            raise
                         except Exception as e:
                             print(f"Error processing image: {e}")
                             # Add a placeholder text instead
-                            paragraph_text += "[GÖRSEL]"
+                            paragraph_text.add("[GÖRSEL]")
             
             # Return the paragraph
-            return Paragraph(paragraph_text, para_style), None
+            return CachedParagraph(paragraph_text.markup(), para_style, cache=paragraph_cache), None
         
         # Define header and footer
         header_paragraphs = []
@@ -543,26 +512,33 @@ def udf_to_pdf(udf_file, pdf_file):
                 page_height = doc.height
                 
                 # Preserve aspect ratio
-                img_ratio = bg_image.imageWidth / bg_image.imageHeight
+                image_width, image_height = bg_image.getSize()
+                img_ratio = image_width / image_height
                 page_ratio = page_width / page_height
                 
                 if img_ratio > page_ratio:
                     # Image is wider than page
-                    bg_image.drawWidth = page_width
-                    bg_image.drawHeight = page_width / img_ratio
+                    draw_width = page_width
+                    draw_height = page_width / img_ratio
                 else:
                     # Image is taller than page
-                    bg_image.drawHeight = page_height
-                    bg_image.drawWidth = page_height * img_ratio
+                    draw_height = page_height
+                    draw_width = page_height * img_ratio
                 
                 # Center the image
-                x_offset = doc.leftMargin + (page_width - bg_image.drawWidth) / 2
-                y_offset = doc.bottomMargin + (page_height - bg_image.drawHeight) / 2
+                x_offset = doc.leftMargin + (page_width - draw_width) / 2
+                y_offset = doc.bottomMargin + (page_height - draw_height) / 2
                 
+                # Embed the image once as a form; drawImage would hash its pixels again on every page
+                if not canvas.hasForm('background'):
+                    canvas.beginForm('background')
+                    canvas.drawImage(bg_image, x_offset, y_offset, draw_width, draw_height, mask='auto')
+                    canvas.endForm()
+
                 # Draw the image with transparency
                 canvas.saveState()
                 canvas.setFillAlpha(0.1)  # Set transparency
-                bg_image.drawOn(canvas, x_offset, y_offset)
+                canvas.doForm('background')
                 canvas.restoreState()
             
             canvas.restoreState()
@@ -589,8 +565,8 @@ def udf_to_pdf(udf_file, pdf_file):
                     row_data = []
                     cells = row.findall('cell')
                     for cell in cells:
-                        # Process the cell content
-                        paragraphs = cell.findall('paragraph')
+                        # Process the cell content; paragraphs of nested tables are laid out in the cell
+                        paragraphs = list(cell.iter('paragraph'))
                         cell_paragraphs = []
                         
                         for para in paragraphs:
@@ -645,29 +621,42 @@ def udf_to_pdf(udf_file, pdf_file):
                 pass
         
         # Build the PDF document with header and footer
-        pdf.build(pdf_elements, onFirstPage=add_header_footer, onLaterPages=add_header_footer)
-        print(f"PDF file created: {pdf_file}")
-    else:
-        print("'elements' could not be found in the XML.")
+        pdf.build(pdf_elements, onFirstPage=add_header_footer, onLaterPages=add_header_footer, canvasmaker=TimedCanvas)
+        if is_path(pdf_file):
+            print(f"PDF file created: {pdf_file}")
+
+def udf_to_pdf_bytes(udf_data, max_memory=None):
+    """Convert UDF bytes (or an mmap / file-like object) to PDF and return the PDF bytes"""
+    output = io.BytesIO()
+    udf_to_pdf(udf_data, output, max_memory)
+    return output.getvalue()
 
 def main():
-    if len(sys.argv) < 2:
-        print("Usage: python udf_to_pdf.py input.udf")
-        exit()
+    parser = argparse.ArgumentParser(description="Convert a UDF file to PDF.")
+    parser.add_argument('input', help="input .udf file, or - to read from stdin")
+    parser.add_argument('-o', '--output', help="output .pdf file, or - to write to stdout (default: next to the input)")
+    add_instrumentation_args(parser)
+    add_memory_args(parser)
+    args = parser.parse_args()
+
+    udf_file = args.input
 
-    udf_file = sys.argv[1]
+    if udf_file == '-' or args.output == '-':
+        run_cli(pipe_convert, instrumented(memory_limited(udf_to_pdf_bytes, args.max_memory), args.timings, args.profile), udf_file, args.output or '-')
+        return
 
     if not os.path.isfile(udf_file):
         print(f"Input file not found: {udf_file}")
-        exit()
+        sys.exit(1)
 
     filename, ext = os.path.splitext(udf_file)
 
     if ext.lower() == '.udf':
-        pdf_file = filename + '.pdf'
-        udf_to_pdf(udf_file, pdf_file)
+        pdf_file = args.output or filename + '.pdf'
+        run_cli(instrumented(memory_limited(udf_to_pdf, args.max_memory), args.timings, args.profile), udf_file, pdf_file)
     else:
         print("Please provide a .udf file.")
+        sys.exit(1)
 
 if __name__ == '__main__':
-    main()
\ No newline at end of file
+    main()
@@ -25,39 +25,32 @@ def get_indent_attrs(paragraph):
     
     return indent_attrs
 
-def get_bullet_attrs(paragraph):
-    numPr = paragraph.find('.//w:numPr', namespaces={'w': 'http://schemas.openxmlformats.org/wordprocessingml/2006/main'})
-    if numPr is not None:
-        ilvl = numPr.find('.//w:ilvl', namespaces={'w': 'http://schemas.openxmlformats.org/wordprocessingml/2006/main'})
-        numId = numPr.find('.//w:numId', namespaces={'w': 'http://schemas.openxmlformats.org/wordprocessingml/2006/main'})
-        if ilvl is not None and numId is not None:
-            bullet_type = get_bullet_type(numId.get(qn("w:val")))
-            return f'Bulleted="true" ListId="{numId.get(qn("w:val"))}" ListLevel="{int(ilvl.get(qn("w:val"))) + 1}" BulletType="{bullet_type}"'
-    return ''
-
-def get_bullet_type(num_id):
-    bullet_types = {
-        "1": "BULLET_TYPE_ELLIPSE",
-        "2": "BULLET_TYPE_RECTANGLE",
-        "3": "BULLET_TYPE_RECTANGLE_D",
-        "4": "BULLET_TYPE_ARROW",
-        "5": "BULLET_TYPE_DIAMOND",
-        "6": "BULLET_TYPE_TRIANGLE",
-    }
-    return bullet_types.get(num_id, "BULLET_TYPE_ELLIPSE")  # Default to ELLIPSE
+def get_paragraph_style(paragraph):
+    pStyle = paragraph.find('w:pPr/w:pStyle', namespaces={'w': 'http://schemas.openxmlformats.org/wordprocessingml/2006/main'})
+    return pStyle.get(qn('w:val')) if pStyle is not None else None
 
-def get_font_properties(run):
-    font_family = run.findtext('.//w:rFonts[@w:ascii]', namespaces={'w': 'http://schemas.openxmlformats.org/wordprocessingml/2006/main'}) or "Times New Roman"
-    font_size = run.findtext('.//w:sz', namespaces={'w': 'http://schemas.openxmlformats.org/wordprocessingml/2006/main'}) or "20"
-    font_size = str(int(font_size) // 2)  # Convert half-points to points
-
-    style_attrs = [f'family="{font_family}"', f'size="{font_size}"']
-    if run.find('.//w:b', namespaces={'w': 'http://schemas.openxmlformats.org/wordprocessingml/2006/main'}) is not None:
-        style_attrs.append('bold="true"')
-    if run.find('.//w:i', namespaces={'w': 'http://schemas.openxmlformats.org/wordprocessingml/2006/main'}) is not None:
-        style_attrs.append('italic="true"')
+def get_bullet_attrs(paragraph, styles, paragraph_style=None):
+    """List attributes from the paragraph's numPr, or its style's, with the format from numbering.xml"""
+    num_id, ilvl = styles.paragraph_numbering.get(paragraph_style, (None, '0'))
+    numPr = paragraph.find('w:pPr/w:numPr', namespaces={'w': 'http://schemas.openxmlformats.org/wordprocessingml/2006/main'})
+    if numPr is not None:
+        numId = numPr.find('w:numId', namespaces={'w': 'http://schemas.openxmlformats.org/wordprocessingml/2006/main'})
+        level = numPr.find('w:ilvl', namespaces={'w': 'http://schemas.openxmlformats.org/wordprocessingml/2006/main'})
+        if numId is not None:
+            num_id = numId.get(qn('w:val'))
+        if level is not None:
+            ilvl = level.get(qn('w:val'))
+    # numId 0, and ids numbering.xml doesn't define, mean no list
+    list_type = styles.list_type(num_id, ilvl)
+    if list_type is None:
+        return ''
+    list_attrs = f'ListId="{num_id}" ListLevel="{int(ilvl) + 1}"'
+    if list_type.startswith("NUMBER_TYPE_"):
+        return f'Numbered="true" {list_attrs} NumberType="{list_type}"'
+    return f'Bulleted="true" {list_attrs} BulletType="{list_type}"'
 
-    return ' '.join(style_attrs)
+def get_font_properties(run, styles, paragraph_style=None):
+    return styles.run_attrs(paragraph_style, run.find(qn('w:rPr')))
 
 def get_line_spacing(paragraph):
     spacing = paragraph.find('.//w:spacing', namespaces={'w': 'http://schemas.openxmlformats.org/wordprocessingml/2006/main'})
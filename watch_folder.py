@@ -0,0 +1,338 @@
+import os
+import sys
+import time
+import shutil
+import struct
+import select
+import argparse
+import importlib
+import threading
+import ctypes
+import ctypes.util
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from batch import CONVERTERS, MAX_ATTEMPTS, convert_job, output_path
+from guards import add_guard_args, limits_from_args
+import paragraph_cache
+import asset_cache
+
+# inotify(7) constants
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_Q_OVERFLOW = 0x00004000
+IN_CLOEXEC = 0o2000000
+EVENT_HEADER = struct.Struct('iIII')  # wd, mask, cookie, len
+
+class InotifyWatcher:
+    """Reports files closed after writing or moved into the watched directories (Linux only)"""
+    def __init__(self, directories):
+        libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        self.fd = libc.inotify_init1(IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self.directories = {}
+        for directory in directories:
+            wd = libc.inotify_add_watch(self.fd, os.fsencode(directory), IN_CLOSE_WRITE | IN_MOVED_TO)
+            if wd < 0:
+                raise OSError(ctypes.get_errno(), f"inotify_add_watch failed for {directory}")
+            self.directories[wd] = directory
+
+    def wait(self, timeout):
+        """Block up to timeout seconds and return the paths that changed"""
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return []
+        buffer = os.read(self.fd, 64 * 1024)
+        paths = []
+        offset = 0
+        while offset < len(buffer):
+            wd, mask, _, length = EVENT_HEADER.unpack_from(buffer, offset)
+            offset += EVENT_HEADER.size
+            name = buffer[offset:offset + length].rstrip(b'\0')
+            offset += length
+            if mask & IN_Q_OVERFLOW:
+                # Events were dropped; rescan everything
+                paths.extend(scan(self.directories.values()))
+            elif wd in self.directories and name:
+                paths.append(os.path.join(self.directories[wd], os.fsdecode(name)))
+        return paths
+
+    def close(self):
+        os.close(self.fd)
+
+class PollingWatcher:
+    """Portable fallback that rescans the watched directories every `interval` seconds"""
+    def __init__(self, directories, interval=0.5):
+        self.directories = directories
+        self.interval = interval
+        self.seen = {}
+
+    def wait(self, timeout):
+        time.sleep(min(timeout, self.interval))
+        changed = []
+        current = {}
+        for path in scan(self.directories):
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            current[path] = (stat.st_size, stat.st_mtime_ns)
+            if self.seen.get(path) != current[path]:
+                changed.append(path)
+        self.seen = current
+        return changed
+
+    def close(self):
+        pass
+
+def scan(directories):
+    """Files directly inside the watched directories (done/failed/output subfolders are ignored)"""
+    for directory in directories:
+        for entry in os.scandir(directory):
+            if entry.is_file():
+                yield entry.path
+
+def make_watcher(directories, polling=False, interval=0.5):
+    if not polling and sys.platform.startswith('linux'):
+        try:
+            return InotifyWatcher(directories)
+        except (OSError, AttributeError) as e:
+            print(f"inotify unavailable ({e}), falling back to polling")
+    return PollingWatcher(directories, interval)
+
+def warm_up(paragraph_cache_size=paragraph_cache.DEFAULT_MAX_ENTRIES, asset_cache_bytes=asset_cache.DEFAULT_MAX_BYTES):
+    """Import every converter and register fonts up front so the first dropped file doesn't pay for it"""
+    for module_name, _ in CONVERTERS.values():
+        importlib.import_module(module_name)
+    importlib.import_module('udf_to_pdf').register_fonts()
+    # Workers live as long as the daemon, so boilerplate paragraphs and letterheads are prepared once per worker
+    paragraph_cache.configure(paragraph_cache_size)
+    asset_cache.configure(asset_cache_bytes)
+
+def move_unique(path, directory):
+    """Move a file into directory, adding a timestamp if a file with that name is already there"""
+    os.makedirs(directory, exist_ok=True)
+    target = os.path.join(directory, os.path.basename(path))
+    if os.path.exists(target):
+        base, ext = os.path.splitext(os.path.basename(path))
+        target = os.path.join(directory, f"{base}-{time.strftime('%Y%m%d-%H%M%S')}-{time.time_ns() % 1000000}{ext}")
+    shutil.move(path, target)
+    return target
+
+class FolderDaemon:
+    """Debounces dropped files and dispatches them by extension to a pool of converter processes"""
+    def __init__(self, directories, targets, output_dir=None, settle=0.2, workers=1,
+                 polling=False, interval=0.5, cache_dir=None, max_memory=None, limits=None,
+                 paragraph_cache_size=paragraph_cache.DEFAULT_MAX_ENTRIES,
+                 asset_cache_bytes=asset_cache.DEFAULT_MAX_BYTES):
+        self.directories = [os.path.abspath(d) for d in directories]
+        self.targets = targets  # input extension -> target format
+        self.output_dir = output_dir
+        self.settle = settle
+        self.cache_dir = cache_dir
+        self.max_memory = max_memory
+        self.limits = limits
+        self.paragraph_cache_size = paragraph_cache_size
+        self.asset_cache_bytes = asset_cache_bytes
+        self.workers = workers
+        self.watcher = make_watcher(self.directories, polling, interval)
+        self.pool = self.start_pool()
+        self.pending = {}  # path -> (deadline, (size, mtime_ns), first seen)
+        self.in_flight = set()
+        self.attempts = {}  # path -> conversions lost to a dead worker so far
+        self.retry = []  # (path, first seen) to schedule again, filled by finish()
+        self.outputs = {}  # input path -> output path, so two inputs never share an output
+        self.taken = set()  # self.outputs' values
+        self.lock = threading.Lock()
+
+    def start_pool(self):
+        pool = ProcessPoolExecutor(max_workers=self.workers, initializer=warm_up, initargs=(self.paragraph_cache_size, self.asset_cache_bytes))
+        # Workers are started lazily; start them all now so warm_up runs before the first drop
+        for future in [pool.submit(os.getpid) for _ in range(self.workers)]:
+            future.result()
+        return pool
+
+    def accepts(self, path):
+        name = os.path.basename(path)
+        # Skip hidden/temporary files and Word's ~$ lock files
+        if name.startswith(('.', '~$')):
+            return False
+        return os.path.splitext(name)[1].lower() in self.targets
+
+    def schedule(self, path, now, seen=None):
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            self.pending.pop(path, None)
+            return
+        if path in self.pending:
+            seen = self.pending[path][2]
+        elif seen is None:
+            seen = now
+        self.pending[path] = (now + self.settle, (stat.st_size, stat.st_mtime_ns), seen)
+
+    def dispatch_ready(self, now):
+        for path, (deadline, signature, seen) in list(self.pending.items()):
+            if deadline > now:
+                continue
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                del self.pending[path]
+                continue
+            if (stat.st_size, stat.st_mtime_ns) != signature:
+                # Still being written; wait for it to settle again
+                self.pending[path] = (now + self.settle, (stat.st_size, stat.st_mtime_ns), seen)
+                continue
+            with self.lock:
+                busy = path in self.in_flight
+                if not busy:
+                    self.in_flight.add(path)
+            if busy:
+                # Saved again while the old version converts; keep it until that finishes
+                self.pending[path] = (now + self.settle, signature, seen)
+                continue
+            del self.pending[path]
+            self.submit(path, seen, signature)
+
+    def output_file(self, path, target, output_dir):
+        """The output for path, renamed like batch.run_batch does if another input already uses it"""
+        if path in self.outputs:
+            return self.outputs[path]
+        taken = self.taken
+        output_file = output_path(path, target, output_dir)
+        if output_file in taken:
+            # e.g. report.docx and report.pdf, or the same name in two folders sharing -o
+            base, ext = os.path.splitext(path)
+            suffix = f"{base}_{ext[1:].lower()}"
+            output_file = output_path(suffix + ext, target, output_dir)
+            number = 2
+            while output_file in taken:
+                output_file = output_path(f"{suffix}_{number}{ext}", target, output_dir)
+                number += 1
+        self.outputs[path] = output_file
+        taken.add(output_file)
+        return output_file
+
+    def submit(self, path, seen, signature):
+        directory = os.path.dirname(path)
+        target = self.targets[os.path.splitext(path)[1].lower()]
+        output_dir = self.output_dir or os.path.join(directory, 'output')
+        os.makedirs(output_dir, exist_ok=True)
+        output_file = self.output_file(path, target, output_dir)
+        job = (convert_job, path, output_file, target, self.cache_dir, False, None, self.max_memory, self.limits)
+        try:
+            future = self.pool.submit(*job)
+        except BrokenProcessPool:
+            # A worker died (e.g. killed for memory) earlier; finish() has requeued its jobs
+            self.pool.shutdown(wait=False)
+            self.pool = self.start_pool()
+            future = self.pool.submit(*job)
+        future.add_done_callback(lambda f: self.finish(path, directory, f, seen, signature))
+
+    def finish(self, path, directory, future, seen, signature):
+        """Move the input to done/ or failed/ once its conversion completes
+
+        A worker dying breaks the pool for every job in flight, so those are retried in the
+        restarted pool, like batch.dispatch does; only a file that breaks it again is failed.
+        A file saved again during its conversion stays put and is converted again.
+        """
+        try:
+            record = future.result()
+        except BrokenProcessPool:
+            with self.lock:
+                attempt = self.attempts.get(path, 0) + 1
+                if attempt < MAX_ATTEMPTS:
+                    self.attempts[path] = attempt
+                    self.retry.append((path, seen))
+                    self.in_flight.discard(path)
+                    return
+            record = {'status': 'failed', 'error': "BrokenProcessPool: the worker process died while converting this file"}
+        except Exception as e:
+            record = {'status': 'failed', 'error': f"{type(e).__name__}: {e}"}
+        try:
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                return
+            if (stat.st_size, stat.st_mtime_ns) != signature:
+                # The result is from the old content; convert the new version instead
+                with self.lock:
+                    self.retry.append((path, seen))
+                return
+            if record['status'] == 'failed':
+                move_unique(path, os.path.join(directory, 'failed'))
+                print(f"FAILED {path}: {record['error']}", flush=True)
+            else:
+                move_unique(path, os.path.join(directory, 'done'))
+                print(f"{record['status']:>9} {record['output']} ({time.monotonic() - seen:.2f}s after drop)", flush=True)
+        except OSError as e:
+            print(f"Could not move {path}: {e}", flush=True)
+        finally:
+            with self.lock:
+                self.attempts.pop(path, None)
+                self.in_flight.discard(path)
+
+    def reschedule(self, now):
+        """Schedule the files finish() handed back, e.g. those in flight when a worker died"""
+        with self.lock:
+            retry, self.retry = self.retry, []
+        for path, seen in retry:
+            self.schedule(path, now, seen)
+
+    def run(self):
+        now = time.monotonic()
+        # Files dropped while the daemon was down
+        for path in scan(self.directories):
+            if self.accepts(path):
+                self.schedule(path, now)
+        print(f"Watching {', '.join(self.directories)} ({type(self.watcher).__name__})", flush=True)
+        try:
+            while True:
+                now = time.monotonic()
+                timeout = min((deadline for deadline, _, _ in self.pending.values()), default=now + 1.0) - now
+                for path in self.watcher.wait(max(timeout, 0.0)):
+                    if self.accepts(path):
+                        self.schedule(path, time.monotonic())
+                self.reschedule(time.monotonic())
+                self.dispatch_ready(time.monotonic())
+        finally:
+            self.watcher.close()
+            self.pool.shutdown(wait=True)
+
+def main():
+    parser = argparse.ArgumentParser(description="Watch folders and convert UDF, DOCX and PDF files dropped into them.")
+    parser.add_argument('directories', nargs='+', help="directories to watch")
+    parser.add_argument('--udf-to', default='pdf', choices=sorted(to for ext, to in CONVERTERS if ext == '.udf'),
+                        help="format to convert dropped .udf files to (default: pdf)")
+    parser.add_argument('-o', '--output-dir', help="directory for outputs (default: an 'output' folder in each watched directory)")
+    parser.add_argument('--settle', type=float, default=0.2, help="seconds a file must stay unchanged before converting (default: 0.2)")
+    parser.add_argument('-j', '--workers', type=int, default=os.cpu_count() or 1, help="parallel worker processes (default: CPU count)")
+    parser.add_argument('--poll', action='store_true', help="poll the directories instead of using inotify")
+    parser.add_argument('--interval', type=float, default=0.5, help="polling interval in seconds (default: 0.5)")
+    parser.add_argument('--cache', metavar='DIR', help="output cache directory, as in batch.py")
+    parser.add_argument('--max-memory', type=float, metavar='MB', help="per-conversion image memory budget")
+    parser.add_argument('--paragraph-cache', type=int, default=paragraph_cache.DEFAULT_MAX_ENTRIES, metavar='N',
+                        help=f"distinct paragraphs each worker keeps laid out for PDF output; 0 disables (default: {paragraph_cache.DEFAULT_MAX_ENTRIES})")
+    parser.add_argument('--asset-cache', type=float, default=asset_cache.DEFAULT_MAX_BYTES / (1024 * 1024), metavar='MB',
+                        help=f"memory each worker keeps for decoded letterheads and background images; 0 disables (default: {asset_cache.DEFAULT_MAX_BYTES // (1024 * 1024)})")
+    add_guard_args(parser)
+    args = parser.parse_args()
+
+    for directory in args.directories:
+        if not os.path.isdir(directory):
+            print(f"Directory not found: {directory}")
+            sys.exit(1)
+
+    targets = {'.udf': args.udf_to, '.docx': 'udf', '.pdf': 'udf'}
+    max_memory = int(args.max_memory * 1024 * 1024) if args.max_memory is not None else None
+    daemon = FolderDaemon(args.directories, targets, args.output_dir, args.settle, args.workers,
+                          args.poll, args.interval, args.cache, max_memory, limits_from_args(args),
+                          args.paragraph_cache, int(args.asset_cache * 1024 * 1024))
+    try:
+        daemon.run()
+    except KeyboardInterrupt:
+        print("Stopped.")
+
+if __name__ == '__main__':
+    main()